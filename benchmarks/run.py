@@ -0,0 +1,386 @@
+"""Offline benchmark suite
+
+Runs the services against local stand-ins of the exchange REST and stream
+APIs, so no keys, network or database are needed:
+
+    python -m benchmarks.run --rounds 200 --delay 0.002
+
+Results are written to benchmarks/results/<timestamp>.json and compared
+with the previous result file (or --baseline) to surface regressions.
+"""
+from os import environ
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.standins import StandInServer, TickerStreamServer, make_universe
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+API_KEY = "benchmark"
+API_SECRET = "benchmark"
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "value": statistics.mean(ordered) * 1000,
+        "p50": ordered[len(ordered) // 2] * 1000,
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        "max": ordered[-1] * 1000,
+        "unit": "ms",
+        "better": "lower",
+    }
+
+
+def rate(count, elapsed, unit):
+    return {"value": count / elapsed, "unit": unit, "better": "higher"}
+
+
+IMPORTS = {
+    "adapter": "exchanges.adapter",
+    "kucoin": "exchanges.adapter, exchanges.kucoin.service",
+    "binance": "exchanges.adapter, exchanges.binance.service",
+}
+
+
+def bench_import_time(modules, rounds):
+    """Cold import time of `modules` in a fresh interpreter, without a database configured"""
+    code = f"import time; started = time.perf_counter(); import {modules}; print(time.perf_counter() - started)"
+    env = {key: value for key, value in environ.items() if not key.startswith("DATABASE_")}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(rounds):
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(float(output))
+    return summarize(samples)
+
+
+def bench_order_round_trip(name, rounds):
+    """Latency of a market buy through `Exchange`, price lookup and sizing included"""
+    from exchanges.adapter import Exchange
+
+    exchange = Exchange(name=name, api_key=API_KEY, api_secret=API_SECRET)
+    exchange.buy("ETH", amount=0.01)
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        exchange.buy("ETH", amount=0.01)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def bench_order_basket(name, rounds, size=50):
+    """Latency of a `size` order market basket through `Exchange.buy_many`"""
+    from exchanges.adapter import Exchange
+
+    exchange = Exchange(name=name, api_key=API_KEY, api_secret=API_SECRET)
+    basket = [{"coin_name": coin, "amount": 0.01} for coin in list(make_universe(size))[:size]]
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        placed = exchange.buy_many(basket)
+        samples.append(time.perf_counter() - started)
+        failed = [result["error"] for result in placed if result["error"]]
+        if failed:
+            raise Exception(f"Basket orders failed: {failed[:3]}")
+    return summarize(samples)
+
+
+def bench_balance_check(name, rounds):
+    """Latency of the pre-sell balance check `has_coin` once the ledger holds a snapshot"""
+    from exchanges.adapter import Exchange
+
+    exchange = Exchange(name=name, api_key=API_KEY, api_secret=API_SECRET)
+    exchange.has_coin("ETH")
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        exchange.has_coin("ETH")
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def bench_get_prices(name, rounds):
+    """Full ticker list fetches per second"""
+    from exchanges.adapter import Exchange
+
+    exchange = Exchange(name=name, api_key=API_KEY, api_secret=API_SECRET)
+    exchange.get_prices()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        exchange.get_prices()
+    return rate(rounds, time.perf_counter() - started, "calls/s")
+
+
+def bench_get_prices_fan_out(rounds):
+    """Merged snapshots of every exchange per second through `exchanges.prices`"""
+    from exchanges.adapter import Exchange
+    from exchanges.prices import get_prices
+
+    exchanges = [Exchange(name=name, api_key=API_KEY, api_secret=API_SECRET)
+                 for name in ("binance", "kucoin", "bittrex")]
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        snapshot = get_prices(exchanges)
+        samples.append(time.perf_counter() - started)
+        if snapshot.errors:
+            raise Exception(f"Price fan out failed: {snapshot.errors}")
+    return summarize(samples)
+
+
+def _listener(executor, coin_name="ETH"):
+    from trading.ws import BinaceWebsocket
+
+    # Bands far away from the stand-in prices: every tick is evaluated, none trades
+    listener = BinaceWebsocket(API_KEY, API_SECRET, executor=executor)
+    return listener, ("binance", coin_name, "BTC", 1000.0, 2000.0, 0.01)
+
+
+def bench_dispatch(calls):
+    """`Exchange` call overhead on the network-free simulated provider"""
+    from exchanges.adapter import Exchange
+
+    exchange = Exchange(name="simulated")
+    started = time.perf_counter()
+    for _ in range(calls):
+        exchange.get_prices()
+    return rate(calls, time.perf_counter() - started, "calls/s")
+
+
+def bench_order_book(updates, levels=1000):
+    """Depth diffs applied per second, each followed by a VWAP sizing query"""
+    from exchanges.orderbook import OrderBook
+
+    book = OrderBook("ETHBTC")
+    book.apply_snapshot({
+        "lastUpdateId": 0,
+        "bids": [[f"{0.07 - step * 1e-6:.8f}", "1.5"] for step in range(levels)],
+        "asks": [[f"{0.0701 + step * 1e-6:.8f}", "1.5"] for step in range(levels)],
+    })
+    diffs = [{"U": number, "u": number, "s": "ETHBTC",
+              "b": [[f"{0.07 - (number % levels) * 1e-6:.8f}", str(number % 3)]],
+              "a": [[f"{0.0701 + (number % levels) * 1e-6:.8f}", str(number % 3)]]}
+             for number in range(1, updates + 1)]
+    started = time.perf_counter()
+    for msg in diffs:
+        book.apply_diff(msg)
+        book.fill("BUY", amount=1)
+    return rate(updates, time.perf_counter() - started, "updates/s")
+
+
+def bench_order_store(reports, symbols=50):
+    """Execution reports applied per second, each followed by an open orders query of its symbol"""
+    from exchanges.orders import OrderStore
+
+    store = OrderStore("binance")
+    statuses = ("NEW", "PARTIALLY_FILLED", "FILLED")
+    messages = [{"e": "executionReport", "s": f"ALT{number % symbols}BTC", "i": number // 3,
+                 "c": f"client-{number // 3}", "S": "BUY", "o": "LIMIT", "X": statuses[number % 3],
+                 "p": "0.0001", "q": "10", "z": str(5 * (number % 3)), "T": number}
+                for number in range(reports)]
+    started = time.perf_counter()
+    for msg in messages:
+        store.update_from_binance(msg)
+        store.open_orders(msg["s"])
+    return rate(reports, time.perf_counter() - started, "reports/s")
+
+
+def bench_spread_scan(rounds, pairs=3000):
+    """Full `get_prices` snapshots of `pairs` pairs per second through the spread scanner"""
+    from trading.arbitrage import SpreadScanner
+
+    universe = make_universe(pairs)
+    snapshots = {
+        "binance": [{"symbol": f"{coin}BTC", "bid": f"{price:.8f}", "ask": f"{price:.8f}"}
+                    for coin, price in universe.items()],
+        "kucoin": [{"symbol": f"{coin}-BTC", "bid": f"{price * 1.001:.8f}", "ask": f"{price * 1.001:.8f}"}
+                   for coin, price in universe.items()],
+        "bittrex": [{"symbol": f"BTC-{coin}", "bid": price * 0.999, "ask": price * 0.999}
+                    for coin, price in universe.items()],
+    }
+    scanner = SpreadScanner(list(snapshots))
+    for exchange, tickers in snapshots.items():
+        scanner.update(exchange, tickers)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for exchange, tickers in snapshots.items():
+            scanner.update(exchange, tickers)
+    return rate(rounds * len(snapshots), time.perf_counter() - started, "snapshots/s")
+
+
+def bench_process_results(ticks):
+    """Ticks per second through `BinaceWebsocket.process_results`"""
+    from trading.execution import OrderExecutor
+
+    listener, watch = _listener(OrderExecutor(workers=0))
+    listener.configure(*watch)
+    stream = TickerStreamServer(make_universe(3))
+    messages = [stream.ticker("ETHBTC", sequence)["data"] for sequence in range(ticks)]
+    started = time.perf_counter()
+    for msg in messages:
+        listener.process_results(msg)
+    return rate(ticks, time.perf_counter() - started, "ticks/s")
+
+
+async def _stream_ticks(ticks, symbols):
+    from trading.execution import OrderExecutor
+    from trading.streams import BinanceStreamMultiplexer
+    from trading.ws import MultiplexedRules
+
+    universe = make_universe(symbols)
+    server = await TickerStreamServer(universe, messages=ticks).start()
+    multiplexer = BinanceStreamMultiplexer()
+    multiplexer.STREAM_URL = server.url
+    rules = MultiplexedRules(multiplexer)
+    executor = OrderExecutor(workers=0)
+
+    received = 0
+    done = asyncio.Event()
+    started = None
+
+    def on_tick(msg):
+        nonlocal received, started
+        received += 1
+        if started is None:
+            started = time.perf_counter()
+        if received == ticks:
+            done.set()
+
+    loop = asyncio.get_running_loop()
+    for coin in universe:
+        listener, watch = _listener(executor, coin)
+        await loop.run_in_executor(None, listener.attach, rules, *watch)
+        multiplexer.subscribe(listener.symbol, on_tick)
+
+    task = asyncio.ensure_future(multiplexer.run())
+    await asyncio.wait_for(done.wait(), 120)
+    elapsed = time.perf_counter() - started
+    multiplexer.close()
+    task.cancel()
+    await server.stop()
+    return rate(ticks, elapsed, "ticks/s")
+
+
+def bench_stream_ticks(ticks, symbols):
+    """Ticks per second from a local combined stream through the multiplexer into every listener"""
+    return asyncio.run(_stream_ticks(ticks, symbols))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def latest_result(directory, exclude=None):
+    paths = sorted(path for path in glob.glob(os.path.join(directory, "*.json")) if path != exclude)
+    return paths[-1] if paths else None
+
+
+def compare(results, baseline, threshold):
+    """Print the change of every benchmark against a baseline run
+
+    Returns:
+        list: Names of the benchmarks that regressed by more than `threshold`.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("value"):
+            print(f"{name:40} {result['value']:12.3f} {result['unit']:8} (new)")
+            continue
+        change = (result["value"] - previous["value"]) / previous["value"]
+        worse = -change if result["better"] == "higher" else change
+        flag = ""
+        if worse > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        print(f"{name:40} {result['value']:12.3f} {result['unit']:8} {change:+8.1%} {flag}")
+    return regressions
+
+
+def run(args):
+    server = StandInServer(delay=args.delay).start()
+    server.configure_env()
+
+    from exchanges.metadata import get_symbol_cache
+
+    get_symbol_cache("stepsizes").replace(server.symbol_documents(), version="stand-in")
+
+    results = {}
+    for name, modules in IMPORTS.items():
+        results[f"import_time.{name}"] = bench_import_time(modules, max(3, args.rounds // 10))
+    for name in ("binance", "kucoin"):
+        results[f"order_round_trip.{name}"] = bench_order_round_trip(name, args.rounds)
+        results[f"order_basket.{name}"] = bench_order_basket(name, max(1, args.rounds // 10))
+    for name in ("binance", "kucoin", "bittrex"):
+        results[f"get_prices.{name}"] = bench_get_prices(name, args.rounds)
+        results[f"balance_check.{name}"] = bench_balance_check(name, args.rounds * 10)
+    results["get_prices.fan_out"] = bench_get_prices_fan_out(max(1, args.rounds // 10))
+    results["dispatch"] = bench_dispatch(args.ticks * 10)
+    results["order_book"] = bench_order_book(args.ticks * 5)
+    results["order_store"] = bench_order_store(args.ticks * 5)
+    results["spread_scan"] = bench_spread_scan(args.rounds)
+    results["process_results"] = bench_process_results(args.ticks)
+    results["stream_ticks"] = bench_stream_ticks(args.ticks, args.symbols)
+    server.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200, help="Requests per REST benchmark")
+    parser.add_argument("--ticks", type=int, default=20000, help="Ticks per stream benchmark")
+    parser.add_argument("--symbols", type=int, default=50, help="Symbols on the stand-in stream")
+    parser.add_argument("--delay", type=float, default=0.0, help="Stand-in latency per request in seconds")
+    parser.add_argument("--output", default=RESULTS_DIR, help="Directory of result files")
+    parser.add_argument("--baseline", help="Result file to compare with, defaults to the latest one")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change reported as regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    baseline_path = args.baseline or latest_result(args.output, exclude=path)
+    with open(path, "w") as output:
+        json.dump({
+            "revision": git_revision(),
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": vars(args),
+            "results": results,
+        }, output, indent=2)
+
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path) as previous:
+            baseline = json.load(previous).get("results", {})
+        print(f"Compared with {baseline_path}")
+    regressions = compare(results, baseline, args.threshold)
+    print(f"Results written to {path}")
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+from os import environ
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+
+def make_universe(size=500):
+    """Deterministic set of BTC quoted symbols and prices
+
+    Returns:
+        dict: Price per base coin e.g {"ETH": 0.0712, "ALT1": 0.0000153}
+    """
+    universe = {"ETH": 0.0712, "NEO": 0.000452, "LTC": 0.00321}
+    for number in range(size - len(universe)):
+        universe[f"ALT{number}"] = round(0.00001 * (1 + number % 97), 8)
+    return universe
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers the REST endpoints the Binance, KuCoin and Bittrex services call
+
+    Binance is served under /binance/api, Bittrex under /bittrex/api/v1.1 and
+    KuCoin, whose client joins absolute paths to its base URL, under /api/v1.
+    A single server stands in for all three exchanges.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if body.startswith("{"):
+            query.update(json.loads(body))
+        elif body:
+            query.update({key: values[-1] for key, values in parse_qs(body).items()})
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.server.requests += 1
+
+        path = url.path
+        if path.startswith("/binance/api/"):
+            response = self.server.binance(method, path.split("/", 4)[-1], query)
+        elif path.startswith("/bittrex/api/v1.1/"):
+            response = self.server.bittrex(path[len("/bittrex/api/v1.1/"):], query)
+        elif path.startswith("/api/v1/"):
+            response = self.server.kucoin(method, path[len("/api/v1/"):], query)
+        else:
+            response = None
+
+        if response is None:
+            self.send_error(404)
+            return
+        payload = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local HTTP stand-in for the exchange REST APIs
+
+    Responses are built from a synthetic symbol universe. `delay` adds a fixed
+    server side latency to every request to approximate a network hop.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, universe=None, delay=0.0):
+        super().__init__((host, port), StandInHandler)
+        self.universe = universe or make_universe()
+        self.delay = delay
+        self.requests = 0
+        self.order_ids = count(1)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def configure_env(self):
+        """Point the services and their clients at this server"""
+        environ["BINANCE_API_URL"] = f"{self.url}/binance/api"
+        environ["KUCOIN_API_URL"] = self.url
+        environ["BITTREX_API_URL"] = f"{self.url}/bittrex/api/v1.1"
+        environ.setdefault("BITTREX_CALLS_PER_SECOND", "1000000")
+        # The exchange budgets would cap the throughput being measured
+        environ.setdefault("RATE_LIMITS", "off")
+
+    def symbol_documents(self):
+        """`stepsizes` documents for every Binance symbol of the universe"""
+        return [{
+            "symbol": f"{coin}BTC",
+            "baseAssetPrecision": 8,
+            "lot_size": {"filterType": "LOT_SIZE", "minQty": "0.00100000", "stepSize": "0.00100000"},
+            "price_filter": {"filterType": "PRICE_FILTER", "tickSize": "0.00000100"},
+            "min_notional": {"filterType": "MIN_NOTIONAL", "minNotional": "0.00010000"},
+        } for coin in self.universe]
+
+    def binance(self, method, path, query):
+        if path in ("ping", "time"):
+            return {"serverTime": int(time.time() * 1000)} if path == "time" else {}
+        if path == "ticker/price":
+            if "symbol" in query:
+                coin = query["symbol"][:-3]
+                return {"symbol": query["symbol"], "price": f"{self.universe.get(coin, 0):.8f}"}
+            return [{"symbol": f"{coin}BTC", "price": f"{price:.8f}"} for coin, price in self.universe.items()]
+        if path == "ticker/bookTicker":
+            tickers = [{"symbol": f"{coin}BTC", "bidPrice": f"{price:.8f}", "askPrice": f"{price:.8f}"}
+                       for coin, price in self.universe.items()]
+            if "symbol" in query:
+                return next((ticker for ticker in tickers if ticker["symbol"] == query["symbol"]), None)
+            return tickers
+        if path == "order" and method == "POST":
+            return {"symbol": query.get("symbol"), "orderId": next(self.order_ids),
+                    "transactTime": int(time.time() * 1000), "status": "FILLED",
+                    "side": query.get("side"), "type": query.get("type"),
+                    "origQty": query.get("quantity"), "executedQty": query.get("quantity")}
+        if path == "account":
+            return {"updateTime": int(time.time() * 1000),
+                    "balances": [{"asset": coin, "free": "1000.00000000", "locked": "0.00000000"}
+                                 for coin in list(self.universe)[:20] + ["BTC"]]}
+        if path in ("openOrders", "allOrders"):
+            return []
+        if path == "exchangeInfo":
+            return {"symbols": [{"symbol": doc["symbol"], "filters": [doc["lot_size"], doc["price_filter"]]}
+                                for doc in self.symbol_documents()]}
+        return None
+
+    def kucoin(self, method, path, query):
+        data = None
+        if path == "timestamp":
+            data = int(time.time() * 1000)
+        elif path == "market/orderbook/level1":
+            price = self.universe.get(query.get("symbol", "-").split("-")[0], 0)
+            data = {"price": f"{price:.8f}", "bestBid": f"{price:.8f}", "bestAsk": f"{price:.8f}"}
+        elif path == "market/allTickers":
+            data = {"time": int(time.time() * 1000), "ticker": [
+                {"symbol": f"{coin}-BTC", "buy": f"{price:.8f}", "sell": f"{price:.8f}"}
+                for coin, price in self.universe.items()]}
+        elif path == "symbols":
+            data = [{"symbol": f"{coin}-BTC", "baseCurrency": coin, "quoteCurrency": "BTC",
+                     "baseIncrement": "0.001", "priceIncrement": "0.000001", "baseMinSize": "0.001"}
+                    for coin in self.universe]
+        elif path.startswith("currencies/"):
+            data = {"currency": path.split("/")[-1], "precision": 8}
+        elif path == "orders/multi" and method == "POST":
+            data = {"data": [{"id": f"{next(self.order_ids):024x}", "symbol": query.get("symbol"),
+                              "side": order.get("side"), "size": order.get("size"), "status": "success"}
+                             for order in query.get("orderList", [])]}
+        elif path == "orders" and method == "POST":
+            data = {"orderId": f"{next(self.order_ids):024x}"}
+        elif path == "orders":
+            data = {"currentPage": 1, "pageSize": 50, "totalNum": 0, "items": []}
+        elif path == "accounts":
+            currencies = [query["currency"]] if "currency" in query else list(self.universe)[:20] + ["BTC"]
+            data = [{"currency": currency, "type": "trade", "available": "1000", "holds": "0"}
+                    for currency in currencies]
+        if data is None:
+            return None
+        return {"code": "200000", "data": data}
+
+    def bittrex(self, path, query):
+        result = None
+        if path == "public/getmarkets":
+            result = [{"MarketName": f"BTC-{coin}", "MarketCurrency": coin, "BaseCurrency": "BTC"}
+                      for coin in self.universe]
+        elif path == "public/getmarketsummaries":
+            result = [{"MarketName": f"BTC-{coin}", "Last": price, "Bid": price, "Ask": price}
+                      for coin, price in self.universe.items()]
+        elif path in ("public/getticker", "public/getmarketsummary"):
+            price = self.universe.get(query.get("market", "-").split("-")[-1], 0)
+            result = {"Bid": price, "Ask": price, "Last": price}
+        elif path.startswith("market/buy") or path.startswith("market/sell"):
+            result = {"uuid": f"{next(self.order_ids):032x}"}
+        elif path == "account/getbalance":
+            result = {"Currency": query.get("currency"), "Available": 1000.0}
+        elif path == "account/getbalances":
+            result = [{"Currency": currency, "Balance": 1000.0, "Available": 1000.0}
+                      for currency in list(self.universe)[:20] + ["BTC"]]
+        if result is None:
+            return None
+        return {"success": True, "message": "", "result": result}
+
+
+class TickerStreamServer():
+    """Local stand-in for the Binance combined stream endpoint
+
+    After a SUBSCRIBE request it pushes `messages` 24hr ticker events in a
+    round robin over the subscribed symbols, as fast as the socket accepts them.
+    """
+
+    def __init__(self, universe, messages=10000, host="127.0.0.1", port=0):
+        self.universe = universe
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.sent = 0
+        self._server = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/stream"
+
+    async def start(self):
+        import websockets
+
+        self._server = await websockets.serve(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def ticker(self, symbol, sequence):
+        price = self.universe.get(symbol[:-3], 0.0001)
+        return {"stream": f"{symbol.lower()}@ticker", "data": {
+            "e": "24hrTicker", "E": int(time.time() * 1000), "s": symbol,
+            "b": f"{price * 0.999:.8f}", "a": f"{price * 1.001:.8f}", "c": f"{price:.8f}",
+            "n": sequence}}
+
+    async def _serve(self, ws, path=None):
+        request = json.loads(await ws.recv())
+        await ws.send(json.dumps({"result": None, "id": request.get("id")}))
+        symbols = [stream.split("@")[0].upper() for stream in request.get("params", [])]
+        for sequence in range(self.messages):
+            await ws.send(json.dumps(self.ticker(symbols[sequence % len(symbols)], sequence)))
+            self.sent += 1
+        await ws.wait_closed()
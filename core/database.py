@@ -1,11 +1,13 @@
 import os
-import pymongo
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
 def setup_db():
+    import pymongo
+
     port = int(os.environ.get("DATABASE_PORT", 27017))
     user = os.environ.get("DATABASE_USER")
     host = os.environ.get("DATABASE_HOST")
@@ -17,4 +19,35 @@ def setup_db():
     return client[db_name]
 
 
-db_client = setup_db()
+class LazyDatabase():
+    """Stands in for the database until it is first used
+
+    pymongo is imported and the client created on the first collection
+    access, so importing code that only may touch the database costs
+    nothing and does not fail when Mongo is unreachable.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._database = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self._database is not None
+
+    def connect(self):
+        if self._database is None:
+            with self._lock:
+                if self._database is None:
+                    self._database = self._factory()
+        return self._database
+
+    def __getitem__(self, name):
+        return self.connect()[name]
+
+    def __getattr__(self, attr):
+        return getattr(self.connect(), attr)
+
+
+db_client = LazyDatabase(setup_db)
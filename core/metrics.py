@@ -0,0 +1,203 @@
+from os import environ
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, 50us to 30s
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Counter():
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge():
+    """Value read from a callable at scrape time"""
+
+    def __init__(self, read):
+        self.read = read
+
+    @property
+    def value(self):
+        try:
+            return self.read()
+        except Exception:
+            return float("nan")
+
+
+class Histogram():
+    """Fixed bucket latency histogram; observe costs one bisect and a lock"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[position] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction q of observations fall"""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return 0.0
+
+
+class MetricsRegistry():
+    """In-process registry of counters, gauges and latency histograms"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, labels, factory):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = self.metrics[key] = factory()
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(name, labels, Counter)
+
+    def histogram(self, name, **labels):
+        return self._get(name, labels, Histogram)
+
+    def gauge(self, name, read, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self.metrics[key] = Gauge(read)
+        return metric
+
+    def items(self):
+        """((name, labels), metric) pairs, copied under the lock so series can register meanwhile"""
+        with self._lock:
+            return list(self.metrics.items())
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        for (name, labels), metric in sorted(self.items(), key=lambda item: item[0]):
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ("+Inf",), metric.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Metrics as a dict, histograms summarized by count, sum and p50/p99"""
+        result = {}
+        for (name, labels), metric in self.items():
+            key = name + _format_labels(labels)
+            if isinstance(metric, Histogram):
+                result[key] = {"count": metric.count, "sum": metric.sum,
+                               "p50": metric.quantile(0.5), "p99": metric.quantile(0.99)}
+            else:
+                result[key] = metric.value
+        return result
+
+
+registry = MetricsRegistry()
+
+
+def stage(name):
+    """Histogram of one stage of the tick-to-order path
+
+    Stages: receipt (exchange event to callback), decision, queue,
+    metadata, price, order_http (signing and HTTP) and ack (tick to order ack).
+    """
+    return registry.histogram("tick_stage_seconds", stage=name)
+
+
+def timed(function, histogram):
+    """Wrap a function or coroutine function to record its latency"""
+    if getattr(function, "__timed__", False):
+        return function
+
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+    wrapper.__timed__ = True
+    return wrapper
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = registry.render(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(registry.snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread"""
+    port = int(port or environ.get("METRICS_PORT", 9108))
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
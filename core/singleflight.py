@@ -0,0 +1,147 @@
+from os import environ
+import asyncio
+import functools
+import inspect
+import threading
+import time
+
+TTL = float(environ.get("READ_COALESCE_TTL", 0))
+
+
+class _Call():
+    __slots__ = ("event", "result", "error", "finished")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished = None
+
+
+class SingleFlight():
+    """Runs one call per key at a time and shares its outcome
+
+    Callers arriving while a call for the same key is in flight wait for it
+    and get its result (or exception) instead of issuing their own. With a
+    `ttl` the result is also served to callers arriving up to `ttl` seconds
+    after it finished. Threads and coroutines are coalesced separately;
+    a coroutine call runs as its own task, so cancelling the caller that
+    started it does not cancel it for the others. Finished calls are
+    dropped once they are `ttl` old. Results are shared objects, callers
+    must not mutate them.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = TTL if ttl is None else float(ttl)
+        self.calls = 0
+        self.shared = 0
+        self._calls = {}
+        self._futures = {}
+        self._pruned = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _fresh(self, finished):
+        return finished is None or time.monotonic() - finished <= self.ttl
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or not self._fresh(call.finished)
+            if leader:
+                if self.ttl:
+                    self._prune()
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            call.finished = time.monotonic()
+            with self._lock:
+                if (call.error is not None or not self.ttl) and self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+
+    def _prune(self):
+        # Finished calls of keys that are not asked for again, at most once per ttl
+        now = time.monotonic()
+        if now - self._pruned < self.ttl:
+            return
+        self._pruned = now
+        for key, call in list(self._calls.items()):
+            if call.finished is not None and not self._fresh(call.finished):
+                del self._calls[key]
+
+    async def do_async(self, key, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        key = (loop, key)
+        entry = self._futures.get(key)
+        if entry is not None and self._fresh(entry[1]):
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(function(*args, **kwargs))
+            entry = self._futures[key] = [task, None]
+            self.calls += 1
+            task.add_done_callback(functools.partial(self._finished, loop, key, entry))
+        return await asyncio.shield(entry[0])
+
+    def _finished(self, loop, key, entry, task):
+        entry[1] = time.monotonic()
+        # Also marks an exception retrieved when every caller was cancelled
+        failed = task.cancelled() or task.exception() is not None
+        if failed or not self.ttl:
+            self._evict(key, entry)
+        else:
+            loop.call_later(self.ttl, self._evict, key, entry)
+
+    def _evict(self, key, entry):
+        if self._futures.get(key) is entry:
+            del self._futures[key]
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "ttl": self.ttl}
+
+
+def coalesce(ttl=None, per_account=False):
+    """Coalesce concurrent identical calls of a read-only service method
+
+    The key is the service name, the method and its arguments; with
+    `per_account` it also includes the account (api key or client) of the
+    instance, for calls such as balances that differ between accounts.
+
+    Args:
+        ttl (float): Seconds a finished result keeps being served, READ_COALESCE_TTL by default
+        per_account (bool): Keep calls of different accounts apart
+    """
+    def decorator(function):
+        flight = SingleFlight(ttl)
+
+        def make_key(self, args, kwargs):
+            account = None
+            if per_account:
+                account = getattr(self, "api_key", None) or id(getattr(self, "client", self))
+            return (self.name, function.__name__, account, args, tuple(sorted(kwargs.items())))
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper(self, *args, **kwargs):
+                return await flight.do_async(make_key(self, args, kwargs), function, self, *args, **kwargs)
+        else:
+            @functools.wraps(function)
+            def wrapper(self, *args, **kwargs):
+                return flight.do(make_key(self, args, kwargs), function, self, *args, **kwargs)
+        wrapper.flight = flight
+        return wrapper
+    return decorator
@@ -1,30 +1,27 @@
-from .binance.service import BinanceService
-from .kucoin.service import KucoinService
-from .bittrex.service import BittrexService
+from .registry import get_provider
 
+# Provider methods bound onto every `Exchange` as they are
+BOUND_METHODS = ("get_account", "sell", "buy_many", "sell_many", "has_coin", "get_open_orders",
+                 "get_all_orders", "get_prices", "get_symbol_info", "update_step_sizes",
+                 "sync_order_history")
 
-class ExchangeAdapter(object):
-    def __init__(self, obj, **adapted_methods):
-        """We set the adapted methods in the object's dict"""
-        self.obj = obj
-        self.__dict__.update(adapted_methods)
-        self.provider = None
-
-    def __getattr__(self, attr):
-        """All non-adapted calls are passed to the object"""
-        return getattr(self.obj, attr)
 
-    def original_dict(self):
-        """Print original object dict"""
-        return self.obj.__dict__
+class Exchange():
+    """Runs the calls of one exchange's service
 
+    The service is looked up in the provider registry and its methods
+    (`get_account`, `sell`, `buy_many`, `sell_many`, `has_coin`,
+    `get_open_orders`, `get_all_orders`, `get_prices`, `get_symbol_info`,
+    `update_step_sizes`, `sync_order_history`)
+    are bound onto the instance once, so every call goes straight to the
+    provider.
+    """
 
-class Exchange():
     def __init__(self, name, **kwargs):
         """Initiate adapter service
 
         Args:
-            name (string): Name of service
+            name (string): Name of service, see `exchanges.registry.register_provider`
             **kwargs (object): Initialization data e.g object of access tokens
         """
         self.name = name
@@ -32,50 +29,14 @@ class Exchange():
         self.set_adapter(**kwargs)
 
     def set_adapter(self, **kwargs):
-        if self.name == 'binance':
-            self.provider = BinanceService(**kwargs)
-            scope = ExchangeAdapter(self.provider)
-            return scope
-        if self.name == 'bittrex':
-            self.provider = BittrexService(**kwargs)
-            scope = ExchangeAdapter(self.provider)
-            return scope
-        if self.name == 'kucoin':
-            self.provider = KucoinService(**kwargs)
-            scope = ExchangeAdapter(self.provider)
-            return scope
-
-    def get_account(self):
-        scope = ExchangeAdapter(
-            self.provider, run=self.provider.get_account)
-        return scope.get_account()
+        self.provider = get_provider(self.name)(**kwargs)
+        for attr in BOUND_METHODS:
+            method = getattr(self.provider, attr, None)
+            if method is not None:
+                setattr(self, attr, method)
+        self._buy = self.provider.buy
+        return self.provider
 
     def buy(self, coin_name, amount, quantity=None, pair_base="BTC", order_type="market"):
-        scope = ExchangeAdapter(
-            self.provider, run=self.provider.buy)
-        return scope.buy(coin_name=coin_name, amount=amount, quantity=quantity, pair_base=pair_base, order_type=order_type)
-
-    def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
-        scope = ExchangeAdapter(
-            self.provider, run=self.provider.sell)
-        return scope.sell(coin_name=coin_name, quantity=quantity, pair_base=pair_base, amount=amount, order_type=order_type)
-
-    def get_open_orders(self, coin_name, pair_base="BTC"):
-        scope = ExchangeAdapter(
-            self.provider, run=self.provider.get_open_orders)
-        return scope.get_open_orders(coin_name, pair_base)
-
-    def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
-        scope = ExchangeAdapter(
-            self.provider, run=self.provider.get_all_orders)
-        return scope.get_all_orders(coin_name, limit=5, pair_base="BTC")
-
-    def get_prices(self):
-        scope = ExchangeAdapter(
-            self.provider, run=self.provider.get_prices)
-        return scope.get_prices()
-
-    def get_symbol_info(self, coin_name=None, pair_base="BTC", symbol=None):
-        scope = ExchangeAdapter(
-            self.provider, run=self.provider.get_symbol_info)
-        return scope.get_symbol_info(coin_name, pair_base, symbol)
+        # Takes amount second, unlike the services
+        return self._buy(coin_name, quantity, pair_base, amount, order_type)
@@ -0,0 +1,60 @@
+from .clients import async_sessions
+from .instruments import get_instruments
+from .registry import get_provider
+
+
+class AsyncExchange():
+    def __init__(self, name, **kwargs):
+        """Initiate asyncio adapter service
+
+        All calls are coroutines. Every instance for the same exchange shares
+        one HTTP session, so a single event loop can keep many requests in flight.
+
+        Args:
+            name (string): Name of service
+            **kwargs (object): Initialization data e.g object of access tokens
+        """
+        self.name = name
+        self.provider = None
+        self.set_adapter(**kwargs)
+
+    def set_adapter(self, **kwargs):
+        self.provider = get_provider(self.name, asynchronous=True)(**kwargs)
+        return self.provider
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """Close the shared session of this exchange on the running loop"""
+        await async_sessions.close(self.name)
+
+    async def get_account(self):
+        return await self.provider.get_account()
+
+    async def buy(self, coin_name, amount, quantity=None, pair_base="BTC", order_type="market"):
+        return await self.provider.buy(coin_name=coin_name, amount=amount, quantity=quantity, pair_base=pair_base, order_type=order_type)
+
+    async def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        return await self.provider.sell(coin_name=coin_name, quantity=quantity, pair_base=pair_base, amount=amount, order_type=order_type)
+
+    async def get_price(self, coin_name, pair_base="BTC"):
+        symbol = get_instruments(self.name).symbol(coin_name, pair_base)
+        return await self.provider.get_price(symbol)
+
+    async def get_open_orders(self, coin_name, pair_base="BTC"):
+        return await self.provider.get_open_orders(coin_name, pair_base)
+
+    async def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
+        return await self.provider.get_all_orders(coin_name, limit=limit, pair_base=pair_base)
+
+    async def get_prices(self):
+        return await self.provider.get_prices()
+
+    async def get_symbol_info(self, coin_name=None, pair_base="BTC", symbol=None):
+        if symbol:
+            return await self.provider.get_symbol_info(symbol=symbol)
+        return await self.provider.get_symbol_info(coin_name, pair_base)
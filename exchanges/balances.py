@@ -0,0 +1,308 @@
+from os import environ
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds a snapshot is trusted while no private stream keeps the ledger current
+MAX_AGE = float(environ.get("BALANCE_MAX_AGE", 30))
+# Seconds between reconciliations of a streamed ledger against a full snapshot
+RECONCILE_INTERVAL = float(environ.get("BALANCE_RECONCILE_INTERVAL", 300))
+# Differences of a free balance below it are not reported as drift
+TOLERANCE = 1e-12
+
+
+class Balance():
+    """Free and locked amount of one asset; `version` is the exchange time (ms) it is as of"""
+    __slots__ = ("free", "locked", "version")
+
+    def __init__(self, free, locked, version):
+        self.free = free
+        self.locked = locked
+        self.version = version
+
+    def __repr__(self):
+        return f"Balance(free={self.free}, locked={self.locked})"
+
+
+class BalanceLedger():
+    """Balances of one account kept in memory
+
+    The ledger starts from one full account snapshot and, once attached to
+    the account's private stream (see `attach`), is kept current by its
+    balance events and reconciled against a new snapshot every `interval`
+    seconds. Without a live stream a snapshot is trusted for `max_age`
+    seconds and reloaded on the next read after that, or right after an
+    order of the account (see `invalidate`). Every update carries the
+    exchange time it is as of, so events older than what the ledger holds,
+    e.g. replayed after a snapshot, are ignored.
+    """
+
+    def __init__(self, exchange, snapshot=None, max_age=None, interval=None):
+        """
+        Args:
+            exchange (string): Name of exchange
+            snapshot (callable): Returns the account balances as {asset: (free, locked)}
+                and the exchange time (ms) they are as of, None if the exchange has none
+            max_age (float): Seconds a snapshot is used without a live stream
+            interval (float): Seconds between reconciliations while streaming
+        """
+        self.exchange = exchange
+        self.snapshot = snapshot
+        self.max_age = float(max_age if max_age is not None else MAX_AGE)
+        self.interval = float(interval if interval is not None else RECONCILE_INTERVAL)
+        self.streaming = False
+        self.loaded_at = None
+        self.updates = 0
+        self.reconciles = 0
+        self.drifts = 0
+        self.invalidations = 0
+        self._loaded_invalidations = 0
+        self._balances = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reconciler = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    @property
+    def synced(self):
+        """Whether reads can be answered from memory"""
+        if self.loaded_at is None or self._loaded_invalidations != self.invalidations:
+            return False
+        return self.streaming or time.time() - self.loaded_at <= self.max_age
+
+    def load(self, balances, version=None, invalidations=None):
+        """Replace the balances with a full account snapshot
+
+        Assets updated by the stream after the snapshot was taken keep their
+        streamed balance.
+
+        Args:
+            balances (dict): {asset: (free, locked)} of every asset of the account
+            version (float): Exchange time (ms) the snapshot is as of, now by default
+            invalidations (int): `invalidations` when the snapshot was requested,
+                an order placed meanwhile keeps the ledger unsynced
+
+        Returns:
+            dict: {asset: (held, snapshot)} free balances that differed from the snapshot.
+        """
+        version = version or time.time() * 1000
+        drift = {}
+        with self._lock:
+            current = self._balances
+            fresh = {asset: balance for asset, balance in current.items() if balance.version > version}
+            for asset, (free, locked) in balances.items():
+                if asset in fresh:
+                    continue
+                free = float(free)
+                held = current.get(asset)
+                if self.loaded and abs((held.free if held else 0.0) - free) > TOLERANCE:
+                    drift[asset] = (held.free if held else 0.0, free)
+                fresh[asset] = Balance(free, float(locked or 0), version)
+            if self.loaded:
+                for asset, held in current.items():
+                    if asset not in fresh and held.free > TOLERANCE:
+                        drift[asset] = (held.free, 0.0)
+            self._balances = fresh
+            self.loaded_at = time.time()
+            self._loaded_invalidations = self.invalidations if invalidations is None else invalidations
+        return drift
+
+    def refresh(self, force=False):
+        """Load a snapshot, once at a time: concurrent callers wait for the same load
+
+        Returns:
+            dict: Drift found, see `load`.
+        """
+        if self.snapshot is None:
+            raise Exception(f"No balance snapshot source for {self.exchange}")
+        seen = self.loaded_at
+        with self._refresh_lock:
+            if not force and self.loaded_at != seen and self.synced:
+                return {}
+            requested = time.time() * 1000
+            invalidations = self.invalidations
+            balances, version = self.snapshot()
+            return self.load(balances, version or requested, invalidations)
+
+    def reconcile(self):
+        """Compare the ledger with a fresh snapshot and adopt the snapshot
+
+        Returns:
+            dict: Drift found, see `load`.
+        """
+        drift = self.refresh(force=True)
+        self.reconciles += 1
+        if drift:
+            self.drifts += len(drift)
+            logger.warning(f"{self.exchange} balances drifted from the account snapshot: {drift}")
+        return drift
+
+    def invalidate(self):
+        """Reload on the next read, unless a live stream reports the change
+
+        Called after every order of the account: without a stream nothing
+        tells the ledger what the order locked or filled.
+        """
+        if not self.streaming:
+            with self._lock:
+                self.invalidations += 1
+
+    def set(self, asset, free, locked=0.0, version=None):
+        """Apply the absolute balance of an asset unless the ledger holds a newer one"""
+        version = version or time.time() * 1000
+        with self._lock:
+            held = self._balances.get(asset)
+            if held is not None and held.version > version:
+                return False
+            self._balances[asset] = Balance(float(free), float(locked or 0), version)
+            self.updates += 1
+        return True
+
+    def add(self, asset, delta, version=None):
+        """Apply a change of the free balance unless a balance as of its time is held already"""
+        version = version or time.time() * 1000
+        with self._lock:
+            held = self._balances.get(asset)
+            if held is not None and held.version >= version:
+                return False
+            self._balances[asset] = Balance(
+                (held.free if held else 0.0) + float(delta), held.locked if held else 0.0, version)
+            self.updates += 1
+        return True
+
+    def update_from_binance(self, msg):
+        """Apply a Binance user data stream event
+
+        outboundAccountPosition carries the new balances of the assets that
+        changed, balanceUpdate the change of a deposit, withdrawal or transfer.
+        """
+        event = msg.get("e")
+        if event == "outboundAccountPosition":
+            version = msg.get("u") or msg.get("E")
+            for item in msg.get("B", ()):
+                self.set(item["a"], item["f"], item["l"], version)
+        elif event == "balanceUpdate":
+            self.add(msg["a"], msg["d"], msg.get("T") or msg.get("E"))
+
+    def update_from_kucoin(self, msg):
+        """Apply a KuCoin /account/balance message of the trade account"""
+        data = msg.get("data") or {}
+        relation = data.get("relationEvent") or "trade."
+        if not relation.startswith("trade.") or not data.get("currency"):
+            return
+        self.set(data["currency"], data["available"], data.get("hold"), int(data.get("time") or 0) or None)
+
+    def get(self, asset):
+        """Balance of an asset or None when the account holds none
+
+        Served from memory; a snapshot is loaded first when the ledger is
+        not synced.
+        """
+        if not self.synced:
+            self.refresh()
+        return self._balances.get(asset)
+
+    def free(self, asset):
+        balance = self.get(asset)
+        return balance.free if balance is not None else 0.0
+
+    def has(self, asset, quantity=None):
+        """Whether the free balance of an asset covers `quantity`, or is positive without one"""
+        free = self.free(asset)
+        return free >= float(quantity) if quantity else free > 0
+
+    def balances(self):
+        """{asset: (free, locked)} of every asset held"""
+        return {asset: (balance.free, balance.locked) for asset, balance in list(self._balances.items())}
+
+    def attach(self, stream):
+        """Keep the ledger current from a private stream and start reconciling
+
+        Args:
+            stream (object): e.g `BinanceUserStream`, calls `connected` on
+                every (re)connection and `disconnected` when it drops
+        """
+        if self.exchange == "binance":
+            stream.subscribe("outboundAccountPosition", self.update_from_binance)
+            stream.subscribe("balanceUpdate", self.update_from_binance)
+        elif self.exchange == "kucoin":
+            stream.subscribe("/account/balance", self.update_from_kucoin)
+        else:
+            raise Exception(f"No private balance stream for {self.exchange}")
+        stream.on_connect.append(self.connected)
+        stream.on_disconnect.append(self.disconnected)
+        self.start()
+
+    def connected(self):
+        """Reload in the background: events sent while the stream was down are lost"""
+        threading.Thread(target=self._resync, name=f"{self.exchange}-balances", daemon=True).start()
+
+    def disconnected(self):
+        self.streaming = False
+
+    def _resync(self):
+        try:
+            self.reconcile()
+            self.streaming = True
+        except Exception as ex:
+            logger.error(f"Error loading {self.exchange} balances: {ex}")
+
+    def start(self):
+        """Start the background reconciliation if not running yet"""
+        with self._lock:
+            if self._reconciler and self._reconciler.is_alive():
+                return
+            self._stop.clear()
+            self._reconciler = threading.Thread(
+                target=self._run, name=f"{self.exchange}-reconcile", daemon=True)
+        self._reconciler.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.streaming:
+                continue
+            try:
+                self.reconcile()
+            except Exception as ex:
+                logger.error(f"Error reconciling {self.exchange} balances: {ex}")
+
+    def stats(self):
+        return {
+            "exchange": self.exchange,
+            "assets": len(self._balances),
+            "streaming": self.streaming,
+            "updates": self.updates,
+            "reconciles": self.reconciles,
+            "drifts": self.drifts,
+            "loaded_at": self.loaded_at,
+        }
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_ledger(exchange, account, snapshot=None):
+    """Return the process wide balance ledger of an account
+
+    Args:
+        exchange (string): Name of exchange
+        account (string): Account the ledger belongs to e.g its api key
+        snapshot (callable): Snapshot source, set when the ledger has none yet
+    """
+    with _ledgers_lock:
+        ledger = _ledgers.get((exchange, account))
+        if ledger is None:
+            ledger = _ledgers[(exchange, account)] = BalanceLedger(exchange)
+        if ledger.snapshot is None:
+            ledger.snapshot = snapshot
+        return ledger
@@ -0,0 +1,203 @@
+from os import environ
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from core.exceptions import UserAdviceException
+from core.singleflight import coalesce
+from ..balances import get_ledger
+from ..clients import async_sessions
+from ..ratelimit import get_limiter
+from ..instruments import get_instruments
+from ..metadata import get_symbol_cache
+from ..orders import from_binance, get_order_store
+from ..pricebook import get_price_book
+from ..quantize import to_str
+from .service import BinanceService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBinanceService(BinanceService):
+    """Awaitable Binance service sharing one aiohttp session per process
+
+    Order sizing helpers are inherited from `BinanceService`; every method
+    that talks to Binance is a coroutine.
+    """
+    name = 'binance'
+    API_URL = environ.get("BINANCE_API_URL", "https://api.binance.com/api")
+
+    def __init__(self, **kwargs):
+        self.api_key = kwargs["api_key"]
+        self.api_secret = kwargs["api_secret"]
+
+        if not all([self.api_key, self.api_secret]):
+            raise Exception(
+                f"Both api_key and api_secret are required for {self.name} exchange")
+
+        self.debug_mode = environ.get("DEBUG", False)
+        # Started on first use, see `_load_symbol`: the first load blocks on the database
+        self.symbols = get_symbol_cache("stepsizes")
+        self.prices = get_price_book("binance")
+        self.balances = get_ledger("binance", self.api_key)
+        self.orders = get_order_store("binance", self.api_key)
+        self.instruments = get_instruments("binance")
+        self._quantizers = {}
+
+    async def _request(self, method, path, signed=False, **params):
+        # Queue first: a timestamp signed before waiting could leave the recvWindow
+        limiter = get_limiter(self.name)
+        if limiter:
+            await limiter.acquire_async(method, f"/{path}", self.api_key)
+
+        params = {key: value for key, value in params.items() if value is not None}
+        if signed:
+            params["timestamp"] = int(time.time() * 1000)
+        query = urlencode(params)
+        if signed:
+            signature = hmac.new(self.api_secret.encode("utf-8"),
+                                 query.encode("utf-8"), hashlib.sha256).hexdigest()
+            query = f"{query}&signature={signature}"
+
+        session = async_sessions.get(self.name)
+        url = f"{self.API_URL}/{path}?{query}" if query else f"{self.API_URL}/{path}"
+        async with session.request(method, url, headers={"X-MBX-APIKEY": self.api_key}) as response:
+            if limiter:
+                limiter.update(response.status, response.headers, self.api_key)
+            data = await response.json(content_type=None)
+            if response.status >= 400:
+                raise Exception(
+                    f"Binance API error {response.status}: {data}")
+            return data
+
+    async def get_account(self):
+        return await self._request("GET", "v3/account", signed=True)
+
+    async def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        try:
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            await self._load_symbol(symbol)
+            precision = self.get_precision(symbol)
+            current_price = await self.get_price(symbol, precision, side="BUY")
+            quantity = self.calculate_buy_qty(
+                price=current_price, amount=amount, quantizer=self.get_quantizer(symbol))
+            return await self._create_order(symbol, "BUY", quantity, amount, order_type)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise UserAdviceException(ex)
+
+    async def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        try:
+            if not await self.has_coin(coin_name):
+                raise UserAdviceException(
+                    f"Balance not enough to execute action in {self.name} exchange")
+
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            await self._load_symbol(symbol)
+            precision = self.get_precision(symbol)
+            current_price = await self.get_price(symbol, precision, side="SELL")
+            quantity = self.calculate_sell_qty(
+                price=current_price, amount=amount, quantizer=self.get_quantizer(symbol))
+            return await self._create_order(symbol, "SELL", quantity, amount, order_type)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise UserAdviceException(ex)
+
+    async def _load_symbol(self, symbol):
+        """Look up a symbol missing from the metadata cache off the event loop
+
+        `get_precision` and `get_quantizer` are then served from memory.
+        The cache itself is loaded and started here the first time.
+        """
+        loop = asyncio.get_running_loop()
+        if not self.symbols.loaded:
+            await loop.run_in_executor(None, self.symbols.start)
+            if not self.instruments.loaded and self.symbols.loaded:
+                self.instruments.load(self.symbols.documents())
+        if not self.symbols.cached(symbol):
+            await loop.run_in_executor(None, self.symbols.get, symbol)
+
+    async def _create_order(self, symbol, side, quantity, amount, order_type):
+        logger.info(
+            f"{side} order request:{symbol}>type:{order_type}>quantity:{quantity} > {amount}")
+        if order_type == "limit":
+            order = await self._request("POST", "v3/order", signed=True, symbol=symbol, side=side,
+                                        type="LIMIT", quantity=to_str(quantity), timeInForce="GTC",
+                                        price=to_str(self.get_quantizer(symbol).floor_price(amount)))
+        else:
+            order = await self._request("POST", "v3/order", signed=True, symbol=symbol, side=side,
+                                        type="MARKET", quantity=to_str(quantity))
+        self.orders.update(from_binance(order))
+        self.balances.invalidate()
+        return order
+
+    @coalesce()
+    async def get_price(self, symbol, precision=8, side=None):
+        quote = self.prices.get(symbol)
+        if quote and quote.price(side):
+            return round(Decimal(quote.price(side)), precision)
+        price_info = await self._request("GET", "v3/ticker/price", symbol=symbol)
+        return round(Decimal(price_info.get("price")), precision)
+
+    async def get_balance(self, coin_name):
+        if not self.balances.synced:
+            await self.load_balances()
+        balance = self.balances.get(coin_name)
+        if balance is None:
+            raise UserAdviceException(
+                f"Coin not found in account in {self.name} exchange")
+        return balance.free
+
+    async def has_coin(self, coin_name, quantity=None):
+        if not self.balances.synced:
+            await self.load_balances()
+        return self.balances.has(coin_name, quantity)
+
+    @coalesce(per_account=True)
+    async def load_balances(self):
+        """Load the account's balance ledger from one account call"""
+        requested = time.time() * 1000
+        invalidations = self.balances.invalidations
+        account = await self.get_account()
+        return self.balances.load({item["asset"]: (item["free"], item["locked"])
+                                   for item in account.get("balances", [])},
+                                  account.get("updateTime") or requested, invalidations)
+
+    @coalesce()
+    async def get_prices(self):
+        tickers = await self._request("GET", "v3/ticker/bookTicker")
+        return [{"symbol": item["symbol"], "price": item["bidPrice"], "bid": item["bidPrice"], "ask": item["askPrice"]}
+                for item in tickers]
+
+    @coalesce()
+    async def get_symbol_info(self, coin_name=None, pair_base="BTC", symbol=None):
+        if not symbol:
+            if not coin_name and pair_base:
+                raise Exception(
+                    "Both coin name and base is required where symbol not specified")
+            symbol = self.instruments.symbol(coin_name, pair_base)
+        info = await self._request("GET", "v3/exchangeInfo", symbol=symbol)
+        for item in info.get("symbols", []):
+            if item["symbol"] == symbol:
+                return item
+
+    async def get_open_orders(self, coin_name, pair_base="BTC"):
+        """Open orders of a pair, see `BinanceService.get_open_orders`"""
+        symbol = self.instruments.symbol(coin_name, pair_base)
+        if self.orders.streaming:
+            return [order.as_dict() for order in self.orders.open_orders(symbol)]
+        orders = [from_binance(order) for order in
+                  await self._request("GET", "v3/openOrders", signed=True, symbol=symbol)]
+        self.orders.load(orders)
+        return [order.as_dict() for order in orders]
+
+    async def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
+        symbol = self.instruments.symbol(coin_name, pair_base)
+        orders = [from_binance(order) for order in
+                  await self._request("GET", "v3/allOrders", signed=True, symbol=symbol, limit=limit)]
+        self.orders.load(orders)
+        return [order.as_dict() for order in orders]
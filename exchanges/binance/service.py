@@ -1,22 +1,41 @@
 from os import environ
+import functools
 import logging
 import math
+import time
 from decimal import Decimal
-from core.database import db_client
 
 from binance.client import Client
 from binance.exceptions import (
     BinanceRequestException, BinanceAPIException, BinanceWithdrawException)
 
 from core.exceptions import (UserAdviceException, ValidationException)
+from core.metrics import stage
+from core.singleflight import coalesce
 from ..interface import ServiceInterface
-from ..helpers import calculate_lcm
+from ..balances import get_ledger
+from ..clients import clients
+from ..helpers import calculate_lcm, run_concurrently
+from ..history import OrderHistorySync, account_id
+from ..instruments import get_instruments
+from ..metadata import get_symbol_cache, sync_symbols
+from ..orderbook import get_order_books
+from ..orders import from_binance, get_order_store
+from ..pricebook import get_price_book
+from ..quantize import Quantizer, to_str
 
 logger = logging.getLogger(__name__)
 
+METADATA_STAGE = stage("metadata")
+PRICE_STAGE = stage("price")
+ORDER_HTTP_STAGE = stage("order_http")
+# Largest page of allOrders
+HISTORY_PAGE_SIZE = 1000
+
 
 class BinanceService(ServiceInterface):
     name = 'binance'
+    exchange = 'binance'
 
     def __init__(self, **kwargs):
         api_key = kwargs["api_key"]
@@ -26,24 +45,43 @@ class BinanceService(ServiceInterface):
             raise Exception(
                 f"Both api_key and api_secret are required for {name} exchange")
 
-        self.client = Client(api_key, api_secret)
+        self.api_key = api_key
+        self.client = clients.get("binance", api_key, api_secret)
         self.debug_mode = environ.get("DEBUG", False)
+        self.symbols = get_symbol_cache("stepsizes")
+        self.symbols.start()
+        self.prices = get_price_book("binance")
+        self.books = get_order_books("binance")
+        self.balances = get_ledger("binance", api_key, self._balance_snapshot)
+        self.orders = get_order_store("binance", api_key, self._open_orders, self._fetch_order)
+        self.instruments = get_instruments("binance")
+        if not self.instruments.loaded and self.symbols.loaded:
+            self.instruments.load(self.symbols.documents())
+        self._quantizers = {}
 
     def get_account(self):
         return self.client.get_account()
 
     def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
         try:
-            symbol = f"{coin_name}{pair_base}".upper()
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            started = time.perf_counter()
             precision = self.get_precision(symbol)
-            current_price = self.get_price(symbol, precision)
-            step_size = self.get_step_size(symbol)
+            quantizer = self.get_quantizer(symbol)
+            fetched = time.perf_counter()
+            if order_type == "limit":
+                current_price = self.get_price(symbol, precision, side=Client.SIDE_BUY)
+            else:
+                current_price = self.get_fill_price(symbol, Client.SIDE_BUY, amount, precision)
+            priced = time.perf_counter()
+            METADATA_STAGE.observe(fetched - started)
+            PRICE_STAGE.observe(priced - fetched)
 
             quantity = self.calculate_buy_qty(
-                price=current_price, amount=amount, step_size=step_size)
+                price=current_price, amount=amount, quantizer=quantizer)
 
             logger.info(
-                f"step_size>{step_size}>price>{current_price} > Amount > {amount} > precision: {precision} > qty: {quantity}")
+                f"step_size>{quantizer.step_size}>price>{current_price} > Amount > {amount} > precision: {precision} > qty: {quantity}")
 
             side = Client.SIDE_BUY
             time_in_force = None
@@ -56,17 +94,17 @@ class BinanceService(ServiceInterface):
             if order_type == Client.ORDER_TYPE_LIMIT:
                 logger.info(
                     f"{side} order request:{symbol}>type:{order_type}>quantity:{quantity} > {amount}")
-                order = self.client.create_order(
+                order = self._create_order(
                     symbol=symbol,
                     side=side,
                     type=order_type,
                     quantity=quantity,
                     timeInForce=time_in_force,
-                    price=amount)
+                    price=quantizer.floor_price(amount))
             else:
                 logger.info(
                     f"{side} order request:{symbol}>type:{order_type}>quantity:{quantity} > {current_price}")
-                order = self.client.create_order(
+                order = self._create_order(
                     symbol=symbol,
                     side=side,
                     type=order_type,
@@ -78,18 +116,24 @@ class BinanceService(ServiceInterface):
 
     def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
         try:
-            balance = self.get_balance(coin_name)
-            if not balance:
+            if not self.has_coin(coin_name):
                 raise UserAdviceException(
                     f"Balance not enough to execute action in {name} exchange")
 
-            symbol = f"{coin_name}{pair_base}".upper()
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            started = time.perf_counter()
             precision = self.get_precision(symbol)
-
-            current_price = self.get_price(symbol, precision)
-            step_size = self.get_step_size(symbol)
+            quantizer = self.get_quantizer(symbol)
+            fetched = time.perf_counter()
+            if order_type == "limit":
+                current_price = self.get_price(symbol, precision, side=Client.SIDE_SELL)
+            else:
+                current_price = self.get_fill_price(symbol, Client.SIDE_SELL, amount, precision)
+            priced = time.perf_counter()
+            METADATA_STAGE.observe(fetched - started)
+            PRICE_STAGE.observe(priced - fetched)
             quantity = self.calculate_sell_qty(
-                price=current_price, amount=amount, step_size=step_size)
+                price=current_price, amount=amount, quantizer=quantizer)
 
             side = Client.SIDE_SELL
             time_in_force = None
@@ -103,15 +147,15 @@ class BinanceService(ServiceInterface):
                 f"{side} order request:{symbol}>type:{order_type}>quantity:{quantity} >> current_price: {current_price}")
 
             if order_type == Client.ORDER_TYPE_LIMIT:
-                order = self.client.create_order(
+                order = self._create_order(
                     symbol=symbol,
                     side=side,
                     type=order_type,
                     quantity=quantity,
                     timeInForce=time_in_force,
-                    price=amount)
+                    price=quantizer.floor_price(amount))
             else:
-                order = self.client.create_order(
+                order = self._create_order(
                     symbol=symbol,
                     side=side,
                     type=order_type,
@@ -121,9 +165,68 @@ class BinanceService(ServiceInterface):
             logger.error(ex, exc_info=True)
             raise UserAdviceException(ex)
 
+    def place_many(self, side, orders):
+        """Size a basket from one bulk price lookup and place it concurrently
+
+        Quotes come from the price book and, for symbols it lacks, from one
+        all-symbols book ticker call; lot sizes come from the metadata cache
+        and sells are checked against the balance ledger. Spot has no batch
+        order endpoint, so the orders go out in parallel through the shared
+        rate limiter.
+        """
+        side = Client.SIDE_BUY if side.lower() == "buy" else Client.SIDE_SELL
+        symbols = [self.instruments.symbol(order['coin_name'], order.get('pair_base', 'BTC')) for order in orders]
+
+        prices = {}
+        for symbol in set(symbols):
+            quote = self.prices.get(symbol)
+            if quote and quote.price(side):
+                prices[symbol] = quote.price(side)
+        missing = set(symbols) - set(prices)
+        if missing:
+            field = "askPrice" if side == Client.SIDE_BUY else "bidPrice"
+            # v3 book ticker without a symbol: every symbol in one call
+            for ticker in self.client.get_orderbook_ticker():
+                if ticker["symbol"] in missing:
+                    prices[ticker["symbol"]] = ticker[field]
+
+        balances = self.balances if side == Client.SIDE_SELL else None
+
+        calls = [functools.partial(self._place_sized, side, symbol, prices.get(symbol), balances, **order)
+                 for symbol, order in zip(symbols, orders)]
+        return run_concurrently(calls)
+
+    def _place_sized(self, side, symbol, price, balances, coin_name, amount=None, quantity=None,
+                     pair_base="BTC", order_type="market"):
+        if price is None:
+            raise UserAdviceException(f"No price for {symbol} in {self.name} exchange")
+        if balances is not None and not balances.has(coin_name):
+            raise UserAdviceException(
+                f"Balance not enough to execute action in {self.name} exchange")
+        quantizer = self.get_quantizer(symbol)
+        quantity = self.calculate_buy_qty(price=price, amount=amount, quantizer=quantizer)
+        if order_type == "limit":
+            return self._create_order(symbol=symbol, side=side, type=Client.ORDER_TYPE_LIMIT,
+                                      quantity=quantity, timeInForce="GTC",
+                                      price=quantizer.floor_price(amount))
+        return self._create_order(symbol=symbol, side=side, type=Client.ORDER_TYPE_MARKET,
+                                  quantity=quantity)
+
+    def _create_order(self, **params):
+        # str() of a small Decimal is scientific notation, which Binance rejects
+        params.update({key: to_str(params[key]) for key in ("quantity", "price") if params.get(key) is not None})
+        started = time.perf_counter()
+        try:
+            order = self.client.create_order(**params)
+        finally:
+            ORDER_HTTP_STAGE.observe(time.perf_counter() - started)
+        self.orders.update(from_binance(order))
+        self.balances.invalidate()
+        return order
+
     def get_precision(self, symbol):
         try:
-            step = db_client.stepsizes.find_one({"symbol": symbol})
+            step = self.symbols.get(symbol)
             if step:
                 return step["baseAssetPrecision"]
             return 8
@@ -133,7 +236,7 @@ class BinanceService(ServiceInterface):
 
     def get_step_size(self, symbol):
         try:
-            step = db_client.stepsizes.find_one({"symbol": symbol})
+            step = self.symbols.get(symbol)
             if step:
                 return float(step["lot_size"]["stepSize"])
             return float(0.0)
@@ -143,7 +246,7 @@ class BinanceService(ServiceInterface):
 
     def get_min_notional(self, symbol):
         try:
-            step = db_client.stepsizes.find_one({"symbol": symbol})
+            step = self.symbols.get(symbol)
             if step:
                 return float(step["min_notional"]["minNotional"])
             return float(0.0)
@@ -151,7 +254,16 @@ class BinanceService(ServiceInterface):
             logger.error("Error retriving step size")
             return float(0.0)
 
-    def get_price(self, symbol, precision=8):
+    @coalesce()
+    def get_price(self, symbol, precision=8, side=None):
+        """Current price of a symbol
+
+        Served from the stream-fed price book while it is fresh (best ask to
+        buy, best bid to sell), otherwise from the REST ticker.
+        """
+        quote = self.prices.get(symbol)
+        if quote and quote.price(side):
+            return round(Decimal(quote.price(side)), precision)
         try:
             price_info = self.client.get_symbol_ticker(symbol=symbol)
             return round(Decimal(price_info.get("price")), precision)
@@ -159,29 +271,50 @@ class BinanceService(ServiceInterface):
             logger.error(ex, exc_info=True)
             raise Exception(ex)
 
-    def calculate_sell_qty(self, price, amount, step_size):
-        quantity = float(amount)/float(price)
-        step_precision_decimal = str(step_size).split(".")[1]
-        step_precision = len(step_precision_decimal) if int(
-            step_precision_decimal) > 0 else 0
+    def get_fill_price(self, symbol, side, amount, precision=8):
+        """Expected average price of a market order for `amount` quote
 
-        abs_quantity = round(quantity, step_precision)
-        print(f"price:{price}: amount:{amount} :quantity::::{quantity}: abs_quantity: {abs_quantity}:::step_precision:{step_precision}")
-        return abs_quantity
+        Walks the local order book while it is synced and deep enough for
+        the order, so sizing accounts for slippage on thin pairs; otherwise
+        falls back to `get_price`.
+        """
+        book = self.books.get(symbol)
+        if book is not None and amount:
+            fill = book.fill(side, amount=amount)
+            if fill.complete:
+                logger.debug(f"{symbol} {side} fill: {fill} > slippage: {fill.slippage}")
+                return round(Decimal(fill.vwap), precision)
+        return self.get_price(symbol, precision, side=side)
+
+    def get_quantizer(self, symbol):
+        """Quantizer prebuilt from the symbol's lot size, tick size and min notional
+
+        Rebuilt only when the metadata cache hands out a new document.
+        """
+        try:
+            document = self.symbols.get(symbol)
+        except Exception as ex:
+            logger.error("Error retriving step size")
+            document = None
+        cached = self._quantizers.get(symbol)
+        if cached is None or cached[0] is not document:
+            cached = self._quantizers[symbol] = (
+                document, Quantizer.from_binance(document))
+        return cached[1]
 
-    def calculate_buy_qty(self, price, amount, step_size):
-        quantity = float(amount)/float(price)
-        step_precision_decimal = str(step_size).split(".")[1]
-        step_precision = len(step_precision_decimal) if int(
-            step_precision_decimal) > 0 else 0
+    def calculate_sell_qty(self, price, amount, step_size=None, quantizer=None):
+        quantizer = quantizer or Quantizer(step_size)
+        return quantizer.qty_for_amount(amount, price)
 
-        abs_quantity = round(quantity, step_precision)
-        print(f"price:{price}: amount:{amount} :quantity::::{quantity}: abs_quantity: {abs_quantity}:::step_precision:{step_precision}")
-        return abs_quantity
+    def calculate_buy_qty(self, price, amount, step_size=None, quantizer=None):
+        quantizer = quantizer or Quantizer(step_size)
+        return quantizer.qty_for_amount(amount, price)
 
     def get_balance(self, coin_name):
         """Query coin balance in exchange account
 
+        Served from the account's balance ledger, see `exchanges.balances`.
+
         Args:
             coin_name (string): Name of coin
 
@@ -193,11 +326,48 @@ class BinanceService(ServiceInterface):
 
         """
         try:
-            balance_info = self.client.get_asset_balance(coin_name)
-            if not balance_info:
+            balance = self.balances.get(coin_name)
+            if balance is None:
                 raise UserAdviceException(
                     f"Coin not found in account in {self.name} exchange")
-            return balance_info.get("free")
+            return balance.free
+        except (BinanceAPIException, BinanceRequestException) as ex:
+            logger.error(ex, exc_info=True)
+            raise Exception(ex)
+
+    def has_coin(self, coin_name, quantity=None):
+        """Whether the free balance of a coin covers `quantity` (or is positive), from memory"""
+        return self.balances.has(coin_name, quantity)
+
+    def _balance_snapshot(self):
+        # updateTime is the exchange time of the account's last change
+        account = self.client.get_account()
+        return ({item["asset"]: (item["free"], item["locked"]) for item in account.get("balances", [])},
+                account.get("updateTime"))
+
+    def update_step_sizes(self):
+        """Sync the `stepsizes` collection with one exchange info call
+
+        Returns:
+            dict: Counts of listed, upserted and removed symbols.
+        """
+        try:
+            info = self.client.get_exchange_info()
+            documents = []
+            for item in info.get("symbols", []):
+                filters = {rule["filterType"]: rule for rule in item.get("filters", [])}
+                documents.append({
+                    "symbol": item["symbol"],
+                    "baseAsset": item.get("baseAsset"),
+                    "quoteAsset": item.get("quoteAsset"),
+                    "status": item.get("status"),
+                    "baseAssetPrecision": item.get("baseAssetPrecision", 8),
+                    "lot_size": filters.get("LOT_SIZE"),
+                    "price_filter": filters.get("PRICE_FILTER"),
+                    "min_notional": filters.get("MIN_NOTIONAL") or filters.get("NOTIONAL"),
+                })
+            self.instruments.load(documents)
+            return sync_symbols("stepsizes", documents)
         except (BinanceAPIException, BinanceRequestException) as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
@@ -205,24 +375,28 @@ class BinanceService(ServiceInterface):
     def track_coin(self, payload):
         pass
 
+    @coalesce()
     def get_prices(self):
-        """Returns a list of symbols and their prices
+        """Returns a list of symbols, their price and best bid/ask
 
-        API: https://python-binance.readthedocs.io/en/latest/binance.html#binance.client.Client.get_symbol_ticker
+        The price is the best bid, like KuCoin's, read from the book ticker so
+        spreads are computed on quotes rather than last trades.
+
+        API: https://python-binance.readthedocs.io/en/latest/binance.html#binance.client.Client.get_orderbook_ticker
         Return Example:
             [
-                {
-                    "symbol": "LTCBTC",
-                    "price": "4.00000200"
-                },
                 {
                     "symbol": "ETHBTC",
-                    "price": "0.07946600"
+                    "price": "0.07946600",
+                    "bid": "0.07946600",
+                    "ask": "0.07947300"
                 }
             ]
         """
-        return self.client.get_symbol_ticker()
+        return [{"symbol": item["symbol"], "price": item["bidPrice"], "bid": item["bidPrice"], "ask": item["askPrice"]}
+                for item in self.client.get_orderbook_ticker()]
 
+    @coalesce()
     def get_symbol_info(self, coin_name=None, pair_base="BTC", symbol=None):
         """
         Reference:
@@ -233,7 +407,7 @@ class BinanceService(ServiceInterface):
                 if not coin_name and pair_base:
                     raise Exception(
                         "Both coin name and base is required where symbol not specified")
-                symbol = f"{coin_name}{pair_base}".upper()
+                symbol = self.instruments.symbol(coin_name, pair_base)
             info = self.client.get_symbol_info(symbol=symbol)
             return info
         except (BinanceAPIException, BinanceRequestException) as ex:
@@ -241,21 +415,62 @@ class BinanceService(ServiceInterface):
             raise Exception(ex)
 
     def get_open_orders(self, coin_name, pair_base="BTC"):
+        """Open orders of a pair, see `Order.as_dict`
+
+        Served from the order store while the user data stream keeps it
+        current, otherwise over REST.
+        """
         try:
-            symbol = f"{coin_name}{pair_base}".upper()
-            orders = self.client.get_open_orders(symbol=symbol)
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            if self.orders.streaming:
+                return [order.as_dict() for order in self.orders.open_orders(symbol)]
+            orders = [from_binance(order) for order in self.client.get_open_orders(symbol=symbol)]
+            self.orders.load(orders)
             logger.debug(f"orders: {orders}")
-            return orders
+            return [order.as_dict() for order in orders]
         except (BinanceAPIException, BinanceRequestException) as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
 
     def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
+        """Latest `limit` orders of a pair over REST, see `Order.as_dict`"""
         try:
-            symbol = f"{coin_name}{pair_base}".upper()
-            orders = self.client.get_all_orders(symbol=symbol, limit=limit)
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            orders = [from_binance(order) for order in self.client.get_all_orders(symbol=symbol, limit=limit)]
+            self.orders.load(orders)
             logger.debug(f"orders: {orders}")
-            return orders
+            return [order.as_dict() for order in orders]
         except (BinanceAPIException, BinanceRequestException) as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
+
+    def sync_order_history(self, symbols=None):
+        """Copy the order history of symbols into the database, incrementally
+
+        Pages through allOrders with an order id cursor, see
+        `exchanges.history.OrderHistorySync`. Without `symbols` the symbols
+        synced before are resumed.
+
+        Returns:
+            dict: Counts of symbols and orders written, and errors per symbol.
+        """
+        return OrderHistorySync("binance", account_id(self.api_key), self._order_history_pages,
+                                lambda order: int(order.order_id)).run(symbols)
+
+    def _order_history_pages(self, symbol, cursor):
+        order_id = cursor or 0
+        while True:
+            page = self.client.get_all_orders(symbol=symbol, orderId=order_id, limit=HISTORY_PAGE_SIZE)
+            orders = [from_binance(order) for order in page]
+            if orders:
+                order_id = int(orders[-1].order_id) + 1
+            yield orders, order_id
+            if len(page) < HISTORY_PAGE_SIZE:
+                return
+
+    def _open_orders(self):
+        # Every symbol at once, only called to backfill the order store
+        return [from_binance(order) for order in self.client.get_open_orders()]
+
+    def _fetch_order(self, symbol, order_id):
+        return from_binance(self.client.get_order(symbol=symbol, orderId=order_id))
@@ -0,0 +1,148 @@
+from os import environ
+import hashlib
+import hmac
+import logging
+import time
+from urllib.parse import urlencode
+
+from core.exceptions import UserAdviceException
+from core.singleflight import coalesce
+from ..balances import get_ledger
+from ..clients import async_sessions
+from ..instruments import get_instruments
+from ..orders import from_bittrex, get_order_store
+from ..ratelimit import get_limiter
+from .service import BittrexService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBittrexService(BittrexService):
+    """Awaitable Bittrex (API v1.1) service sharing one aiohttp session per process"""
+    name = 'bit'
+    API_URL = environ.get("BITTREX_API_URL", "https://bittrex.com/api/v1.1")
+
+    def __init__(self, **kwargs):
+        self.api_key = kwargs["api_key"]
+        self.api_secret = kwargs["api_secret"]
+
+        if not all([self.api_key, self.api_secret]):
+            raise Exception(
+                f"Both api_key and api_secret are required for {self.name} exchange")
+        self.instruments = get_instruments("bittrex")
+        self.balances = get_ledger("bittrex", self.api_key)
+        self.orders = get_order_store("bittrex", self.api_key)
+        self.debug_mode = environ.get("DEBUG", False)
+
+    async def _request(self, path, signed=False, **params):
+        # Queue before the nonce is signed
+        limiter = get_limiter("bittrex")
+        if limiter:
+            await limiter.acquire_async("GET", f"/{path}", self.api_key)
+
+        url = f"{self.API_URL}/{path}?"
+        if signed:
+            url = f"{url}apikey={self.api_key}&nonce={int(time.time() * 1000)}&"
+        url += urlencode(params)
+        apisign = hmac.new(self.api_secret.encode(), url.encode(), hashlib.sha512).hexdigest()
+
+        session = async_sessions.get("bittrex")
+        async with session.get(url, headers={"apisign": apisign}) as response:
+            if limiter:
+                limiter.update(response.status, response.headers, self.api_key)
+            data = await response.json(content_type=None)
+            if not data.get("success"):
+                raise Exception(data.get("message"))
+            return data.get("result")
+
+    async def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        try:
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            price = await self.get_price(symbol)
+            quantity = self.calculate_buy_qty(price, amount)
+            logger.info(
+                f"buy order request:{symbol}>price:{price}>quantity:{quantity} > order_type: {order_type}")
+            return await self._create_order("buy", symbol, quantity, price, order_type)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise UserAdviceException(ex)
+
+    async def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        try:
+            if not await self.has_coin(coin_name):
+                raise UserAdviceException(
+                    f"Balance not enough to execute action in {self.name} exchange")
+
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            price = await self.get_price(symbol)
+            quantity = self.calculate_sell_qty(price, amount)
+            logger.info(
+                f"sell order request:{symbol}>price:{price}>quantity:{quantity} > order_type: {order_type}")
+            return await self._create_order("sell", symbol, quantity, price, order_type)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise UserAdviceException(ex)
+
+    async def _create_order(self, side, symbol, quantity, price, order_type):
+        """Place a market order, or a limit order at `price`, like `BittrexService`"""
+        if order_type.lower() == "market":
+            order = await self._request(f"market/{side}market", signed=True, market=symbol, quantity=quantity)
+        elif order_type.lower() == "limit":
+            order = await self._request(f"market/{side}limit", signed=True, market=symbol,
+                                        quantity=quantity, rate=price)
+        else:
+            raise Exception(f"Order type {order_type} is not supported in {self.name} exchange")
+        self.balances.invalidate()
+        return order
+
+    @coalesce()
+    async def get_price(self, symbol):
+        price_info = await self._request("public/getticker", market=symbol)
+        return float(price_info.get("Last"))
+
+    async def get_balance(self, coin_name):
+        if not self.balances.synced:
+            await self.load_balances()
+        balance = self.balances.get(coin_name)
+        if balance is None:
+            raise UserAdviceException(
+                f"Coin not found in account in {self.name} exchange")
+        return balance.free
+
+    async def has_coin(self, coin_name, quantity=None):
+        if not self.balances.synced:
+            await self.load_balances()
+        return self.balances.has(coin_name, quantity)
+
+    @coalesce(per_account=True)
+    async def load_balances(self):
+        """Load the account's balance ledger from one balances call"""
+        requested = time.time() * 1000
+        invalidations = self.balances.invalidations
+        balances = await self._request("account/getbalances", signed=True)
+        return self.balances.load({item["Currency"]: (item.get("Available") or 0,
+                                                      (item.get("Balance") or 0) - (item.get("Available") or 0))
+                                   for item in balances or []}, requested, invalidations)
+
+    @coalesce()
+    async def get_prices(self):
+        summaries = await self._request("public/getmarketsummaries")
+        return [{"symbol": item.get("MarketName"), "price": item.get("Last"),
+                 "bid": item.get("Bid"), "ask": item.get("Ask")} for item in summaries]
+
+    @coalesce()
+    async def get_symbol_info(self, coin_name, pair_base="BTC"):
+        return await self._request("public/getmarketsummary", market=self.instruments.symbol(coin_name, pair_base))
+
+    async def get_open_orders(self, coin_name, pair_base="BTC"):
+        orders = [from_bittrex(item) for item in await self._request(
+            "market/getopenorders", signed=True, market=self.instruments.symbol(coin_name, pair_base)) or []]
+        self.orders.load(orders)
+        return [order.as_dict() for order in orders]
+
+    async def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
+        orders = [from_bittrex(item) for item in await self._request(
+            "account/getorderhistory", signed=True, market=self.instruments.symbol(coin_name, pair_base)) or []]
+        orders = orders[:limit]
+        self.orders.load(orders)
+        return [order.as_dict() for order in orders]
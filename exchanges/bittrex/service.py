@@ -2,16 +2,23 @@ from os import environ
 import logging
 import math
 
-from bittrex.bittrex import Bittrex, API_V1_1
 from core.exceptions import (UserAdviceException, ValidationException)
+from core.singleflight import coalesce
 from ..interface import ServiceInterface
+from ..balances import get_ledger
+from ..clients import clients
+from ..metadata import sync_symbols
+from ..orders import from_bittrex, get_order_store
+from ..quantize import Quantizer
 from ..helpers import calculate_lcm
+from ..instruments import get_instruments
 
 logger = logging.getLogger(__name__)
 
 
 class BittrexService(ServiceInterface):
     name = 'bit'
+    exchange = 'bittrex'
 
     def __init__(self, **kwargs):
         api_key = kwargs["api_key"]
@@ -21,7 +28,10 @@ class BittrexService(ServiceInterface):
             raise Exception(
                 f"Both api_key and api_secret are required for {name} exchange")
 
-        self.client = Bittrex(api_key, api_secret, API_V1_1)
+        self.client = clients.get("bittrex", api_key, api_secret)
+        self.instruments = get_instruments("bittrex")
+        self.balances = get_ledger("bittrex", api_key, self._balance_snapshot)
+        self.orders = get_order_store("bittrex", api_key)
         self.debug_mode = environ.get("DEBUG", False)
 
     def get_account(self):
@@ -29,7 +39,7 @@ class BittrexService(ServiceInterface):
 
     def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
         try:
-            symbol = f"{pair_base}-{coin_name}"
+            symbol = self.instruments.symbol(coin_name, pair_base)
             price = self.get_price(symbol)
             quantity = self.calculate_buy_qty(price, amount)
 
@@ -40,11 +50,12 @@ class BittrexService(ServiceInterface):
                 order = self.client.buy_market(
                     market=symbol,
                     quantity=quantity)
-            elif order_type.lower() == "market":
+            elif order_type.lower() == "limit":
                 order = self.client.buy_limit(
                     market=symbol,
                     quantity=quantity,
                     rate=price)
+            self.balances.invalidate()
 
             logger.info(
                 f"Bought order request:{symbol}>price:{price}>quantity:{quantity}> {order}")
@@ -55,12 +66,11 @@ class BittrexService(ServiceInterface):
 
     def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
         try:
-            balance = self.get_balance(coin_name)
-            if not balance:
+            if not self.has_coin(coin_name):
                 raise UserAdviceException(
                     f"Balance not enough to execute action in {name} exchange")
 
-            symbol = f"{pair_base}-{coin_name}"
+            symbol = self.instruments.symbol(coin_name, pair_base)
             price = self.get_price(symbol)
             quantity = self.calculate_sell_qty(price, amount)
 
@@ -71,11 +81,12 @@ class BittrexService(ServiceInterface):
                 order = self.client.sell_market(
                     market=symbol,
                     quantity=quantity)
-            elif order_type.lower() == "market":
+            elif order_type.lower() == "limit":
                 order = self.client.sell_limit(
                     market=symbol,
                     quantity=quantity,
                     rate=price)
+            self.balances.invalidate()
             logger.info(
                 f"Bought order request:{symbol}>price:{price}>quantity:{quantity}> {order}")
             return order
@@ -90,6 +101,7 @@ class BittrexService(ServiceInterface):
             logger.error("Error retriving step size")
             return float(0.0)
 
+    @coalesce()
     def get_price(self, symbol):
         try:
             price_info = self.client.get_ticker(market=symbol)
@@ -99,25 +111,65 @@ class BittrexService(ServiceInterface):
             logger.error(ex, exc_info=True)
             raise Exception(ex)
 
-    def calculate_sell_qty(self, price, amount, step_size=None):
-        quantity = float(amount)/float(price)
-        return float(quantity)
+    def calculate_sell_qty(self, price, amount, step_size=None, quantizer=None):
+        if quantizer is None:
+            quantizer = Quantizer(step_size) if step_size else Quantizer.from_precision(8)
+        return quantizer.qty_for_amount(amount, price)
 
-    def calculate_buy_qty(self, price, amount, step_size=None):
-        quantity = float(amount)/float(price)
-        return float(quantity)
+    def calculate_buy_qty(self, price, amount, step_size=None, quantizer=None):
+        if quantizer is None:
+            quantizer = Quantizer(step_size) if step_size else Quantizer.from_precision(8)
+        return quantizer.qty_for_amount(amount, price)
 
     def get_balance(self, coin_name):
-        pass
+        """Available balance of a coin, from the balance ledger
+
+        Bittrex v1.1 has no private balance stream, so the ledger is
+        reloaded from one balances call once it is `BALANCE_MAX_AGE` old.
+        """
         try:
-            balance_info = self.client.get_balance(coin_name)
-            if not balance_info:
+            balance = self.balances.get(coin_name)
+            if balance is None:
                 raise UserAdviceException(
                     f"Coin not found in account in {self.name} exchange")
-            if not balance_info.get("success"):
-                raise Exception(balance_info.get("message"))
-            result = balance_info.get("result")
-            return float(result.get("Available"))
+            return balance.free
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise Exception(ex)
+
+    def has_coin(self, coin_name, quantity=None):
+        """Whether the free balance of a coin covers `quantity` (or is positive), from memory"""
+        return self.balances.has(coin_name, quantity)
+
+    def _balance_snapshot(self):
+        balances = self.client.get_balances()
+        if not balances.get("success"):
+            raise Exception(balances.get("message"))
+        # v1.1 balances carry no time and there is no stream to order them against
+        return {item["Currency"]: (item.get("Available") or 0,
+                                   (item.get("Balance") or 0) - (item.get("Available") or 0))
+                for item in balances.get("result") or []}, None
+
+    def update_step_sizes(self):
+        """Sync the `bittrex_stepsizes` collection with one markets call
+
+        Bittrex only publishes a minimum trade size, prices and quantities
+        take 8 decimals.
+        """
+        try:
+            markets = self.client.get_markets()
+            if not markets.get("success"):
+                raise Exception(markets.get("message"))
+            documents = [{
+                "symbol": item.get("MarketName"),
+                "baseAsset": item.get("MarketCurrency"),
+                "quoteAsset": item.get("BaseCurrency"),
+                "active": item.get("IsActive"),
+                "minTradeSize": item.get("MinTradeSize"),
+                "precision": 8,
+            } for item in markets.get("result")]
+            self.instruments.load(documents)
+            return sync_symbols("bittrex_stepsizes", documents)
         except Exception as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
@@ -125,12 +177,32 @@ class BittrexService(ServiceInterface):
     def track_coin(self, payload):
         pass
 
+    @coalesce()
     def get_prices(self):
-        pass
+        """Returns a list of markets and their last price
+
+        Return Example:
+            [
+                {
+                    "symbol": "BTC-LTC",
+                    "price": 0.00512
+                }
+            ]
+        """
+        try:
+            summaries = self.client.get_market_summaries()
+            if not summaries.get("success"):
+                raise Exception(summaries.get("message"))
+            return [{"symbol": item.get("MarketName"), "price": item.get("Last"),
+                     "bid": item.get("Bid"), "ask": item.get("Ask")} for item in summaries.get("result")]
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise Exception(ex)
 
+    @coalesce()
     def get_symbol_info(self, coin_name, pair_base="BTC"):
         try:
-            market = f"{pair_base}-{coin_name}"
+            market = self.instruments.symbol(coin_name, pair_base)
             info = self.client.get_market_summary(market=market)
             logger.info(f"Symbol info: {info}")
             return info
@@ -139,21 +211,29 @@ class BittrexService(ServiceInterface):
             raise Exception(ex)
 
     def get_open_orders(self, coin_name, pair_base="BTC"):
+        """Open orders of a market over REST, see `Order.as_dict`"""
         try:
-            market = f"{pair_base}-{coin_name}"
-            orders = self.client.get_open_orders(market=market)
+            market = self.instruments.symbol(coin_name, pair_base)
+            orders = self._orders(self.client.get_open_orders(market=market))
             logger.info(f"orders: {orders}")
-            return orders
+            return [order.as_dict() for order in orders]
         except Exception as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
 
     def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
         try:
-            market = f"{pair_base}-{coin_name}"
-            orders = self.client.get_order_history(market=market, limit=limit)
+            market = self.instruments.symbol(coin_name, pair_base)
+            orders = self._orders(self.client.get_order_history(market=market, limit=limit))[:limit]
             logger.debug(f"orders: {orders}")
-            return orders
+            return [order.as_dict() for order in orders]
         except Exception as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
+
+    def _orders(self, response):
+        if not response.get("success"):
+            raise Exception(response.get("message"))
+        orders = [from_bittrex(item) for item in response.get("result") or []]
+        self.orders.load(orders)
+        return orders
@@ -0,0 +1,250 @@
+from os import environ
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import get_limiter
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(environ.get("CLIENT_POOL_SIZE", 20))
+
+
+class ScheduledSession(requests.Session):
+    """Session that waits for the exchange rate limiter before every request"""
+
+    def __init__(self, limiter=None, api_key=None):
+        super().__init__()
+        self.limiter = limiter
+        self.api_key = api_key
+        self._acquired = threading.local()
+
+    @contextmanager
+    def acquired(self, method, path):
+        """Wait for the limiter before a request is signed, not after
+
+        Clients that sign a timestamp wrap signing and sending in it, so the
+        time spent queueing does not age the timestamp; the request sent
+        inside does not wait again.
+        """
+        if self.limiter is None or getattr(self._acquired, "active", False):
+            yield
+            return
+        self.limiter.acquire(method, path, self.api_key)
+        self._acquired.active = True
+        try:
+            yield
+        finally:
+            self._acquired.active = False
+
+    def request(self, method, url, *args, **kwargs):
+        if self.limiter is None:
+            return super().request(method, url, *args, **kwargs)
+        if not getattr(self._acquired, "active", False):
+            self.limiter.acquire(method, urlsplit(url).path, self.api_key)
+        response = super().request(method, url, *args, **kwargs)
+        self.limiter.update(response.status_code, response.headers, self.api_key)
+        return response
+
+
+def new_session(session=None):
+    """Return a keep-alive session whose connection pool can be shared by threads"""
+    session = session or requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def acquire_then_sign(request):
+    """Wrap python-binance's `Client._request` so the limiter is waited for before the timestamp is signed"""
+    def _request(self, method, uri, signed, force_params=False, **kwargs):
+        acquired = getattr(self.session, "acquired", None)
+        if not signed or acquired is None:
+            return request(self, method, uri, signed, force_params, **kwargs)
+        with acquired(method.upper(), urlsplit(uri).path):
+            return request(self, method, uri, signed, force_params, **kwargs)
+    return _request
+
+
+def binance_client(api_key, api_secret, kind=None, session=None, **options):
+    from binance.client import Client
+
+    attrs = {"_request": acquire_then_sign(Client._request)}
+    api_url = environ.get("BINANCE_API_URL")
+    if api_url:
+        # Client pings in its constructor, so the URL is set on a subclass
+        attrs["API_URL"] = api_url
+    Client = type("Client", (Client,), attrs)
+    client = Client(api_key, api_secret, **options)
+    session.headers.update(client.session.headers)
+    client.session.close()
+    client.session = session
+    return client
+
+
+def kucoin_client(api_key, api_secret, kind="market", session=None, **options):
+    from .kucoin.client import CLIENT_CLASSES
+
+    if environ.get("KUCOIN_API_URL"):
+        options.setdefault("url", environ["KUCOIN_API_URL"])
+    client = CLIENT_CLASSES[kind](key=api_key, secret=api_secret, **options)
+    client.session = session
+    return client
+
+
+def bittrex_client(api_key, api_secret, kind=None, session=None, **options):
+    from bittrex.bittrex import Bittrex, API_V1_1, BASE_URL_V1_1
+
+    base_url = BASE_URL_V1_1.split("{")[0]
+    api_url = environ.get("BITTREX_API_URL", base_url)
+
+    def dispatch(request_url, apisign):
+        if api_url != base_url:
+            request_url = api_url + request_url[len(base_url):]
+        return session.get(request_url, headers={"apisign": apisign}, timeout=10).json()
+
+    options.setdefault("calls_per_second", float(environ.get("BITTREX_CALLS_PER_SECOND", 1)))
+    return Bittrex(api_key, api_secret, dispatch=dispatch, api_version=API_V1_1, **options)
+
+
+def binance_ping(client):
+    client.ping()
+
+
+def kucoin_ping(client):
+    if hasattr(client, "get_server_timestamp"):
+        client.get_server_timestamp()
+
+
+def bittrex_ping(client):
+    client.get_markets()
+
+
+class ClientRegistry():
+    """Process wide pool of long lived exchange clients
+
+    Clients are keyed by (exchange, api_key, kind) so every `Exchange`
+    instance and thread using the same credentials shares one client and
+    its keep-alive HTTP session.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._clients = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def register(self, exchange, factory, ping=None, kinds=(None,)):
+        """Register how clients for an exchange are built
+
+        Args:
+            exchange (string): Name of exchange
+            factory (callable): Called with (api_key, api_secret, kind, session, **options)
+            ping (callable): Cheap request used to open the connection on warm up
+            kinds (tuple): Client kinds the exchange uses e.g market, trade
+        """
+        self._factories[exchange] = (factory, ping, tuple(kinds))
+
+    def session(self, exchange, api_key):
+        key = (exchange, api_key)
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = new_session(
+                ScheduledSession(get_limiter(exchange), api_key))
+        return session
+
+    def get(self, exchange, api_key, api_secret, kind=None, **options):
+        """Return the shared client, building it on first use
+
+        Args:
+            exchange (string): Name of exchange
+            api_key (string): Exchange API key
+            api_secret (string): Exchange API secret
+            kind (string): Client kind for exchanges with several clients
+            **options (object): Extra client constructor arguments
+
+        Returns:
+            object: Exchange client
+        """
+        key = (exchange, api_key, kind)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if exchange not in self._factories:
+                    raise Exception(f"No client factory registered for {exchange}")
+                factory = self._factories[exchange][0]
+                client = factory(api_key, api_secret, kind=kind,
+                                 session=self.session(exchange, api_key), **options)
+                self._clients[key] = client
+                logger.info(f"Created {exchange} {kind or ''} client")
+        return client
+
+    def warm_up(self, exchange, api_key, api_secret, **options):
+        """Build every client of an exchange and open its connections
+
+        Run it before the first order so it does not pay for DNS and TLS.
+        """
+        factory, ping, kinds = self._factories[exchange]
+        for kind in kinds:
+            client = self.get(exchange, api_key, api_secret, kind, **options)
+            if ping:
+                try:
+                    ping(client)
+                except Exception as ex:
+                    logger.error(f"Warm up of {exchange} client failed: {ex}")
+
+    def clear(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._clients = {}
+            self._sessions = {}
+
+
+clients = ClientRegistry()
+clients.register("binance", binance_client, binance_ping)
+clients.register("kucoin", kucoin_client, kucoin_ping,
+                 kinds=("market", "trade", "user"))
+clients.register("bittrex", bittrex_client, bittrex_ping)
+
+
+class AsyncSessionPool():
+    """One aiohttp session per exchange and event loop
+
+    Requests are signed per call, so every account on an exchange can share
+    the same connection pool.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = int(limit or environ.get("ASYNC_POOL_SIZE", 100))
+        self._sessions = {}
+
+    def get(self, exchange):
+        import aiohttp
+
+        key = (exchange, asyncio.get_running_loop())
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, ttl_dns_cache=300)
+            session = self._sessions[key] = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        return session
+
+    async def close(self, exchange=None):
+        loop = asyncio.get_running_loop()
+        for key in list(self._sessions):
+            if key[1] is loop and exchange in (None, key[0]):
+                await self._sessions.pop(key).close()
+
+
+async_sessions = AsyncSessionPool()
@@ -1,5 +1,35 @@
+from os import environ
+import logging
 import math
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BULK_WORKERS = int(environ.get("BULK_WORKERS", 16))
 
 
 def calculate_lcm(a, b):
     return abs(a*b)
+
+
+def run_concurrently(calls, workers=None):
+    """Run callables on a thread pool and collect every outcome
+
+    Args:
+        calls (list): Callables without arguments
+        workers (int): Pool size, BULK_WORKERS by default
+
+    Returns:
+        list: {"order": result, "error": message} per call, in input order.
+    """
+    def run(call):
+        try:
+            return {"order": call(), "error": None}
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            return {"order": None, "error": str(ex)}
+
+    if len(calls) <= 1:
+        return [run(call) for call in calls]
+    with ThreadPoolExecutor(min(len(calls), workers or BULK_WORKERS)) as pool:
+        return list(pool.map(run, calls))
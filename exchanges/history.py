@@ -0,0 +1,125 @@
+from os import environ
+import functools
+import hashlib
+import logging
+import time
+
+from core.database import db_client
+from .helpers import run_concurrently
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = environ.get("ORDER_HISTORY_COLLECTION", "order_history")
+CHECKPOINTS = environ.get("ORDER_HISTORY_CHECKPOINTS", "order_history_checkpoints")
+# Symbols synced at once; requests still wait for the exchange rate limiter
+WORKERS = int(environ.get("ORDER_HISTORY_WORKERS", 8))
+
+
+def account_id(api_key):
+    """Stable identifier of an account that does not store its api key"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class OrderHistorySync():
+    """Incremental copy of an account's order history into the database
+
+    Every symbol is read from its checkpoint onwards through the service's
+    page generator, which yields (orders, next cursor) pairs e.g. `fromId`
+    or time cursors. Each page is written in one unordered `bulk_write` and
+    the symbol's checkpoint moves after it, so an interrupted sync resumes
+    where it stopped and a re-sync only reads what is new. The checkpoint
+    never moves past an order that was still open, which is read again and
+    overwritten until it closes; the checkpoint's order count only grows by
+    orders new to the collection. Symbols run concurrently on a thread pool.
+    """
+
+    def __init__(self, exchange, account, pages, position, workers=None):
+        """
+        Args:
+            exchange (string): Name of exchange
+            account (string): Account identifier, see `account_id`
+            pages (callable): Called with (symbol, cursor), yields (orders, next cursor)
+            position (callable): Cursor that reads an `Order` again
+            workers (int): Symbols synced at once, see `WORKERS`
+        """
+        self.exchange = exchange
+        self.account = account
+        self.pages = pages
+        self.position = position
+        self.workers = int(workers or WORKERS)
+
+    def ensure_indexes(self):
+        from pymongo import ASCENDING, DESCENDING
+
+        # Binance order ids are only unique per symbol
+        db_client[COLLECTION].create_index(
+            [("exchange", ASCENDING), ("account", ASCENDING), ("symbol", ASCENDING), ("orderId", ASCENDING)],
+            unique=True)
+        db_client[COLLECTION].create_index(
+            [("exchange", ASCENDING), ("account", ASCENDING), ("symbol", ASCENDING), ("updateTime", DESCENDING)])
+        db_client[CHECKPOINTS].create_index(
+            [("exchange", ASCENDING), ("account", ASCENDING), ("symbol", ASCENDING)], unique=True)
+
+    def checkpoints(self):
+        """{symbol: cursor} of every symbol synced before, in one query"""
+        documents = db_client[CHECKPOINTS].find(
+            {"exchange": self.exchange, "account": self.account}, {"_id": 0, "symbol": 1, "cursor": 1})
+        return {doc["symbol"]: doc.get("cursor") for doc in documents}
+
+    def save_checkpoint(self, symbol, cursor, count):
+        db_client[CHECKPOINTS].update_one(
+            {"exchange": self.exchange, "account": self.account, "symbol": symbol},
+            {"$set": {"cursor": cursor, "synced_at": time.time()}, "$inc": {"orders": count}},
+            upsert=True)
+
+    def write(self, orders):
+        """Upsert a page of orders
+
+        Returns:
+            int: Orders that were not in the collection yet.
+        """
+        from pymongo import ReplaceOne
+
+        operations = [ReplaceOne(
+            {"exchange": self.exchange, "account": self.account, "symbol": order.symbol, "orderId": order.order_id},
+            dict(order.as_dict(), exchange=self.exchange, account=self.account), upsert=True)
+            for order in orders]
+        if not operations:
+            return 0
+        return db_client[COLLECTION].bulk_write(operations, ordered=False).upserted_count
+
+    def sync_symbol(self, symbol, cursor=None):
+        """Copy the orders of a symbol from `cursor` on, page by page
+
+        Returns:
+            int: Orders written.
+        """
+        count = 0
+        held = None
+        for orders, next_cursor in self.pages(symbol, cursor):
+            added = self.write(orders)
+            count += len(orders)
+            opened = [self.position(order) for order in orders if order.is_open]
+            if opened and held is None:
+                held = min(opened)
+            self.save_checkpoint(symbol, next_cursor if held is None else held, added)
+        return count
+
+    def run(self, symbols=None):
+        """Sync every symbol, the ones with a checkpoint by default
+
+        Returns:
+            dict: Counts of symbols and orders written, and the error of every failed symbol.
+        """
+        started = time.perf_counter()
+        self.ensure_indexes()
+        checkpoints = self.checkpoints()
+        symbols = list(symbols or checkpoints)
+        calls = [functools.partial(self.sync_symbol, symbol, checkpoints.get(symbol)) for symbol in symbols]
+        outcomes = run_concurrently(calls, self.workers)
+        errors = {symbol: outcome["error"] for symbol, outcome in zip(symbols, outcomes) if outcome["error"]}
+        written = sum(outcome["order"] or 0 for outcome in outcomes)
+        logger.info(
+            f"Synced {self.exchange} order history > symbols: {len(symbols)} > orders: {written} > "
+            f"errors: {len(errors)} > {time.perf_counter() - started:.1f}s")
+        return {"symbols": len(symbols), "orders": written, "errors": errors}
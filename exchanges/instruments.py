@@ -0,0 +1,164 @@
+import logging
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Quote assets used to split concatenated symbols such as ETHBTC, longest first
+QUOTE_ASSETS = sorted((
+    "BTC", "ETH", "BNB", "USDT", "BUSD", "USDC", "TUSD", "PAX", "DAI", "XRP", "TRX",
+    "DOGE", "EUR", "GBP", "AUD", "BRL", "TRY", "RUB", "UAH", "NGN", "ZAR", "BIDR",
+    "IDRT", "BKRW", "VAI"), key=len, reverse=True)
+
+# Native symbol layout per exchange: "concat" ETHBTC, "base-quote" ETH-BTC, "quote-base" BTC-ETH
+STYLES = {"binance": "concat", "simulated": "concat", "kucoin": "base-quote", "bittrex": "quote-base"}
+
+# Base and quote fields of the symbol documents stored by `update_step_sizes`
+FIELDS = {
+    "binance": ("baseAsset", "quoteAsset"),
+    "kucoin": ("baseCurrency", "quoteCurrency"),
+    "bittrex": ("baseAsset", "quoteAsset"),
+}
+
+
+class Instrument():
+    """One tradable pair of an exchange"""
+    __slots__ = ("exchange", "base", "quote", "symbol", "pair", "info")
+
+    def __init__(self, exchange, base, quote, symbol, info=None):
+        self.exchange = exchange
+        self.base = sys.intern(base)
+        self.quote = sys.intern(quote)
+        self.symbol = sys.intern(symbol)
+        self.pair = sys.intern(f"{base}/{quote}")
+        self.info = info
+
+    def __repr__(self):
+        return f"Instrument({self.exchange}, {self.pair}, {self.symbol})"
+
+
+class InstrumentRegistry():
+    """Bidirectional map between (base, quote) pairs and an exchange's symbols
+
+    Instruments listed by the exchange are loaded once from its symbol
+    documents; pairs or symbols it has not listed are derived from the
+    exchange's symbol layout on first use and kept, so every later lookup
+    is a single dict access either way.
+    """
+
+    def __init__(self, exchange, style=None):
+        """
+        Args:
+            exchange (string): Name of exchange
+            style (string): Symbol layout, see `STYLES`
+        """
+        self.exchange = exchange
+        self.style = style or STYLES.get(exchange, "concat")
+        self.loaded = False
+        self._by_pair = {}
+        self._by_symbol = {}
+        self._lock = threading.Lock()
+
+    def format(self, base, quote):
+        if self.style == "base-quote":
+            return f"{base}-{quote}"
+        if self.style == "quote-base":
+            return f"{quote}-{base}"
+        return f"{base}{quote}"
+
+    def parse(self, symbol):
+        """Split a native symbol into (base, quote), None when it can not be split"""
+        symbol = symbol.upper()
+        if self.style == "base-quote":
+            base, _, quote = symbol.partition("-")
+        elif self.style == "quote-base":
+            quote, _, base = symbol.partition("-")
+        else:
+            quote = next((asset for asset in QUOTE_ASSETS
+                          if symbol.endswith(asset) and len(symbol) > len(asset)), None)
+            base = symbol[:-len(quote)] if quote else None
+        if not base or not quote:
+            return None
+        return base, quote
+
+    def add(self, base, quote, symbol=None, info=None):
+        """Register an instrument, replacing a derived one of the same symbol"""
+        base, quote = base.upper(), quote.upper()
+        instrument = Instrument(self.exchange, base, quote, symbol or self.format(base, quote), info)
+        with self._lock:
+            self._by_pair[(base, quote)] = instrument
+            self._by_symbol[instrument.symbol] = instrument
+        return instrument
+
+    def load(self, documents, fields=None):
+        """Register the instruments of the exchange's symbol documents
+
+        Args:
+            documents (iterable): Symbol documents e.g of `update_step_sizes`
+            fields (tuple): Base and quote fields, see `FIELDS`
+        """
+        base_field, quote_field = fields or FIELDS.get(self.exchange, ("baseAsset", "quoteAsset"))
+        count = 0
+        for document in documents:
+            symbol = document.get("symbol")
+            base, quote = document.get(base_field), document.get(quote_field)
+            if not (base and quote) and symbol:
+                base, quote = self.parse(symbol) or (None, None)
+            if symbol and base and quote:
+                self.add(base, quote, symbol, document)
+                count += 1
+        self.loaded = True
+        logger.info(f"Loaded {count} {self.exchange} instruments")
+        return count
+
+    def get(self, base, quote="BTC"):
+        """Instrument of a pair; the hot path is one dict lookup"""
+        instrument = self._by_pair.get((base, quote))
+        if instrument is not None:
+            return instrument
+        instrument = self._by_pair.get((base.upper(), quote.upper()))
+        if instrument is None:
+            instrument = self.add(base, quote)
+        # Remember the spelling used, e.g lower case coin names
+        with self._lock:
+            self._by_pair[(base, quote)] = instrument
+        return instrument
+
+    def symbol(self, base, quote="BTC"):
+        """Native symbol of a pair e.g ("ETH", "BTC") -> ETHBTC on Binance"""
+        return self.get(base, quote).symbol
+
+    def lookup(self, symbol):
+        """Instrument of a native symbol, None when it can not be resolved"""
+        instrument = self._by_symbol.get(symbol)
+        if instrument is not None:
+            return instrument
+        parsed = self.parse(symbol)
+        if parsed is None:
+            return None
+        instrument = self.get(*parsed)
+        with self._lock:
+            self._by_symbol[symbol] = instrument
+        return instrument
+
+    def instruments(self):
+        return list(set(self._by_symbol.values()))
+
+    def __len__(self):
+        return len(self.instruments())
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_instruments(exchange):
+    """Return the process wide instrument registry of an exchange"""
+    registry = _registries.get(exchange)
+    if registry is not None:
+        return registry
+    with _registries_lock:
+        registry = _registries.get(exchange)
+        if registry is None:
+            registry = _registries[exchange] = InstrumentRegistry(exchange)
+        return registry
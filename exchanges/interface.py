@@ -1,12 +1,58 @@
 from abc import ABCMeta, abstractmethod, abstractproperty
+import functools
+import inspect
+
+from core.metrics import registry, timed
+from .helpers import run_concurrently
 
 
 class ServiceInterface():
     _metaclass__ = ABCMeta
+    # Name the service is registered under, see `exchanges.registry`
+    exchange = None
+
+    def __init_subclass__(cls, **kwargs):
+        """Record a latency histogram for every public method of a service
+
+        Labelled with the registry name of the exchange, the method and
+        whether it is a coroutine, so sync and async services stay apart.
+        """
+        super().__init_subclass__(**kwargs)
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or not callable(value) or isinstance(value, (type, staticmethod, classmethod)):
+                continue
+            histogram = registry.histogram(
+                "exchange_method_seconds", exchange=cls.exchange or cls.name, method=attr,
+                mode="async" if inspect.iscoroutinefunction(value) else "sync")
+            setattr(cls, attr, timed(value, histogram))
 
     def getname(self):
         return self.name
 
+    def buy_many(self, orders):
+        """Place several buy orders at once, see `place_many`"""
+        return self.place_many("buy", orders)
+
+    def sell_many(self, orders):
+        """Place several sell orders at once, see `place_many`"""
+        return self.place_many("sell", orders)
+
+    def place_many(self, side, orders):
+        """Place a basket of orders concurrently through `buy` or `sell`
+
+        Services override it to resolve prices and metadata in bulk or to use
+        a native batch endpoint.
+
+        Args:
+            side (string): buy or sell
+            orders (list): `buy`/`sell` keyword arguments of every order
+
+        Returns:
+            list: {"order": ..., "error": ...} per order, in input order.
+        """
+        place = self.buy if side == "buy" else self.sell
+        return run_concurrently([functools.partial(place, **order) for order in orders])
+
     def setname(self):
         return self.name
 
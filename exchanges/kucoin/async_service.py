@@ -0,0 +1,187 @@
+from os import environ
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+from uuid import uuid4
+from urllib.parse import urlencode
+
+from core.exceptions import UserAdviceException
+from core.singleflight import coalesce
+from ..clients import async_sessions
+from ..orders import from_kucoin
+from ..quantize import to_str
+from ..ratelimit import get_limiter
+from .service import KucoinService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncKucoinService(KucoinService):
+    """Awaitable KuCoin service sharing one aiohttp session per process"""
+    name = 'ku'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.debug_mode:
+            self.api_url = environ.get(
+                "KUCOIN_API_URL", "https://openapi-sandbox.kucoin.com")
+        else:
+            self.api_url = environ.get("KUCOIN_API_URL", "https://api.kucoin.com")
+
+    async def _request(self, method, uri, auth=True, params=None):
+        # Queue before the timestamp is signed
+        limiter = get_limiter("kucoin")
+        if limiter:
+            await limiter.acquire_async(method, uri, self.api_key)
+
+        body = ""
+        if params and method in ["GET", "DELETE"]:
+            uri = f"{uri}?{urlencode(sorted(params.items()))}"
+        elif params:
+            body = json.dumps(params)
+
+        headers = {"Content-Type": "application/json"}
+        if auth:
+            now_time = str(int(time.time() * 1000))
+            str_to_sign = f"{now_time}{method}{uri}{body}"
+            sign = base64.b64encode(
+                hmac.new(self.api_secret.encode("utf-8"), str_to_sign.encode("utf-8"), hashlib.sha256).digest())
+            headers.update({
+                "KC-API-SIGN": sign.decode(),
+                "KC-API-TIMESTAMP": now_time,
+                "KC-API-KEY": self.api_key,
+                "KC-API-PASSPHRASE": "chimera",
+            })
+
+        session = async_sessions.get("kucoin")
+        async with session.request(method, f"{self.api_url}{uri}", data=body or None,
+                                   headers=headers) as response:
+            if limiter:
+                limiter.update(response.status, response.headers, self.api_key)
+            data = await response.json(content_type=None)
+            if response.status != 200 or data.get("code") != "200000":
+                raise Exception(f"{response.status}-{data}")
+            return data.get("data")
+
+    async def get_account(self):
+        return await self._request("GET", "/api/v1/accounts")
+
+    async def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        try:
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            quantizer = await self.get_quantizer(symbol)
+            current_price = await self.get_price(symbol)
+            quantity = self.calculate_buy_qty(
+                price=current_price, amount=amount, quantizer=quantizer)
+            return await self._create_order(symbol, "buy", quantity, amount, order_type, quantizer)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise UserAdviceException(ex)
+
+    async def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        try:
+            if not await self.has_coin(coin_name):
+                raise UserAdviceException(
+                    f"Balance not enough to execute action in {self.name} exchange")
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            price = await self.get_price(symbol)
+            quantizer = await self.get_quantizer(symbol)
+            quantity = self.calculate_sell_qty(price, amount, quantizer=quantizer)
+            return await self._create_order(symbol, "sell", quantity, amount, order_type, quantizer)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise UserAdviceException(ex)
+
+    async def _create_order(self, symbol, side, quantity, amount, order_type, quantizer):
+        logger.info(
+            f"symbol:{symbol}>side:{side}>qty:{quantity} > market: {order_type}")
+        params = {"clientOid": uuid4().hex, "side": side, "symbol": symbol,
+                  "size": to_str(quantity)}
+        if order_type.lower() == "limit":
+            params.update({"type": "limit", "price": to_str(quantizer.floor_price(amount))})
+        else:
+            params["type"] = "market"
+        order = await self._request("POST", "/api/v1/orders", params=params)
+        self.balances.invalidate()
+        return order
+
+    @coalesce()
+    async def load_symbols(self):
+        """Seed the `kucoin_stepsizes` cache from one symbol list call"""
+        return self.symbols.replace(await self._request("GET", "/api/v1/symbols", auth=False))
+
+    async def get_quantizer(self, symbol):
+        try:
+            if not self.symbols.loaded:
+                await self.load_symbols()
+        except Exception as ex:
+            logger.error(f"Error loading {self.name} symbols: {ex}")
+        return self._quantizer(symbol)
+
+    async def get_precision(self, coin_name):
+        try:
+            info = await self.get_symbol_info(coin_name)
+            return int(info.get("precision"))
+        except Exception:
+            return 8
+
+    @coalesce()
+    async def get_price(self, symbol):
+        price_info = await self._request(
+            "GET", "/api/v1/market/orderbook/level1", auth=False, params={"symbol": symbol})
+        return float(price_info.get("price"))
+
+    async def get_balance(self, coin_name):
+        if not self.balances.synced:
+            await self.load_balances()
+        balance = self.balances.get(coin_name)
+        if balance is None:
+            raise UserAdviceException(
+                f"{coin_name} not found in account. I could not retrieve account balance.")
+        return balance.free
+
+    async def has_coin(self, coin_name, quantity=None):
+        if not self.balances.synced:
+            await self.load_balances()
+        return self.balances.has(coin_name, quantity)
+
+    @coalesce(per_account=True)
+    async def load_balances(self):
+        """Load the account's balance ledger from one trade accounts call"""
+        invalidations = self.balances.invalidations
+        # Accounts carry no time, the server time read first is what the balances are at least as of
+        version = await self._request("GET", "/api/v1/timestamp", auth=False)
+        accounts = await self._request("GET", "/api/v1/accounts", params={"type": "trade"})
+        return self.balances.load({item["currency"]: (item["available"], item.get("holds"))
+                                   for item in accounts}, version, invalidations)
+
+    @coalesce()
+    async def get_prices(self):
+        prices = await self._request("GET", "/api/v1/market/allTickers", auth=False)
+        return [{"price": item.get("buy"), "symbol": item.get("symbol"), "bid": item.get("buy"), "ask": item.get("sell")}
+                for item in prices.get("ticker")]
+
+    @coalesce()
+    async def get_symbol_info(self, coin_name, pair_base="BTC"):
+        return await self._request("GET", f"/api/v1/currencies/{coin_name}", auth=False)
+
+    async def get_open_orders(self, coin_name, pair_base="BTC"):
+        """Open orders of a pair, see `KucoinService.get_open_orders`"""
+        symbol = self.instruments.symbol(coin_name, pair_base)
+        if self.orders.streaming:
+            return [order.as_dict() for order in self.orders.open_orders(symbol)]
+        page = await self._request("GET", "/api/v1/orders", params={"status": "active", "symbol": symbol})
+        orders = [from_kucoin(item) for item in page.get("items") or []]
+        self.orders.load(orders)
+        return [order.as_dict() for order in orders]
+
+    async def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
+        page = await self._request(
+            "GET", "/api/v1/orders",
+            params={"symbol": self.instruments.symbol(coin_name, pair_base), "pageSize": max(10, limit)})
+        orders = [from_kucoin(item) for item in page.get("items") or []][:limit]
+        self.orders.load(orders)
+        return [order.as_dict() for order in orders]
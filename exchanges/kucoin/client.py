@@ -0,0 +1,80 @@
+import base64
+import contextlib
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from kucoin.client import Market, Trade, User
+
+
+class SessionRequestMixin():
+    """Send kucoin-python requests through one persistent `requests.Session`
+
+    The stock clients call `requests.request` for every call, which opens a new
+    connection (and TLS handshake) each time. The signing below mirrors
+    `KucoinBaseRestApi._request`; only the transport changes, and signed
+    requests wait for the rate limiter before they are timestamped.
+    """
+
+    session = None
+
+    def _request(self, method, uri, timeout=5, auth=True, params=None):
+        uri_path = uri
+        data_json = ''
+        if method in ['GET', 'DELETE']:
+            if params:
+                data_json = '&'.join(
+                    f"{key}={params[key]}" for key in sorted(params))
+                uri += '?' + data_json
+                uri_path = uri
+        elif params:
+            data_json = json.dumps(params)
+            uri_path = uri + data_json
+
+        url = urljoin(self.url, uri)
+        session = self.session or requests
+        acquired = getattr(session, "acquired", None)
+        scheduled = acquired(method, urlsplit(url).path) if auth and acquired else contextlib.nullcontext()
+        with scheduled:
+            headers = {}
+            if auth:
+                now_time = int(time.time()) * 1000
+                str_to_sign = str(now_time) + method + uri_path
+                sign = base64.b64encode(
+                    hmac.new(self.secret.encode('utf-8'), str_to_sign.encode('utf-8'), hashlib.sha256).digest())
+                headers = {
+                    "KC-API-SIGN": sign,
+                    "KC-API-TIMESTAMP": str(now_time),
+                    "KC-API-KEY": self.key,
+                    "KC-API-PASSPHRASE": self.passphrase,
+                    "Content-Type": "application/json"
+                }
+            if method in ['GET', 'DELETE']:
+                response_data = session.request(
+                    method, url, headers=headers, timeout=timeout)
+            else:
+                response_data = session.request(
+                    method, url, headers=headers, data=data_json, timeout=timeout)
+        return self.check_response_data(response_data)
+
+
+class PooledMarket(SessionRequestMixin, Market):
+    pass
+
+
+class PooledTrade(SessionRequestMixin, Trade):
+    pass
+
+
+class PooledUser(SessionRequestMixin, User):
+    pass
+
+
+CLIENT_CLASSES = {
+    "market": PooledMarket,
+    "trade": PooledTrade,
+    "user": PooledUser,
+}
@@ -1,57 +1,82 @@
 from os import environ
+import functools
 import logging
 import math
+import time
+from uuid import uuid4
 
-from kucoin.client import Market, Trade, User
 from core.exceptions import (UserAdviceException, ValidationException)
+from core.singleflight import coalesce
 from ..interface import ServiceInterface
-from ..helpers import calculate_lcm
+from ..balances import get_ledger
+from ..clients import clients
+from ..metadata import get_symbol_cache, sync_symbols
+from ..orders import from_kucoin, get_order_store
+from ..quantize import Quantizer, to_str
+from ..helpers import calculate_lcm, run_concurrently
+from ..instruments import get_instruments
+from ..history import OrderHistorySync, account_id
 
 logger = logging.getLogger(__name__)
 
+# Orders per request of the bulk endpoint, which takes limit orders of one symbol
+BULK_ORDER_SIZE = 5
+# Largest page of the list orders endpoint
+PAGE_SIZE = 500
+# Longest time range of the list orders endpoint, in ms
+HISTORY_WINDOW = 7 * 24 * 3600 * 1000
+# Days read by the first sync of a symbol
+HISTORY_DAYS = int(environ.get("KUCOIN_HISTORY_DAYS", 180))
+
 
 class KucoinService(ServiceInterface):
     name = 'ku'
+    exchange = 'kucoin'
 
     def __init__(self, **kwargs):
         self.api_key = kwargs["api_key"]
         self.api_secret = kwargs["api_secret"]
         self.passphrase = kwargs.get("passphrase")
+        self.instruments = get_instruments("kucoin")
 
         if not all([self.api_key, self.api_secret]):
             raise Exception(
                 f"Both api_key and api_secret are required for {name} exchange")
         self.debug_mode = environ.get("DEBUG", False)
+        self.balances = get_ledger("kucoin", self.api_key, self._balance_snapshot)
+        self.orders = get_order_store("kucoin", self.api_key, self._open_orders, self._fetch_order)
+        self.symbols = get_symbol_cache("kucoin_stepsizes")
+        self._quantizers = {}
+
+    def get_client(self, kind):
+        """Shared market, trade or user client for this account"""
+        return clients.get("kucoin", self.api_key, self.api_secret, kind,
+                           passphrase="chimera", is_sandbox=self.debug_mode)
 
     def get_account(self):
-        client = User(self.api_key, self.api_secret,
-                      passphrase="chimera", is_sandbox=self.debug_mode)
-        return client
+        return self.get_client("user")
 
     def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
         try:
-            client = Trade(key=self.api_key, secret=self.api_secret, passphrase='chimera',
-                           is_sandbox=self.debug_mode)
-            symbol = f"{pair_base}-{coin_name}"
-            precision = self.get_precision(coin_name)
+            client = self.get_client("trade")
+            symbol = self.instruments.symbol(coin_name, pair_base)
             current_price = self.get_price(symbol)
-            step_size = self.get_step_size(symbol)
+            quantizer = self.get_quantizer(symbol)
             quantity = self.calculate_buy_qty(
-                price=current_price, amount=amount, step_size=step_size)
-
-            price = self.round_value(current_price, precision)
-            quantity = self.round_value(quantity, precision)
+                price=current_price, amount=amount, quantizer=quantizer)
+            price = quantizer.floor_price(current_price)
 
             logger.info(
                 f"symbol:{symbol}>price:{price}>qty:{quantity} > market: {order_type}")
             order_id = None
             if order_type.lower() == "market":
                 order_id = client.create_market_order(
-                    symbol, 'buy', size=quantity)
+                    symbol, 'buy', size=to_str(quantity))
             elif order_type.lower() == "limit":
                 order_id = client.create_limit_order(
-                    symbol, 'buy', quantity, amount)
+                    symbol, 'buy', to_str(quantity), to_str(quantizer.floor_price(amount)))
 
+            self.balances.invalidate()
             logger.info(
                 f"Bought order request:{symbol}>type:{order_type}>quantity:{quantity}")
             return order_id
@@ -59,6 +84,115 @@ class KucoinService(ServiceInterface):
             logger.error(ex, exc_info=True)
             raise UserAdviceException(ex)
 
+    def place_many(self, side, orders):
+        """Size a basket from one ticker call and the symbol increments cache, and place it
+
+        Limit orders on the same symbol are sent together through the bulk
+        order endpoint, the rest concurrently one by one. Sells are checked
+        against the balance ledger first and reported as errors when short.
+        """
+        side = side.lower()
+        market = self.get_client("market")
+        tickers = {ticker["symbol"]: ticker for ticker in market.get_all_tickers().get("ticker", [])}
+        field = "sell" if side == "buy" else "buy"
+
+        sized = []
+        for order in orders:
+            symbol = self.instruments.symbol(order['coin_name'], order.get('pair_base', 'BTC'))
+            try:
+                if side == "sell" and not self.has_coin(order['coin_name']):
+                    raise UserAdviceException(
+                        f"Balance not enough to execute action in {self.name} exchange")
+                ticker = tickers.get(symbol) or {}
+                price = ticker.get(field) or ticker.get("last")
+                if not price:
+                    raise UserAdviceException(f"No price for {symbol} in {self.name} exchange")
+                quantizer = self.get_quantizer(symbol)
+                quantity = self.calculate_buy_qty(price, order.get("amount"), quantizer=quantizer)
+                order_type = order.get("order_type", "market").lower()
+                # The amount of a limit order is its price
+                limit_price = quantizer.floor_price(order.get("amount")) if order_type == "limit" else None
+                sized.append((symbol, order_type, quantity, limit_price, None))
+            except Exception as ex:
+                sized.append((symbol, None, None, None, str(ex)))
+
+        results = [{"order": None, "error": error} for _, _, _, _, error in sized]
+        groups = {}
+        for position, (symbol, order_type, _, _, error) in enumerate(sized):
+            if error is None:
+                key = symbol if order_type == "limit" else position
+                groups.setdefault(key, []).append(position)
+
+        calls, batches = [], []
+        for key, positions in groups.items():
+            if sized[positions[0]][1] == "limit" and len(positions) > 1:
+                for start in range(0, len(positions), BULK_ORDER_SIZE):
+                    batch = positions[start:start + BULK_ORDER_SIZE]
+                    calls.append(functools.partial(self._place_bulk, side, key, [sized[position] for position in batch]))
+                    batches.append(batch)
+            else:
+                position = positions[0]
+                calls.append(functools.partial(self._place_one, side, *sized[position][:4]))
+                batches.append([position])
+
+        for batch, outcome in zip(batches, run_concurrently(calls)):
+            if outcome["error"] is not None or len(batch) == 1:
+                for position in batch:
+                    results[position] = outcome
+                continue
+            for position, placed in zip(batch, outcome["order"]):
+                failed = placed.get("status") == "fail"
+                results[position] = {"order": None if failed else placed,
+                                     "error": placed.get("failMsg") if failed else None}
+        return results
+
+    def _place_one(self, side, symbol, order_type, quantity, price):
+        client = self.get_client("trade")
+        if order_type == "limit":
+            order_id = client.create_limit_order(symbol, side, to_str(quantity), to_str(price))
+        else:
+            order_id = client.create_market_order(symbol, side, size=to_str(quantity))
+        self.balances.invalidate()
+        return order_id
+
+    def _place_bulk(self, side, symbol, orders):
+        # kucoin-python's create_bulk_orders posts a single order, the endpoint takes a list
+        order_list = [{"clientOid": uuid4().hex, "side": side, "type": "limit",
+                       "price": to_str(price), "size": to_str(quantity)}
+                      for _, _, quantity, price, _ in orders]
+        response = self.get_client("trade")._request(
+            "POST", "/api/v1/orders/multi", params={"symbol": symbol, "orderList": order_list})
+        self.balances.invalidate()
+        return response.get("data", [])
+
+    @coalesce()
+    def load_symbols(self):
+        """Seed the `kucoin_stepsizes` cache from one symbol list call"""
+        return self.symbols.replace(self.get_client("market").get_symbol_list())
+
+    def get_quantizer(self, symbol):
+        """Quantizer from the symbol's base and price increments, see `Quantizer.from_kucoin`
+
+        The symbol list is read once per process into the metadata cache
+        (unless it was loaded from the database) and served from memory.
+        """
+        try:
+            if not self.symbols.loaded:
+                self.load_symbols()
+        except Exception as ex:
+            logger.error(f"Error loading {self.name} symbols: {ex}")
+        return self._quantizer(symbol)
+
+    def _quantizer(self, symbol):
+        # The cache holds every listed symbol, a miss is an unknown one
+        document = self.symbols.get(symbol) if self.symbols.cached(symbol) else None
+        if document is None:
+            return Quantizer.from_precision(8)
+        cached = self._quantizers.get(symbol)
+        if cached is None or cached[0] is not document:
+            cached = self._quantizers[symbol] = (document, Quantizer.from_kucoin(document))
+        return cached[1]
+
     def get_precision(self, coin_name):
         try:
             info = self.get_symbol_info(coin_name)
@@ -71,27 +205,27 @@ class KucoinService(ServiceInterface):
 
     def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
         try:
-            client = Trade(key=self.api_key, secret=self.api_secret, passphrase='chimera',
-                           is_sandbox=self.debug_mode)
-            symbol = f"BTC-{coin_name}"
+            client = self.get_client("trade")
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            if not self.has_coin(coin_name):
+                raise UserAdviceException(
+                    f"Balance not enough to execute action in {self.name} exchange")
             price = self.get_price(symbol)
-            balance = self.get_balance(coin_name)
 
-            quantity = self.calculate_sell_qty(price, amount)
-
-            precision = self.get_precision(coin_name)
-            price = self.round_value(price, precision)
-            quantity = self.round_value(quantity, precision)
+            quantizer = self.get_quantizer(symbol)
+            quantity = self.calculate_sell_qty(price, amount, quantizer=quantizer)
+            price = quantizer.floor_price(price)
 
             logger.info(
                 f"symbol:{symbol}>price:{price}>qty:{quantity} > market: {order_type}")
 
             if order_type.lower() == "market":
                 order_id = client.create_market_order(
-                    symbol, 'sell', size=quantity)
+                    symbol, 'sell', size=to_str(quantity))
             elif order_type.lower() == "limit":
                 order_id = client.create_limit_order(
-                    symbol, 'sell', quantity, amount)
+                    symbol, 'sell', to_str(quantity), to_str(quantizer.floor_price(amount)))
+            self.balances.invalidate()
             logger.info(
                 f"sold order request:{symbol}>type:{order_type}>quantity:{quantity}")
             return order_id
@@ -102,10 +236,10 @@ class KucoinService(ServiceInterface):
     def get_step_size(self, symbol):
         pass
 
+    @coalesce()
     def get_price(self, symbol):
         try:
-            client = Market(key=self.api_key,
-                            secret=self.api_secret, is_sandbox=self.debug_mode)
+            client = self.get_client("market")
             price_info = client.get_ticker(symbol=symbol)
             logger.info(f"price info: {price_info}")
             return float(price_info.get("price"))
@@ -113,28 +247,50 @@ class KucoinService(ServiceInterface):
             logger.error(ex, exc_info=True)
             raise Exception(ex)
 
-    def calculate_sell_qty(self, price, amount, step_size=None):
+    def calculate_sell_qty(self, price, amount, step_size=None, quantizer=None):
+        if quantizer or step_size:
+            return (quantizer or Quantizer(step_size)).qty_for_amount(amount, price)
         quantity = float(amount)/float(price)
         return quantity
 
-    def calculate_buy_qty(self, price, amount, step_size=None):
+    def calculate_buy_qty(self, price, amount, step_size=None, quantizer=None):
+        if quantizer or step_size:
+            return (quantizer or Quantizer(step_size)).qty_for_amount(amount, price)
         quantity = float(amount)/float(price)
         return quantity
 
     def get_balance(self, coin_name):
+        """Available balance of a coin in the trade account, from the balance ledger"""
         try:
-            user_account = self.get_account()
-            balances = user_account.get_account_list(
-                currency=coin_name, account_type="trade")
-            logger.info(f"Balances: {balances}")
-            if not balances.get("data"):
+            balance = self.balances.get(coin_name)
+            if balance is None:
                 raise UserAdviceException(
                     f"{coin_name} not found in account. I could not retrieve account balance.")
-            balance_info = balances.get("data")[0]
-            if not balance_info:
-                raise UserAdviceException(
-                    f"Coin not found in account in {self.name} exchange")
-            return balance_info.get("available")
+            return balance.free
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise Exception(ex)
+
+    def has_coin(self, coin_name, quantity=None):
+        """Whether the free balance of a coin covers `quantity` (or is positive), from memory"""
+        return self.balances.has(coin_name, quantity)
+
+    def _balance_snapshot(self):
+        # Accounts carry no time, the server time read first is what the balances are at least as of
+        version = self.get_client("market").get_server_timestamp()
+        accounts = self.get_account().get_account_list(account_type="trade")
+        return {item["currency"]: (item["available"], item.get("holds")) for item in accounts}, version
+
+    def update_step_sizes(self):
+        """Sync the `kucoin_stepsizes` collection with one symbol list call
+
+        Documents are the symbol list entries (baseIncrement, priceIncrement,
+        baseMinSize, ...), see `Quantizer.from_kucoin`.
+        """
+        try:
+            documents = list(self.get_client("market").get_symbol_list())
+            self.instruments.load(documents)
+            return sync_symbols("kucoin_stepsizes", documents)
         except Exception as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
@@ -142,21 +298,22 @@ class KucoinService(ServiceInterface):
     def track_coin(self, payload):
         pass
 
+    @coalesce()
     def get_prices(self):
         try:
-            client = Market(key=self.api_key,
-                            secret=self.api_secret, is_sandbox=self.debug_mode)
+            client = self.get_client("market")
             prices = client.get_all_tickers()
-            return [{"price": item.get("buy"), "symbol": item.get("symbol")} for item in prices.get("ticker")]
+            return [{"price": item.get("buy"), "symbol": item.get("symbol"), "bid": item.get("buy"), "ask": item.get("sell")}
+                    for item in prices.get("ticker")]
         except Exception as ex:
             logger.error(ex, exc_info=True)
             raise Exception(ex)
         return self.client.get_all_tickers()
 
+    @coalesce()
     def get_symbol_info(self, coin_name, pair_base="BTC"):
         try:
-            client = Market(key=self.api_key,
-                            secret=self.api_secret, is_sandbox=self.debug_mode)
+            client = self.get_client("market")
             info = client.get_currency_detail(currency=coin_name)
             logger.info(f"currency info: {coin_name} > {self.name}")
             return info
@@ -165,7 +322,83 @@ class KucoinService(ServiceInterface):
             raise Exception(ex)
 
     def get_open_orders(self, coin_name, pair_base="BTC"):
-        pass
+        """Open orders of a pair, see `Order.as_dict`
+
+        Served from the order store while the private stream keeps it
+        current, otherwise over REST.
+        """
+        try:
+            symbol = self.instruments.symbol(coin_name, pair_base)
+            if self.orders.streaming:
+                return [order.as_dict() for order in self.orders.open_orders(symbol)]
+            orders = self._list_orders(status="active", symbol=symbol)
+            self.orders.load(orders)
+            return [order.as_dict() for order in orders]
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise Exception(ex)
 
     def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
-        pass
+        """Latest `limit` orders of a pair over REST, see `Order.as_dict`"""
+        try:
+            orders = self._list_orders(limit, symbol=self.instruments.symbol(coin_name, pair_base))
+            self.orders.load(orders)
+            return [order.as_dict() for order in orders]
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            raise Exception(ex)
+
+    def _list_orders(self, limit=None, **params):
+        """Orders of the list orders endpoint, latest first, following its pages"""
+        client = self.get_client("trade")
+        page_size = max(10, min(limit or PAGE_SIZE, PAGE_SIZE))
+        orders, page = [], 1
+        while True:
+            result = client.get_order_list(currentPage=page, pageSize=page_size, **params)
+            orders += [from_kucoin(item) for item in result.get("items") or []]
+            if (limit and len(orders) >= limit) or page >= (result.get("totalPage") or 1):
+                break
+            page += 1
+        return orders[:limit] if limit else orders
+
+    def sync_order_history(self, symbols=None):
+        """Copy the order history of symbols into the database, incrementally
+
+        Pages through the list orders endpoint one 7 day window at a time
+        with a creation time cursor, after the open orders, which the windows
+        (done orders only) do not list and which hold the checkpoint at the
+        oldest one's creation time, see `exchanges.history.OrderHistorySync`.
+        Without `symbols` the symbols synced before are resumed.
+
+        Returns:
+            dict: Counts of symbols and orders written, and errors per symbol.
+        """
+        return OrderHistorySync("kucoin", account_id(self.api_key), self._order_history_pages,
+                                lambda order: order.updated).run(symbols)
+
+    def _order_history_pages(self, symbol, cursor):
+        client = self.get_client("trade")
+        now = int(time.time() * 1000)
+        start = cursor or now - HISTORY_DAYS * 24 * 3600 * 1000
+        active = self._list_orders(status="active", symbol=symbol)
+        if active:
+            yield active, start
+        while start < now:
+            end = min(start + HISTORY_WINDOW, now)
+            page = 1
+            while True:
+                result = client.get_order_list(symbol=symbol, status="done", startAt=start, endAt=end,
+                                               currentPage=page, pageSize=PAGE_SIZE)
+                last = page >= (result.get("totalPage") or 1)
+                # The window is done once its last page is written
+                yield [from_kucoin(item) for item in result.get("items") or []], end if last else start
+                if last:
+                    break
+                page += 1
+            start = end
+
+    def _open_orders(self):
+        return self._list_orders(status="active")
+
+    def _fetch_order(self, symbol, order_id):
+        return from_kucoin(self.get_client("trade").get_order_details(order_id))
@@ -0,0 +1,224 @@
+from os import environ
+import logging
+import threading
+import time
+
+from core.database import db_client
+
+logger = logging.getLogger(__name__)
+
+# One {"_id": collection, "version": n} counter per symbol collection, see `bump_version`
+VERSIONS = environ.get("SYMBOL_VERSIONS_COLLECTION", "symbol_versions")
+
+
+class SymbolMetadataCache():
+    """In-process copy of the symbol trading rules stored in the database.
+
+    The whole collection is loaded in one query and every lookup is served
+    from memory. A background thread re-checks the collection's version
+    counter every `ttl` seconds and only reloads it when the counter moved;
+    every writer of the collection bumps it, see `bump_version`.
+    """
+
+    def __init__(self, collection="stepsizes", key="symbol", ttl=None):
+        """
+        Args:
+            collection (string): Name of the collection holding the symbols
+            key (string): Document field the symbols are indexed by
+            ttl (float): Seconds between version checks
+        """
+        self.collection = collection
+        self.key = key
+        self.ttl = float(ttl or environ.get("SYMBOL_CACHE_TTL", 300))
+        self.hits = 0
+        self.misses = 0
+        self.version = None
+        self.loaded_at = None
+        self._symbols = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def fetch_version(self):
+        """Version counter of the collection, one indexed read"""
+        document = db_client[VERSIONS].find_one({"_id": self.collection}, {"version": 1})
+        return document.get("version") if document else None
+
+    def load(self):
+        """Load every symbol document in bulk and swap it in"""
+        version = self.fetch_version()
+        documents = db_client[self.collection].find({}, {"_id": 0})
+        symbols = self.replace(documents, version)
+        logger.info(
+            f"Loaded {len(symbols)} symbols from {self.collection} > version: {version}")
+        return symbols
+
+    def replace(self, documents, version=None):
+        """Swap in a new set of symbol documents e.g to seed the cache without a database"""
+        symbols = {doc[self.key]: doc for doc in documents if doc.get(self.key)}
+        with self._lock:
+            self._symbols = symbols
+            self.version = version
+            self.loaded_at = time.time()
+        return symbols
+
+    def refresh(self):
+        """Reload the collection only if its version changed since the last load"""
+        try:
+            if not self.loaded or self.fetch_version() != self.version:
+                return self.load()
+            self.loaded_at = time.time()
+        except Exception as ex:
+            logger.error(f"Error refreshing {self.collection} cache: {ex}")
+
+    def start(self):
+        """Load the cache and start the background refresher if not running yet"""
+        with self._lock:
+            if self._refresher and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._run, name=f"{self.collection}-cache", daemon=True)
+        if not self.loaded:
+            self.refresh()
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.ttl):
+            self.refresh()
+
+    def documents(self):
+        """Every symbol document held in memory"""
+        return [doc for doc in list(self._symbols.values()) if doc]
+
+    def cached(self, symbol):
+        """Whether a symbol is held in memory, i.e `get` will not query the database"""
+        return symbol in self._symbols
+
+    def get(self, symbol):
+        """Return the stored document for a symbol
+
+        Symbols missing from memory (e.g. listed after the last load) are
+        looked up once in the database and kept until the next reload.
+
+        Args:
+            symbol (string): Exchange symbol e.g ETHBTC
+
+        Returns:
+            dict: Symbol document or None when the symbol is unknown.
+        """
+        symbols = self._symbols
+        if symbol in symbols:
+            with self._lock:
+                self.hits += 1
+            return symbols[symbol]
+
+        with self._lock:
+            self.misses += 1
+        document = db_client[self.collection].find_one(
+            {self.key: symbol}, {"_id": 0})
+        symbols[symbol] = document
+        return document
+
+    def stats(self):
+        return {
+            "collection": self.collection,
+            "symbols": len(self._symbols),
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_symbol_cache(collection="stepsizes", key="symbol"):
+    """Return the process wide cache for a collection, creating it on first use"""
+    with _caches_lock:
+        cache = _caches.get(collection)
+        if cache is None:
+            cache = _caches[collection] = SymbolMetadataCache(collection, key)
+        return cache
+
+
+def bump_version(collection):
+    """Move the version counter of a symbol collection so every cache reloads it
+
+    Call it after any write to the collection, a manual fix included.
+
+    Returns:
+        int: The new version.
+    """
+    from pymongo import ReturnDocument
+
+    document = db_client[VERSIONS].find_one_and_update(
+        {"_id": collection}, {"$inc": {"version": 1}, "$currentDate": {"updated": True}},
+        upsert=True, return_document=ReturnDocument.AFTER)
+    return document["version"]
+
+
+def diff_symbols(stored, documents, key="symbol"):
+    """Compare fresh symbol documents with the stored ones
+
+    Args:
+        stored (iterable): Documents currently in the collection
+        documents (iterable): Documents built from the exchange info
+        key (string): Field the symbols are identified by
+
+    Returns:
+        tuple: (documents to upsert, symbols no longer listed)
+    """
+    current = {}
+    for doc in stored:
+        doc = {field: value for field, value in doc.items() if field not in ("_id", "updated_at")}
+        current[doc.get(key)] = doc
+    changed, listed = [], set()
+    for doc in documents:
+        listed.add(doc[key])
+        if current.get(doc[key]) != doc:
+            changed.append(doc)
+    return changed, [symbol for symbol in current if symbol not in listed]
+
+
+def sync_symbols(collection, documents, key="symbol"):
+    """Write only the symbols that changed since the last sync
+
+    Changed and new symbols are upserted and delisted ones removed in one
+    unordered `bulk_write` that bumps the collection's version, so the
+    metadata caches only reload when something changed.
+
+    Args:
+        collection (string): Name of the collection e.g stepsizes
+        documents (list): One document per symbol listed by the exchange
+        key (string): Field the symbols are identified by
+
+    Returns:
+        dict: Counts of listed, upserted and removed symbols.
+    """
+    from pymongo import ASCENDING, DeleteOne, ReplaceOne
+
+    target = db_client[collection]
+    target.create_index([(key, ASCENDING)], unique=True)
+    changed, delisted = diff_symbols(target.find({}, {"_id": 0}), documents, key)
+    now = time.time()
+    operations = [ReplaceOne({key: doc[key]}, dict(doc, updated_at=now), upsert=True) for doc in changed]
+    operations += [DeleteOne({key: symbol}) for symbol in delisted]
+    if operations:
+        target.bulk_write(operations, ordered=False)
+        bump_version(collection)
+        cache = _caches.get(collection)
+        if cache is not None and cache.loaded:
+            cache.refresh()
+    logger.info(
+        f"Synced {collection} > listed: {len(documents)} > upserted: {len(changed)} > removed: {len(delisted)}")
+    return {"listed": len(documents), "upserted": len(changed), "removed": len(delisted)}
@@ -0,0 +1,312 @@
+from os import environ
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE = float(environ.get("ORDER_BOOK_MAX_AGE", 10))
+# Diffs kept while a snapshot is being fetched
+MAX_PENDING = int(environ.get("ORDER_BOOK_MAX_PENDING", 10000))
+RESYNC_ATTEMPTS = 3
+
+
+class SequenceGap(Exception):
+    pass
+
+
+class BookSide():
+    """Price levels of one side of a book, best first
+
+    Levels are kept as a sorted list of signed prices (negated for bids, so
+    both sides sort best first) next to a price -> size dict.
+    """
+    __slots__ = ("sign", "keys", "sizes")
+
+    def __init__(self, sign):
+        self.sign = sign
+        self.keys = []
+        self.sizes = {}
+
+    def set(self, price, size):
+        """Set the size of a level, removing it when the size is 0"""
+        if size:
+            if price not in self.sizes:
+                insort(self.keys, self.sign * price)
+            self.sizes[price] = size
+        elif price in self.sizes:
+            del self.sizes[price]
+            del self.keys[bisect_left(self.keys, self.sign * price)]
+
+    def clear(self):
+        self.keys = []
+        self.sizes = {}
+
+    def best(self):
+        return self.sign * self.keys[0] if self.keys else None
+
+    def levels(self, limit=None):
+        """(price, size) pairs, best first"""
+        keys = self.keys if limit is None else self.keys[:limit]
+        return [(self.sign * key, self.sizes[self.sign * key]) for key in keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Fill():
+    """Expected outcome of walking the book with a market order"""
+    __slots__ = ("quantity", "cost", "best", "worst", "complete")
+
+    def __init__(self, quantity, cost, best, worst, complete):
+        self.quantity = quantity
+        self.cost = cost
+        self.best = best
+        self.worst = worst
+        self.complete = complete
+
+    @property
+    def vwap(self):
+        return self.cost / self.quantity if self.quantity else None
+
+    @property
+    def slippage(self):
+        """Relative distance of the average fill price from the best price"""
+        if not self.quantity or not self.best:
+            return None
+        return abs(self.vwap - self.best) / self.best
+
+    def __repr__(self):
+        return f"Fill(quantity={self.quantity}, vwap={self.vwap}, worst={self.worst}, complete={self.complete})"
+
+
+class OrderBook():
+    """L2 book of one symbol built from a depth snapshot and diff events
+
+    Follows the Binance diff depth stream rules: diffs received before the
+    snapshot are buffered and replayed, diffs older than the snapshot are
+    dropped, and a diff whose first update id does not follow the last
+    applied one raises `SequenceGap` and marks the book out of sync until
+    the next snapshot.
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = BookSide(-1)
+        self.asks = BookSide(1)
+        self.last_update_id = None
+        self.updated_at = None
+        self.updates = 0
+        self.gaps = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @property
+    def synced(self):
+        return self.last_update_id is not None
+
+    def apply_snapshot(self, snapshot):
+        """Load a REST depth snapshot and replay the diffs buffered meanwhile
+
+        Args:
+            snapshot (dict): {"lastUpdateId": int, "bids": [[price, size]], "asks": [[price, size]]}
+        """
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, size, *_ in snapshot.get("bids", []):
+                self.bids.set(float(price), float(size))
+            for price, size, *_ in snapshot.get("asks", []):
+                self.asks.set(float(price), float(size))
+            self.last_update_id = int(snapshot["lastUpdateId"])
+            self.updated_at = time.time()
+            pending, self._pending = self._pending, []
+            for position, msg in enumerate(pending):
+                try:
+                    self._apply(msg)
+                except SequenceGap:
+                    # The snapshot is older than the buffered stream, keep the rest for the next one
+                    self._pending.extend(pending[position + 1:])
+                    raise
+
+    def apply_diff(self, msg):
+        """Apply a depthUpdate event, buffering it while the book is out of sync"""
+        with self._lock:
+            if not self.synced:
+                self._pending.append(msg)
+                if len(self._pending) > MAX_PENDING:
+                    del self._pending[0]
+                return
+            self._apply(msg)
+
+    def _apply(self, msg):
+        first, last = msg["U"], msg["u"]
+        if last <= self.last_update_id:
+            return
+        if first > self.last_update_id + 1:
+            self.gaps += 1
+            expected = self.last_update_id + 1
+            self.last_update_id = None
+            self._pending = [msg]
+            raise SequenceGap(f"{self.symbol} depth jumped from {expected} to {first}")
+        for price, size in msg.get("b", ()):
+            self.bids.set(float(price), float(size))
+        for price, size in msg.get("a", ()):
+            self.asks.set(float(price), float(size))
+        self.last_update_id = last
+        self.updated_at = time.time()
+        self.updates += 1
+
+    def fill(self, side, quantity=None, amount=None):
+        """Walk the book for a market order of `quantity` base or `amount` quote
+
+        Args:
+            side (string): BUY walks the asks, SELL the bids
+            quantity (float): Base quantity to fill
+            amount (float): Quote amount to spend (BUY) or receive (SELL)
+
+        Returns:
+            Fill: Filled quantity, cost, best and worst price; `complete` is
+            False when the book is too thin for the order.
+        """
+        quantity = float(quantity) if quantity is not None else None
+        amount = float(amount) if amount is not None else None
+        filled = cost = 0.0
+        best = worst = None
+        with self._lock:
+            # A snapshot load swaps in new levels, so both are read under the lock
+            book_side = self.asks if side.upper() == "BUY" else self.bids
+            sign, keys, sizes = book_side.sign, book_side.keys, book_side.sizes
+            for key in keys:
+                price = sign * key
+                best = price if best is None else best
+                take = sizes[price]
+                if quantity is not None:
+                    take = min(take, quantity - filled)
+                if amount is not None:
+                    take = min(take, (amount - cost) / price)
+                filled += take
+                cost += take * price
+                worst = price
+                if (quantity is not None and filled >= quantity) or (amount is not None and cost >= amount * (1 - 1e-12)):
+                    return Fill(filled, cost, best, worst, True)
+        return Fill(filled, cost, best, worst, False)
+
+    def vwap(self, side, quantity=None, amount=None):
+        """Average price of a market order, None when the book cannot fill it"""
+        fill = self.fill(side, quantity, amount)
+        return fill.vwap if fill.complete else None
+
+    def depth(self, limit=10):
+        with self._lock:
+            return {"bids": self.bids.levels(limit), "asks": self.asks.levels(limit)}
+
+
+class OrderBooks():
+    """Order books of one exchange kept current by a diff depth stream
+
+    `attach` subscribes the symbols on a stream multiplexer (e.g. a
+    `BinanceStreamMultiplexer` of the "depth@100ms" stream). A book that is
+    out of sync, on its first diff or after a sequence gap, is loaded from a
+    new snapshot on a background thread while the stream keeps being buffered.
+    """
+
+    def __init__(self, exchange, snapshot=None, max_age=None):
+        """
+        Args:
+            exchange (string): Name of exchange
+            snapshot (callable): Returns the REST depth snapshot of a symbol
+            max_age (float): Seconds without updates after which a book is not used
+        """
+        self.exchange = exchange
+        self.snapshot = snapshot
+        self.max_age = float(max_age if max_age is not None else MAX_AGE)
+        self.books = {}
+        self.resyncs = 0
+        self._resyncing = set()
+        self._lock = threading.Lock()
+
+    def book(self, symbol):
+        symbol = symbol.upper()
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = OrderBook(symbol)
+            return book
+
+    def attach(self, multiplexer, symbols):
+        """Subscribe the books of `symbols`, each loads its snapshot on its first diff"""
+        for symbol in symbols:
+            self.book(symbol)
+            multiplexer.subscribe(symbol, self.apply)
+
+    def apply(self, msg):
+        """Stream handler: apply a depthUpdate event to its book"""
+        book = self.books.get(msg.get("s"))
+        if book is None:
+            return
+        try:
+            book.apply_diff(msg)
+        except SequenceGap as ex:
+            logger.warning(f"{ex}, resyncing")
+        if not book.synced:
+            self.resync(book.symbol)
+
+    def resync(self, symbol, background=True):
+        """Reload a book from a fresh snapshot, once at a time per symbol"""
+        symbol = symbol.upper()
+        with self._lock:
+            if symbol in self._resyncing or self.snapshot is None:
+                return
+            self._resyncing.add(symbol)
+        if background:
+            threading.Thread(target=self._resync, args=(symbol,), name=f"{symbol}-book", daemon=True).start()
+        else:
+            self._resync(symbol)
+
+    def _resync(self, symbol):
+        try:
+            for _ in range(RESYNC_ATTEMPTS):
+                try:
+                    self.book(symbol).apply_snapshot(self.snapshot(symbol))
+                    self.resyncs += 1
+                    return
+                except SequenceGap as ex:
+                    logger.warning(f"{ex} after snapshot, retrying")
+                except Exception as ex:
+                    logger.error(f"Error loading {symbol} order book: {ex}")
+                    return
+        finally:
+            with self._lock:
+                self._resyncing.discard(symbol)
+
+    def get(self, symbol, max_age=None):
+        """Return the book of a symbol or None when missing, out of sync or stale"""
+        book = self.books.get(symbol)
+        max_age = self.max_age if max_age is None else max_age
+        if book is None or not book.synced or time.time() - book.updated_at > max_age:
+            return None
+        return book
+
+    def stats(self):
+        return {
+            "exchange": self.exchange,
+            "books": len(self.books),
+            "synced": sum(1 for book in list(self.books.values()) if book.synced),
+            "gaps": sum(book.gaps for book in list(self.books.values())),
+            "resyncs": self.resyncs,
+        }
+
+
+_order_books = {}
+_order_books_lock = threading.Lock()
+
+
+def get_order_books(exchange):
+    """Return the process wide order books of an exchange"""
+    with _order_books_lock:
+        books = _order_books.get(exchange)
+        if books is None:
+            books = _order_books[exchange] = OrderBooks(exchange)
+        return books
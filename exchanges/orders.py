@@ -0,0 +1,360 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+OPEN = ("NEW", "PARTIALLY_FILLED")
+# Orders kept in memory per store, the oldest closed ones are dropped first
+MAX_ORDERS = 10000
+
+
+class Order():
+    """State of one order in a shape shared by every exchange
+
+    Statuses follow Binance: NEW, PARTIALLY_FILLED, FILLED, CANCELED,
+    REJECTED, EXPIRED. `updated` is the exchange time (ms) of the state.
+    `order_id` keeps the exchange's type (int on Binance, string on KuCoin)
+    and `raw` the REST order it was read from, None for stream reports.
+    """
+    __slots__ = ("order_id", "client_id", "symbol", "side", "type", "status",
+                 "price", "quantity", "filled", "quote_filled", "updated", "raw")
+
+    def __init__(self, order_id, client_id, symbol, side, type, status, price,
+                 quantity, filled, quote_filled, updated, raw=None):
+        self.order_id = order_id
+        self.client_id = client_id or None
+        self.symbol = symbol
+        self.side = side.upper() if side else None
+        self.type = type.upper() if type else None
+        self.status = status
+        self.price = float(price or 0)
+        self.quantity = float(quantity or 0)
+        self.filled = float(filled or 0)
+        self.quote_filled = float(quote_filled or 0)
+        self.updated = int(updated or 0)
+        self.raw = raw
+
+    @property
+    def key(self):
+        """(symbol, order id) the store holds it under, ids are only unique per symbol on Binance"""
+        return self.symbol, str(self.order_id)
+
+    @property
+    def is_open(self):
+        return self.status in OPEN
+
+    def as_dict(self):
+        """The order with the field names of a Binance REST order
+
+        Fields of the REST order it was read from are kept as the exchange
+        sent them, e.g string prices, and win over the normalized ones.
+        """
+        fields = {
+            "orderId": self.order_id,
+            "clientOrderId": self.client_id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "type": self.type,
+            "status": self.status,
+            "price": self.price,
+            "origQty": self.quantity,
+            "executedQty": self.filled,
+            "cummulativeQuoteQty": self.quote_filled,
+            "updateTime": self.updated,
+        }
+        return dict(fields, **self.raw) if self.raw else fields
+
+    def __repr__(self):
+        return f"Order({self.symbol}, {self.order_id}, {self.side}, {self.status}, {self.filled}/{self.quantity})"
+
+
+def from_binance(order):
+    """Order of a Binance REST order or order response"""
+    return Order(order["orderId"], order.get("clientOrderId"), order["symbol"], order.get("side"),
+                 order.get("type"), order.get("status"), order.get("price"), order.get("origQty"),
+                 order.get("executedQty"), order.get("cummulativeQuoteQty"),
+                 order.get("updateTime") or order.get("transactTime") or order.get("time"), order)
+
+
+def from_binance_report(msg):
+    """Order of a Binance executionReport event"""
+    # A cancelation carries its own client id in "c" and the order's in "C"
+    client_id = msg.get("C") or msg.get("c")
+    return Order(msg["i"], client_id, msg["s"], msg.get("S"), msg.get("o"), msg.get("X"),
+                 msg.get("p"), msg.get("q"), msg.get("z"), msg.get("Z"), msg.get("T") or msg.get("E"))
+
+
+def kucoin_status(active, canceled, filled):
+    if active:
+        return "PARTIALLY_FILLED" if filled else "NEW"
+    return "CANCELED" if canceled else "FILLED"
+
+
+def from_kucoin(order):
+    """Order of a KuCoin REST order (list orders or get an order)"""
+    return Order(order["id"], order.get("clientOid"), order["symbol"], order.get("side"),
+                 order.get("type"),
+                 kucoin_status(order.get("isActive"), order.get("cancelExist"), float(order.get("dealSize") or 0)),
+                 order.get("price"), order.get("size"), order.get("dealSize"), order.get("dealFunds"),
+                 order.get("createdAt"), order)
+
+
+def from_kucoin_report(msg):
+    """Order of a KuCoin /spotMarket/tradeOrders message"""
+    data = msg.get("data") or msg
+    filled = float(data.get("filledSize") or 0)
+    kind = data.get("type")
+    if kind == "canceled":
+        status = "CANCELED"
+    elif kind == "filled" or (data.get("status") == "done" and kind != "canceled"):
+        status = "FILLED"
+    else:
+        status = "PARTIALLY_FILLED" if filled else "NEW"
+    # ts is in nanoseconds
+    updated = int(data.get("ts") or 0) // 1000000 or data.get("orderTime")
+    return Order(data["orderId"], data.get("clientOid"), data["symbol"], data.get("side"),
+                 data.get("orderType"), status, data.get("price"), data.get("size"),
+                 filled, None, updated)
+
+
+def bittrex_time(value):
+    """Epoch ms of a Bittrex v1.1 timestamp e.g 2014-07-09T03:55:48.77 (UTC)"""
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def from_bittrex(order):
+    """Order of a Bittrex v1.1 open order or order history entry"""
+    quantity = float(order.get("Quantity") or 0)
+    filled = quantity - float(order.get("QuantityRemaining") or 0)
+    if not order.get("Closed"):
+        status = "PARTIALLY_FILLED" if filled else "NEW"
+    else:
+        status = "CANCELED" if order.get("CancelInitiated") or filled < quantity else "FILLED"
+    # OrderType is e.g LIMIT_BUY
+    kind, _, side = (order.get("OrderType") or "").partition("_")
+    return Order(order["OrderUuid"], None, order.get("Exchange"), side, kind, status, order.get("Limit"),
+                 quantity, filled, order.get("Price"),
+                 bittrex_time(order.get("Closed") or order.get("TimeStamp") or order.get("Opened")), order)
+
+
+class OrderStore():
+    """Orders of one account kept in memory and indexed
+
+    Orders are found by (symbol, exchange id), client id, symbol and status without
+    touching the exchange. Attached to the account's private stream (see
+    `attach`) every execution report updates its order as it happens;
+    REST is only used to backfill the open orders after a (re)connection,
+    when reports may have been missed. Updates older than the state held
+    are ignored and handlers subscribed with `subscribe` are called with
+    every order that changed.
+    """
+
+    def __init__(self, exchange, backfill=None, fetch=None, max_orders=None):
+        """
+        Args:
+            exchange (string): Name of exchange
+            backfill (callable): Returns the account's open orders as `Order`s
+            fetch (callable): Returns the current `Order` of an (symbol, order id)
+            max_orders (int): Orders kept, see `MAX_ORDERS`
+        """
+        self.exchange = exchange
+        self.backfill = backfill
+        self.fetch = fetch
+        self.max_orders = int(max_orders or MAX_ORDERS)
+        self.streaming = False
+        self.updates = 0
+        self.backfills = 0
+        self.handlers = []
+        self._orders = {}
+        self._by_client = {}
+        self._by_symbol = {}
+        self._by_status = {}
+        self._lock = threading.RLock()
+
+    def subscribe(self, handler):
+        """Call `handler` with every order that changed, on the thread applying the update"""
+        self.handlers.append(handler)
+
+    def _index(self, order, add=True):
+        key = order.key
+        for index, value in ((self._by_symbol, order.symbol), (self._by_status, order.status)):
+            keys = index.setdefault(value, set())
+            if add:
+                keys.add(key)
+            else:
+                keys.discard(key)
+        if order.client_id:
+            if add:
+                self._by_client[order.client_id] = key
+            elif self._by_client.get(order.client_id) == key:
+                del self._by_client[order.client_id]
+
+    def update(self, order, force=False):
+        """Store the state of an order unless a newer one is held
+
+        Args:
+            order (Order): New state of the order
+            force (bool): Store it even if it looks older, for authoritative reads
+
+        Returns:
+            bool: Whether the order changed.
+        """
+        with self._lock:
+            held = self._orders.get(order.key)
+            if held is not None:
+                stale = held.updated > order.updated or (held.updated == order.updated and held.filled > order.filled)
+                if stale and not force:
+                    return False
+                # Reports may leave out what does not change
+                for attr in ("client_id", "side", "type", "price", "quantity", "quote_filled"):
+                    if not getattr(order, attr):
+                        setattr(order, attr, getattr(held, attr))
+                self._index(held, add=False)
+            self._orders[order.key] = order
+            self._index(order)
+            self.updates += 1
+            if held is None and len(self._orders) > self.max_orders:
+                self._evict()
+        for handler in tuple(self.handlers):
+            try:
+                handler(order)
+            except Exception as ex:
+                logger.error(ex, exc_info=True)
+        return True
+
+    def _evict(self):
+        # Down to 90% of the bound, so the scan is not repeated on every new order
+        closed = sorted((order for order in self._orders.values() if not order.is_open),
+                        key=lambda order: order.updated)
+        for order in closed[:len(self._orders) - self.max_orders * 9 // 10]:
+            self._index(order, add=False)
+            del self._orders[order.key]
+
+    def load(self, orders):
+        """Store orders read over REST"""
+        for order in orders:
+            self.update(order)
+
+    def update_from_binance(self, msg):
+        """Apply a Binance executionReport event"""
+        self.update(from_binance_report(msg))
+
+    def update_from_kucoin(self, msg):
+        """Apply a KuCoin /spotMarket/tradeOrders message"""
+        self.update(from_kucoin_report(msg))
+
+    def get(self, symbol, order_id):
+        return self._orders.get((symbol, str(order_id)))
+
+    def by_client_id(self, client_id):
+        key = self._by_client.get(client_id)
+        return self._orders.get(key) if key else None
+
+    def orders(self, symbol=None, status=None, limit=None):
+        """Orders of a symbol and/or status(es), latest update first
+
+        Args:
+            symbol (string): Exchange symbol e.g ETHBTC
+            status (object): Status or tuple of statuses e.g `OPEN`
+            limit (int): Maximum number of orders returned
+        """
+        statuses = (status,) if isinstance(status, str) else status
+        with self._lock:
+            if symbol is not None:
+                # A symbol holds few orders, the status sets span every symbol
+                orders = [self._orders[key] for key in self._by_symbol.get(symbol, ())]
+                if statuses is not None:
+                    orders = [order for order in orders if order.status in statuses]
+            elif statuses is not None:
+                orders = [self._orders[key] for value in statuses for key in self._by_status.get(value, ())]
+            else:
+                orders = list(self._orders.values())
+        orders.sort(key=lambda order: order.updated, reverse=True)
+        return orders[:limit] if limit else orders
+
+    def open_orders(self, symbol=None):
+        return self.orders(symbol, OPEN)
+
+    def attach(self, stream):
+        """Keep the store current from a private stream e.g `BinanceUserStream`
+
+        The open orders are backfilled over REST on every (re)connection.
+        """
+        if self.exchange == "binance":
+            stream.subscribe("executionReport", self.update_from_binance)
+        elif self.exchange == "kucoin":
+            stream.subscribe("/spotMarket/tradeOrders", self.update_from_kucoin)
+        else:
+            raise Exception(f"No private order stream for {self.exchange}")
+        stream.on_connect.append(self.connected)
+        stream.on_disconnect.append(self.disconnected)
+
+    def connected(self):
+        threading.Thread(target=self._resync, name=f"{self.exchange}-orders", daemon=True).start()
+
+    def disconnected(self):
+        self.streaming = False
+
+    def _resync(self):
+        try:
+            self.resync()
+            self.streaming = True
+        except Exception as ex:
+            logger.error(f"Error backfilling {self.exchange} orders: {ex}")
+
+    def resync(self):
+        """Backfill the open orders and settle the ones that closed meanwhile
+
+        Orders held as open that the exchange no longer lists as open are
+        fetched one by one for their final state.
+        """
+        if self.backfill is None:
+            return
+        listed = list(self.backfill())
+        self.load(listed)
+        self.backfills += 1
+        listed_keys = {order.key for order in listed}
+        closed = [order for order in self.open_orders() if order.key not in listed_keys]
+        if closed and self.fetch is not None:
+            for order in closed:
+                try:
+                    # KuCoin orders only carry their creation time, the fetched state is the current one
+                    self.update(self.fetch(order.symbol, order.order_id), force=True)
+                except Exception as ex:
+                    logger.error(f"Error fetching {self.exchange} order {order.order_id}: {ex}")
+        logger.info(f"Backfilled {len(listed)} open {self.exchange} orders > settled: {len(closed)}")
+
+    def stats(self):
+        return {
+            "exchange": self.exchange,
+            "orders": len(self._orders),
+            "open": sum(len(self._by_status.get(status, ())) for status in OPEN),
+            "streaming": self.streaming,
+            "updates": self.updates,
+            "backfills": self.backfills,
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_order_store(exchange, account, backfill=None, fetch=None):
+    """Return the process wide order store of an account
+
+    Args:
+        exchange (string): Name of exchange
+        account (string): Account the store belongs to e.g its api key
+        backfill (callable): Open orders source, set when the store has none yet
+        fetch (callable): Single order source, set when the store has none yet
+    """
+    with _stores_lock:
+        store = _stores.get((exchange, account))
+        if store is None:
+            store = _stores[(exchange, account)] = OrderStore(exchange)
+        store.backfill = store.backfill or backfill
+        store.fetch = store.fetch or fetch
+        return store
@@ -0,0 +1,92 @@
+from os import environ
+import threading
+import time
+
+MAX_AGE = float(environ.get("PRICE_MAX_AGE", 2))
+
+
+class Quote():
+    __slots__ = ("bid", "ask", "last", "timestamp")
+
+    def __init__(self, bid, ask, last, timestamp):
+        self.bid = bid
+        self.ask = ask
+        self.last = last
+        self.timestamp = timestamp
+
+    def price(self, side=None):
+        """Best price for a side: ask to buy, bid to sell, last otherwise"""
+        if side == "BUY":
+            return self.ask or self.last
+        if side == "SELL":
+            return self.bid or self.last
+        return self.last or self.ask or self.bid
+
+
+class PriceBook():
+    """Last price and best bid/ask per symbol, kept current by websocket streams
+
+    Order sizing reads from it and only falls back to a REST ticker call when
+    the symbol has not been updated within `max_age` seconds.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = float(max_age if max_age is not None else MAX_AGE)
+        self.hits = 0
+        self.misses = 0
+        self._quotes = {}
+
+    def update(self, symbol, bid=None, ask=None, last=None, timestamp=None):
+        quote = self._quotes.get(symbol)
+        timestamp = timestamp or time.time()
+        if quote is None:
+            self._quotes[symbol] = Quote(bid, ask, last, timestamp)
+            return
+        quote.bid = bid or quote.bid
+        quote.ask = ask or quote.ask
+        quote.last = last or quote.last
+        quote.timestamp = timestamp
+
+    def update_from_ticker(self, msg):
+        """Apply a Binance 24hr ticker or book ticker message"""
+        symbol = msg.get("s")
+        if symbol:
+            self.update(symbol, bid=msg.get("b"), ask=msg.get("a"), last=msg.get("c"))
+
+    def get(self, symbol, max_age=None):
+        """Return the quote of a symbol or None when missing or stale
+
+        Args:
+            symbol (string): Exchange symbol e.g ETHBTC
+            max_age (float): Staleness bound in seconds, defaults to the book's
+
+        Returns:
+            Quote: bid, ask, last and receipt time.
+        """
+        quote = self._quotes.get(symbol)
+        max_age = self.max_age if max_age is None else max_age
+        if quote is None or time.time() - quote.timestamp > max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return quote
+
+    def items(self):
+        """(symbol, quote) pairs of every symbol seen, stale ones included"""
+        return list(self._quotes.items())
+
+    def stats(self):
+        return {"symbols": len(self._quotes), "hits": self.hits, "misses": self.misses}
+
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def get_price_book(exchange):
+    """Return the process wide price book of an exchange"""
+    with _books_lock:
+        book = _books.get(exchange)
+        if book is None:
+            book = _books[exchange] = PriceBook()
+        return book
@@ -0,0 +1,113 @@
+from os import environ
+import asyncio
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .instruments import get_instruments
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(environ.get("PRICES_TIMEOUT", 5))
+
+# Own pool so a blocking exchange that timed out does not hold up asyncio.run
+_executor = ThreadPoolExecutor(thread_name_prefix="prices")
+
+
+def canonical_pair(exchange, symbol):
+    """Translate an exchange symbol to a canonical BASE/QUOTE pair
+
+    Args:
+        exchange (string): Name of exchange
+        symbol (string): Exchange symbol e.g ETHBTC, ETH-BTC or BTC-ETH
+
+    Returns:
+        string: Canonical pair e.g ETH/BTC, None if the symbol can not be split.
+    """
+    instrument = get_instruments(exchange).lookup(symbol)
+    return instrument.pair if instrument else None
+
+
+class PriceSnapshot():
+    """Prices of several exchanges keyed by canonical pair
+
+    Attributes:
+        prices (dict): {"ETH/BTC": {"binance": 0.0794, "kucoin": 0.0795}}
+        quotes (dict): Best (bid, ask) of the exchanges that quote them, {"ETH/BTC": {"binance": (0.0794, 0.0795)}}
+        timestamps (dict): Time each exchange answered, {"binance": 1610000000.1}
+        latencies (dict): Seconds each exchange took to answer
+        errors (dict): Exchanges that failed or timed out and why
+    """
+
+    def __init__(self):
+        self.prices = {}
+        self.quotes = {}
+        self.timestamps = {}
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, exchange, tickers, timestamp, latency):
+        self.timestamps[exchange] = timestamp
+        self.latencies[exchange] = latency
+        for ticker in tickers or []:
+            price = ticker.get("price")
+            pair = canonical_pair(exchange, ticker.get("symbol") or "")
+            if pair is None or price is None:
+                continue
+            self.prices.setdefault(pair, {})[exchange] = float(price)
+            if ticker.get("bid") and ticker.get("ask"):
+                self.quotes.setdefault(pair, {})[exchange] = (float(ticker["bid"]), float(ticker["ask"]))
+
+    def get(self, pair):
+        return self.prices.get(pair, {})
+
+
+async def _fetch(exchange, timeout):
+    started = time.perf_counter()
+    if inspect.iscoroutinefunction(exchange.get_prices):
+        request = exchange.get_prices()
+    else:
+        request = asyncio.get_running_loop().run_in_executor(_executor, exchange.get_prices)
+    tickers = await asyncio.wait_for(request, timeout)
+    return tickers, time.time(), time.perf_counter() - started
+
+
+async def fetch_prices(exchanges, timeout=None, timeouts=None):
+    """Query all exchanges concurrently and merge their prices
+
+    Blocking `Exchange` objects run in a thread pool, `AsyncExchange`
+    objects are awaited directly. The call takes as long as the slowest
+    exchange, bounded by its timeout.
+
+    Args:
+        exchanges (list): Exchange or AsyncExchange instances
+        timeout (float): Default per exchange timeout in seconds
+        timeouts (dict): Per exchange timeouts e.g {"bittrex": 2}
+
+    Returns:
+        PriceSnapshot: Normalized prices of every exchange that answered.
+    """
+    timeout = timeout or DEFAULT_TIMEOUT
+    timeouts = timeouts or {}
+    names = [exchange.name for exchange in exchanges]
+    results = await asyncio.gather(
+        *[_fetch(exchange, timeouts.get(exchange.name, timeout))
+          for exchange in exchanges],
+        return_exceptions=True)
+
+    snapshot = PriceSnapshot()
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            if isinstance(result, asyncio.TimeoutError):
+                result = f"timed out after {timeouts.get(name, timeout)}s"
+            logger.error(f"Could not fetch prices from {name}: {result}")
+            snapshot.errors[name] = str(result)
+            continue
+        snapshot.add(name, *result)
+    return snapshot
+
+
+def get_prices(exchanges, timeout=None, timeouts=None):
+    """Blocking wrapper of `fetch_prices` for code without an event loop"""
+    return asyncio.run(fetch_prices(exchanges, timeout, timeouts))
@@ -0,0 +1,149 @@
+from decimal import Decimal, ROUND_FLOOR
+
+# Relative margin around a step boundary inside which the float batch path
+# can not tell on which side the exact quotient lies, see `BatchQuantizer`
+BATCH_TOLERANCE = 1e-12
+
+
+def to_decimal(value):
+    """Exact Decimal of a number or numeric string, going through str for floats"""
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def to_str(value):
+    """Plain decimal string of a number for an API, never scientific notation e.g 4.5E-7 -> 0.00000045"""
+    return format(to_decimal(value), "f")
+
+
+def decimals_of(step):
+    """Number of decimal places of a step e.g 0.00100000 -> 3, 1.0 -> 0, 1e-05 -> 5"""
+    exponent = step.normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+class Quantizer():
+    """Floors order quantities and prices to a symbol's lot and tick sizes
+
+    All arithmetic is done with Decimal, so step sizes such as "1.00000000",
+    "0.001" or 1e-05 are handled exactly.
+    """
+    __slots__ = ("step_size", "tick_size", "min_qty", "min_notional",
+                 "qty_decimals", "price_decimals")
+
+    def __init__(self, step_size=None, tick_size=None, min_qty=None, min_notional=None):
+        """
+        Args:
+            step_size (object): Quantity increment, no flooring when empty or zero
+            tick_size (object): Price increment, no flooring when empty or zero
+            min_qty (object): Smallest quantity accepted
+            min_notional (object): Smallest quantity * price accepted
+        """
+        self.step_size = to_decimal(step_size) or None
+        self.tick_size = to_decimal(tick_size) or None
+        self.min_qty = to_decimal(min_qty) or Decimal(0)
+        self.min_notional = to_decimal(min_notional) or Decimal(0)
+        self.qty_decimals = decimals_of(self.step_size) if self.step_size else 8
+        self.price_decimals = decimals_of(self.tick_size) if self.tick_size else 8
+
+    @classmethod
+    def from_precision(cls, precision):
+        """Quantizer for exchanges that only publish a number of decimals"""
+        step = Decimal(1).scaleb(-int(precision))
+        return cls(step_size=step, tick_size=step)
+
+    @classmethod
+    def from_binance(cls, document):
+        """Build from a `stepsizes` document or a Binance exchange info symbol"""
+        if not document:
+            return cls()
+        filters = {item["filterType"]: item for item in document.get("filters", [])}
+        lot_size = document.get("lot_size") or filters.get("LOT_SIZE") or {}
+        price_filter = document.get("price_filter") or filters.get("PRICE_FILTER") or {}
+        min_notional = document.get("min_notional") or filters.get("MIN_NOTIONAL") or {}
+        return cls(step_size=lot_size.get("stepSize"), tick_size=price_filter.get("tickSize"),
+                   min_qty=lot_size.get("minQty"), min_notional=min_notional.get("minNotional"))
+
+    @classmethod
+    def from_kucoin(cls, symbol_info):
+        """Build from a KuCoin symbol list entry"""
+        return cls(step_size=symbol_info.get("baseIncrement"), tick_size=symbol_info.get("priceIncrement"),
+                   min_qty=symbol_info.get("baseMinSize"))
+
+    @staticmethod
+    def _floor(value, step, decimals):
+        value = to_decimal(value)
+        if step:
+            value = (value / step).to_integral_value(ROUND_FLOOR) * step
+        return value.quantize(Decimal(1).scaleb(-decimals), rounding=ROUND_FLOOR)
+
+    def floor_qty(self, quantity):
+        return self._floor(quantity, self.step_size, self.qty_decimals)
+
+    def floor_price(self, price):
+        return self._floor(price, self.tick_size, self.price_decimals)
+
+    def qty_for_amount(self, amount, price):
+        """Largest valid quantity that `amount` of the quote asset buys at `price`"""
+        return self.floor_qty(to_decimal(amount) / to_decimal(price))
+
+    def is_valid(self, quantity, price):
+        quantity = to_decimal(quantity)
+        return quantity >= self.min_qty and quantity * to_decimal(price) >= self.min_notional
+
+
+class BatchQuantizer():
+    """Sizes many orders across symbols in one NumPy call
+
+    Step counts are floored in float64. Quotients within `BATCH_TOLERANCE`
+    of a step boundary, where binary rounding could land on either side,
+    are sized again in Decimal by the symbol's `Quantizer`, so every
+    quantity equals `Quantizer.qty_for_amount` and is never rounded up.
+    """
+
+    def __init__(self, quantizers):
+        """
+        Args:
+            quantizers (dict): Quantizer per symbol
+        """
+        # NumPy is only loaded by the batch path, single orders use Decimal
+        import numpy as np
+
+        self.symbols = {symbol: position for position, symbol in enumerate(quantizers)}
+        self.quantizers = list(quantizers.values())
+        self.steps = np.array([float(quantizer.step_size or 0) for quantizer in quantizers.values()])
+        self.decimals = np.array([quantizer.qty_decimals for quantizer in quantizers.values()])
+        self.min_qty = np.array([float(quantizer.min_qty) for quantizer in quantizers.values()])
+        self.min_notional = np.array([float(quantizer.min_notional) for quantizer in quantizers.values()])
+
+    def size(self, symbols, amounts, prices):
+        """Floor amount / price to each symbol's step size
+
+        Args:
+            symbols (list): Symbol of each order
+            amounts (array): Quote amount of each order
+            prices (array): Price of each order
+
+        Returns:
+            tuple: (quantities, valid) arrays; valid is False below min qty or notional.
+        """
+        import numpy as np
+
+        index = np.array([self.symbols[symbol] for symbol in symbols], dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        scale = 10.0 ** self.decimals[index]
+        # Without a step size quantities are floored to the symbol's decimals
+        units = np.where(self.steps[index] > 0, self.steps[index], 1 / scale)
+        ratio = amounts / prices / units
+
+        counts = np.floor(ratio)
+        quantities = np.round(counts * units * scale) / scale
+        for position in np.flatnonzero(np.floor(ratio * (1 + BATCH_TOLERANCE)) != np.floor(ratio * (1 - BATCH_TOLERANCE))):
+            quantizer = self.quantizers[index[position]]
+            quantities[position] = float(quantizer.qty_for_amount(amounts[position].item(), prices[position].item()))
+        valid = (quantities >= self.min_qty[index]) & (quantities * prices >= self.min_notional[index]) & (quantities > 0)
+        return quantities, valid
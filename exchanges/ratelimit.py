@@ -0,0 +1,277 @@
+from os import environ
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from itertools import count
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+ORDER = 0
+NORMAL = 1
+LOW = 2
+
+# Request weight budget per exchange (shared by every key, as the exchanges
+# count it per IP) and order budget per API key, as (capacity, period seconds)
+LIMITS = {
+    "binance": {"weight": (1200, 60), "orders": (50, 10)},
+    "kucoin": {"weight": (1800, 60), "orders": (45, 3)},
+    "bittrex": {"weight": (60, 60), "orders": (60, 60)},
+}
+
+# (method or None for any, path suffix, weight, priority); the first match wins,
+# unmatched requests weigh 1 at NORMAL priority
+ENDPOINTS = {
+    "binance": [
+        ("POST", "/order", 1, ORDER),
+        ("DELETE", "/order", 1, ORDER),
+        ("GET", "/order", 2, NORMAL),
+        (None, "/account", 10, NORMAL),
+        (None, "/openOrders", 3, NORMAL),
+        (None, "/allOrders", 10, LOW),
+        (None, "/myTrades", 10, LOW),
+        (None, "/exchangeInfo", 10, NORMAL),
+        (None, "/ticker/price", 2, NORMAL),
+        # Weight of the all-symbols call, which is the one used
+        (None, "/ticker/bookTicker", 4, NORMAL),
+        (None, "/ticker/24hr", 40, LOW),
+        (None, "/depth", 5, NORMAL),
+    ],
+    "kucoin": [
+        ("POST", "/api/v1/orders", 1, ORDER),
+        ("DELETE", "/api/v1/orders", 1, ORDER),
+        ("POST", "/api/v1/orders/multi", 1, ORDER),
+        ("GET", "/api/v1/orders", 1, LOW),
+        (None, "/api/v1/fills", 1, LOW),
+    ],
+    "bittrex": [
+        (None, "/market/buylimit", 1, ORDER),
+        (None, "/market/selllimit", 1, ORDER),
+        (None, "/market/buymarket", 1, ORDER),
+        (None, "/market/sellmarket", 1, ORDER),
+        (None, "/market/cancel", 1, ORDER),
+        (None, "/account/getorderhistory", 1, LOW),
+    ],
+}
+
+# Response headers reporting what the exchange has counted so far
+USED_WEIGHT_HEADERS = ("X-MBX-USED-WEIGHT-1M", "X-MBX-USED-WEIGHT")
+ORDER_COUNT_HEADER = "X-MBX-ORDER-COUNT-10S"
+REMAINING_HEADER = "gw-ratelimit-remaining"
+
+
+class TokenBucket():
+    """`capacity` tokens refilled evenly over `period` seconds"""
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, weight, now):
+        """Seconds until `weight` tokens are available"""
+        self.refill(now)
+        if self.tokens >= weight:
+            return 0.0
+        return (weight - self.tokens) / self.rate
+
+    def take(self, weight):
+        self.tokens -= weight
+
+    def sync(self, remaining):
+        """Lower the local estimate to what the exchange reports as left"""
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimiter():
+    """Weighted token-bucket scheduler of one exchange
+
+    Every request waits for its endpoint weight in the exchange bucket and,
+    for orders, for one token in its API key's order bucket. Waiting requests
+    are served by priority (orders first, history calls last) then arrival.
+    An order held back only by its key's order bucket does not hold back
+    requests queued behind it that need no token from that bucket, e.g
+    reads or orders of other keys. Used-weight headers and 429/418
+    responses correct the local estimate.
+    """
+
+    def __init__(self, exchange, limits=None, endpoints=None):
+        """
+        Args:
+            exchange (string): Name of exchange
+            limits (dict): {"weight": (capacity, period), "orders": (capacity, period)}
+            endpoints (list): (method, path suffix, weight, priority) rules
+        """
+        self.exchange = exchange
+        self.limits = limits or LIMITS[exchange]
+        self.endpoints = endpoints if endpoints is not None else ENDPOINTS.get(exchange, [])
+        self.weight = TokenBucket(*self.limits["weight"])
+        self.orders = {}
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self._waiting = []
+        self._requests = {}
+        self._tickets = count()
+        self._condition = threading.Condition()
+
+    def cost(self, method, path):
+        """(weight, priority) of a request"""
+        for rule_method, suffix, weight, priority in self.endpoints:
+            if (rule_method is None or rule_method == method.upper()) and path.endswith(suffix):
+                return weight, priority
+        return 1, NORMAL
+
+    def order_bucket(self, api_key):
+        bucket = self.orders.get(api_key)
+        if bucket is None:
+            bucket = self.orders[api_key] = TokenBucket(*self.limits["orders"])
+        return bucket
+
+    def _holds_back(self, ahead, priority, api_key, now):
+        """Whether a request queued ahead has to be served first"""
+        weight, ahead_priority, ahead_key = self._requests[ahead]
+        if self.blocked_until > now or self.weight.wait_time(weight, now) > 0:
+            # The weight budget is shared, it is handed out in queue order
+            return True
+        if ahead_priority != ORDER or self.order_bucket(ahead_key).wait_time(1, now) <= 0:
+            # Free to go, it has only not woken up yet
+            return True
+        # Waiting on its key's order bucket, which only orders of that key need
+        return priority == ORDER and api_key == ahead_key
+
+    def _wait_time(self, ticket, weight, priority, api_key, now):
+        for ahead in sorted(self._waiting):
+            if ahead == ticket:
+                break
+            if self._holds_back(ahead, priority, api_key, now):
+                return None
+        wait = max(self.blocked_until - now, self.weight.wait_time(weight, now))
+        if priority == ORDER:
+            wait = max(wait, self.order_bucket(api_key).wait_time(1, now))
+        if wait <= 0:
+            self.weight.take(weight)
+            if priority == ORDER:
+                self.order_bucket(api_key).take(1)
+        return wait
+
+    def _join(self, ticket, weight, priority, api_key):
+        heapq.heappush(self._waiting, ticket)
+        self._requests[ticket] = (weight, priority, api_key)
+
+    def _leave(self, ticket):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+        self._requests.pop(ticket, None)
+        self._condition.notify_all()
+
+    def acquire(self, method, path, api_key=None):
+        """Block until the request may be sent
+
+        Returns:
+            float: Seconds waited.
+        """
+        weight, priority = self.cost(method, path)
+        ticket = (priority, next(self._tickets))
+        started = time.monotonic()
+        with self._condition:
+            self._join(ticket, weight, priority, api_key)
+            try:
+                while True:
+                    wait = self._wait_time(ticket, weight, priority, api_key, time.monotonic())
+                    if wait is not None and wait <= 0:
+                        break
+                    self._condition.wait(wait)
+            finally:
+                self._leave(ticket)
+        return self._account(started)
+
+    async def acquire_async(self, method, path, api_key=None):
+        """Awaitable `acquire`; polls instead of holding a thread while waiting"""
+        weight, priority = self.cost(method, path)
+        ticket = (priority, next(self._tickets))
+        started = time.monotonic()
+        with self._condition:
+            self._join(ticket, weight, priority, api_key)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._wait_time(ticket, weight, priority, api_key, time.monotonic())
+                if wait is not None and wait <= 0:
+                    break
+                await asyncio.sleep(wait if wait is not None else 0.005)
+        finally:
+            with self._condition:
+                self._leave(ticket)
+        return self._account(started)
+
+    def _account(self, started):
+        waited = time.monotonic() - started
+        self.requests += 1
+        self.waited += waited
+        if waited > 0.001:
+            self.throttled += 1
+        return waited
+
+    def update(self, status, headers, api_key=None):
+        """Apply the rate limit state an exchange response reports
+
+        Args:
+            status (int): HTTP status code
+            headers (object): Case-insensitive response headers
+            api_key (string): Key the request was signed with
+        """
+        with self._condition:
+            for name in USED_WEIGHT_HEADERS:
+                if headers.get(name):
+                    self.weight.sync(self.weight.capacity - float(headers[name]))
+                    break
+            if headers.get(ORDER_COUNT_HEADER) and api_key is not None:
+                bucket = self.order_bucket(api_key)
+                bucket.sync(bucket.capacity - float(headers[ORDER_COUNT_HEADER]))
+            if headers.get(REMAINING_HEADER):
+                self.weight.sync(float(headers[REMAINING_HEADER]))
+            if status in (418, 429):
+                retry_after = float(headers.get("Retry-After") or 1)
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                logger.warning(
+                    f"{self.exchange} answered {status}, holding requests for {retry_after}s")
+            self._condition.notify_all()
+
+    def stats(self):
+        return {
+            "exchange": self.exchange,
+            "tokens": self.weight.tokens,
+            "waiting": len(self._waiting),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "waited": self.waited,
+            "blocked_for": max(0.0, self.blocked_until - time.monotonic()),
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(exchange):
+    """Return the process wide limiter of an exchange
+
+    None when the exchange has no limits configured or RATE_LIMITS is "off".
+    """
+    if environ.get("RATE_LIMITS", "on").lower() == "off" or exchange not in LIMITS:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(exchange)
+        if limiter is None:
+            limiter = _limiters[exchange] = RateLimiter(exchange)
+        return limiter
@@ -0,0 +1,62 @@
+import importlib
+import threading
+
+_providers = {}
+_async_providers = {}
+_lock = threading.Lock()
+
+
+def register_provider(name, provider=None, asynchronous=False):
+    """Make a service available to `Exchange` (or `AsyncExchange`) under a name
+
+    `provider` is a `ServiceInterface` class or its "module:Class" path; a
+    path is only imported on the first `Exchange` of that name, so unused
+    exchanges cost nothing at startup. Without `provider` it returns a class
+    decorator:
+
+        @register_provider("ftx")
+        class FtxService(ServiceInterface):
+            ...
+
+    Args:
+        name (string): Exchange name passed to `Exchange`
+        provider (object): Service class or "module:Class" path
+        asynchronous (bool): Register for `AsyncExchange`
+    """
+    if provider is None:
+        def decorator(cls):
+            register_provider(name, cls, asynchronous)
+            return cls
+        return decorator
+    with _lock:
+        (_async_providers if asynchronous else _providers)[name] = provider
+    return provider
+
+
+def get_provider(name, asynchronous=False):
+    """Return the service class registered for an exchange, importing it if needed"""
+    providers = _async_providers if asynchronous else _providers
+    provider = providers.get(name)
+    if provider is None:
+        raise Exception(f"Exchange {name} is not supported")
+    if isinstance(provider, str):
+        module, _, attr = provider.partition(":")
+        provider = getattr(importlib.import_module(module), attr)
+        with _lock:
+            providers[name] = provider
+    return provider
+
+
+def providers(asynchronous=False):
+    """Names of the registered exchanges"""
+    return sorted(_async_providers if asynchronous else _providers)
+
+
+register_provider("binance", "exchanges.binance.service:BinanceService")
+register_provider("bittrex", "exchanges.bittrex.service:BittrexService")
+register_provider("kucoin", "exchanges.kucoin.service:KucoinService")
+register_provider("simulated", "exchanges.simulated.service:SimulatedService")
+
+register_provider("binance", "exchanges.binance.async_service:AsyncBinanceService", asynchronous=True)
+register_provider("bittrex", "exchanges.bittrex.async_service:AsyncBittrexService", asynchronous=True)
+register_provider("kucoin", "exchanges.kucoin.async_service:AsyncKucoinService", asynchronous=True)
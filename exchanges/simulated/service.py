@@ -0,0 +1,116 @@
+import logging
+import time
+from itertools import count
+
+from core.exceptions import UserAdviceException
+from ..instruments import get_instruments
+from ..interface import ServiceInterface
+from ..pricebook import PriceBook
+from ..quantize import Quantizer
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedService(ServiceInterface):
+    """Paper trading provider without network access
+
+    Market orders fill at the best ask (buy) or bid (sell) of the price book,
+    which the replayed ticks keep current. Balances, fees and fills are kept
+    in memory; order timestamps come from `clock`, so replays run in virtual time.
+    """
+    name = 'simulated'
+    exchange = 'simulated'
+
+    def __init__(self, **kwargs):
+        """
+        Args:
+            prices (PriceBook): Quotes orders fill at
+            balances (dict): Starting balance per asset, defaults to 1 BTC
+            fee (float): Fee rate charged on the quote amount of every fill
+            clock (callable): Returns the current (virtual) epoch seconds
+        """
+        self.prices = kwargs.get("prices") or PriceBook(max_age=float("inf"))
+        self.balances = dict(kwargs.get("balances") or {"BTC": 1.0})
+        self.fee = float(kwargs.get("fee", 0.001))
+        self.clock = kwargs.get("clock") or time.time
+        self.quantizer = Quantizer.from_precision(8)
+        self.instruments = get_instruments("simulated")
+        self.orders = []
+        self._order_ids = count(1)
+
+    def get_account(self):
+        return {"balances": [{"asset": asset, "free": str(free)} for asset, free in self.balances.items()]}
+
+    def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        symbol = self.instruments.symbol(coin_name, pair_base)
+        price = self.get_price(symbol, side="BUY")
+        quantity = float(self.calculate_buy_qty(price, amount))
+        cost = quantity * price
+        if quantity <= 0 or cost * (1 + self.fee) > self.balances.get(pair_base, 0):
+            raise UserAdviceException(
+                f"Balance not enough to execute action in {self.name} exchange")
+        self.balances[pair_base] -= cost * (1 + self.fee)
+        self.balances[coin_name] = self.balances.get(coin_name, 0) + quantity
+        return self._fill(symbol, "BUY", quantity, price)
+
+    def sell(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        symbol = self.instruments.symbol(coin_name, pair_base)
+        price = self.get_price(symbol, side="SELL")
+        quantity = float(self.calculate_sell_qty(price, amount))
+        if quantity <= 0 or quantity > self.balances.get(coin_name, 0):
+            raise UserAdviceException(
+                f"Balance not enough to execute action in {self.name} exchange")
+        self.balances[coin_name] -= quantity
+        self.balances[pair_base] = self.balances.get(pair_base, 0) + quantity * price * (1 - self.fee)
+        return self._fill(symbol, "SELL", quantity, price)
+
+    def _fill(self, symbol, side, quantity, price):
+        order = {
+            "symbol": symbol,
+            "orderId": next(self._order_ids),
+            "transactTime": int(self.clock() * 1000),
+            "side": side,
+            "type": "MARKET",
+            "status": "FILLED",
+            "price": price,
+            "executedQty": quantity,
+        }
+        self.orders.append(order)
+        logger.info(f"Filled {side} {symbol} > qty: {quantity} > price: {price}")
+        return order
+
+    def get_price(self, symbol, precision=8, side=None):
+        quote = self.prices.get(symbol, max_age=float("inf"))
+        if quote is None or not quote.price(side):
+            raise UserAdviceException(f"No price for {symbol} in {self.name} exchange")
+        return float(quote.price(side))
+
+    def calculate_sell_qty(self, price, amount, step_size=None, quantizer=None):
+        return (quantizer or self.quantizer).qty_for_amount(amount, price)
+
+    def calculate_buy_qty(self, price, amount, step_size=None, quantizer=None):
+        return (quantizer or self.quantizer).qty_for_amount(amount, price)
+
+    def get_balance(self, coin_name):
+        return self.balances.get(coin_name, 0)
+
+    def has_coin(self, coin_name, quantity=None):
+        free = self.balances.get(coin_name, 0)
+        return free >= float(quantity) if quantity else free > 0
+
+    def track_coin(self, payload):
+        pass
+
+    def get_prices(self):
+        return [{"symbol": symbol, "price": quote.price(), "bid": quote.bid, "ask": quote.ask}
+                for symbol, quote in self.prices.items()]
+
+    def get_symbol_info(self, coin_name=None, pair_base="BTC", symbol=None):
+        return None
+
+    def get_open_orders(self, coin_name, pair_base="BTC"):
+        return []
+
+    def get_all_orders(self, coin_name, limit=5, pair_base="BTC"):
+        symbol = self.instruments.symbol(coin_name, pair_base)
+        return [order for order in self.orders if order["symbol"] == symbol][-limit:]
@@ -7,7 +7,10 @@ logger = logging.getLogger(__name__)
 
 logging.basicConfig(level=logging.INFO)
 
+WATCHES = [
+    ("ETH", "BTC", 0.03994100, 0.03994300, 0.1),
+]
+
 
 if __name__ == "__main__":
-    asyncio.run(AutoTrade.listener("binance", "ETH",
-                                   "BTC", 0.03994100, 0.03994300, 0.1))
+    asyncio.run(AutoTrade.listen_many("binance", WATCHES))
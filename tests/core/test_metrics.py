@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+
+from core.metrics import Histogram, MetricsRegistry, timed
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        return super().setUp()
+
+    def test_histogram_quantile(self):
+        histogram = Histogram()
+        for _ in range(99):
+            histogram.observe(0.0008)
+        histogram.observe(2.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.quantile(0.5), 0.001)
+        self.assertEqual(histogram.quantile(1.0), 2.5)
+
+    def test_render(self):
+        self.registry.histogram("tick_stage_seconds", stage="price").observe(0.002)
+        self.registry.gauge("order_queue_depth", lambda: 3)
+        text = self.registry.render()
+        self.assertIn('tick_stage_seconds_bucket{stage="price",le="0.0025"} 1', text)
+        self.assertIn('tick_stage_seconds_count{stage="price"} 1', text)
+        self.assertIn("order_queue_depth 3", text)
+
+    def test_scrape_while_series_register(self):
+        def read():
+            # A series labelled on first use, e.g by another thread, during the scrape
+            self.registry.counter("orders_total", exchange=f"exchange{len(self.registry.metrics)}").inc()
+            return 1
+
+        self.registry.gauge("open_orders", read)
+        self.registry.histogram("call_seconds").observe(0.1)
+        self.assertIn("open_orders 1", self.registry.render())
+        self.assertIn("open_orders", self.registry.snapshot())
+
+    def test_timed(self):
+        histogram = self.registry.histogram("call_seconds")
+
+        async def fetch():
+            return "done"
+
+        self.assertEqual(timed(lambda: 1, histogram)(), 1)
+        self.assertEqual(asyncio.run(timed(fetch, histogram)()), "done")
+        self.assertEqual(histogram.count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
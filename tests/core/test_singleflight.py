@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from core.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_threads_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        def fetch(symbol):
+            calls.append(symbol)
+            time.sleep(0.1)
+            return "0.04"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("ETHBTC", fetch, "ETHBTC")))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, ["ETHBTC"])
+        self.assertEqual(results, ["0.04"] * 10)
+        self.assertEqual(flight.do("ETHBTC", fetch, "ETHBTC"), "0.04")
+        self.assertEqual(len(calls), 2)
+
+    def test_coroutines_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"price": "0.04"}
+
+        async def main():
+            return await asyncio.gather(*[flight.do_async("ETHBTC", fetch) for _ in range(10)])
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_ttl_and_errors(self):
+        flight = SingleFlight(ttl=60)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return len(calls)
+
+        def fail():
+            raise ValueError("down")
+
+        self.assertEqual(flight.do("key", fetch), 1)
+        self.assertEqual(flight.do("key", fetch), 1)
+        self.assertRaises(ValueError, flight.do, "error", fail)
+        self.assertRaises(ValueError, flight.do, "error", fail)
+        self.assertEqual(flight.stats()["calls"], 3)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "0.04"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async("ETHBTC", fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do_async("ETHBTC", fetch))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower, leader.cancelled()
+
+        self.assertEqual(asyncio.run(main()), ("0.04", True))
+        self.assertEqual(flight.stats()["calls"], 1)
+
+    def test_finished_calls_evicted_after_ttl(self):
+        flight = SingleFlight(ttl=0.05)
+
+        async def fetch(symbol):
+            return symbol
+
+        async def main():
+            await asyncio.gather(*[flight.do_async(symbol, fetch, symbol) for symbol in ("ETHBTC", "NEOBTC")])
+            held = len(flight._futures)
+            await asyncio.sleep(0.1)
+            return held, len(flight._futures)
+
+        self.assertEqual(asyncio.run(main()), (2, 0))
+        flight.do("ETHBTC", lambda: 1)
+        time.sleep(0.1)
+        flight.do("NEOBTC", lambda: 2)
+        self.assertEqual(list(flight._calls), ["NEOBTC"])
+
+
+if __name__ == '__main__':
+    unittest.main()
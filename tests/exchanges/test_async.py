@@ -0,0 +1,144 @@
+import os
+import threading
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+os.environ.setdefault("DATABASE_NAME", "tests")
+
+from benchmarks.standins import StandInServer  # noqa: E402
+from core.exceptions import UserAdviceException  # noqa: E402
+from exchanges.async_adapter import AsyncExchange  # noqa: E402
+from exchanges.binance.async_service import AsyncBinanceService  # noqa: E402
+from exchanges.bittrex.async_service import AsyncBittrexService  # noqa: E402
+from exchanges.bittrex.service import BittrexService  # noqa: E402
+from exchanges.metadata import VERSIONS, SymbolMetadataCache, get_symbol_cache  # noqa: E402
+
+server = None
+
+
+def setUpModule():
+    global server
+    server = StandInServer().start()
+    get_symbol_cache("stepsizes").replace(server.symbol_documents())
+
+
+def tearDownModule():
+    server.stop()
+
+
+class StandInTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(AsyncBinanceService, "API_URL", f"{server.url}/binance/api"),
+            mock.patch.object(AsyncBittrexService, "API_URL", f"{server.url}/bittrex/api/v1.1"),
+            mock.patch.dict(os.environ, {"KUCOIN_API_URL": server.url}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        return super().setUp()
+
+
+class TestAsyncBinance(StandInTestCase):
+
+    async def test_price_and_market_order(self):
+        async with AsyncExchange("binance", api_key="async-binance", api_secret="secret") as exchange:
+            self.assertEqual(await exchange.get_price("ETH"), Decimal("0.0712"))
+            order = await exchange.buy("ETH", amount=0.01)
+            self.assertEqual(order["symbol"], "ETHBTC")
+            self.assertEqual(order["type"], "MARKET")
+            self.assertEqual(Decimal(order["origQty"]), Decimal("0.14"))
+            stored = exchange.provider.orders.get("ETHBTC", order["orderId"])
+            self.assertEqual(stored.status, "FILLED")
+            self.assertEqual(await exchange.provider.get_open_orders("ETH"), [])
+
+    async def test_prices_carry_book_quotes(self):
+        async with AsyncExchange("binance", api_key="async-binance", api_secret="secret") as exchange:
+            prices = {item["symbol"]: item for item in await exchange.get_prices()}
+        self.assertEqual(prices["ETHBTC"]["bid"], "0.07120000")
+        self.assertEqual(prices["ETHBTC"]["ask"], "0.07120000")
+
+    async def test_sell_checks_balance_ledger(self):
+        async with AsyncExchange("binance", api_key="async-binance-sell", api_secret="secret") as exchange:
+            self.assertTrue(await exchange.provider.has_coin("ETH"))
+            order = await exchange.sell("ETH", amount=0.01)
+            self.assertEqual(order["side"], "SELL")
+            with self.assertRaises(UserAdviceException):
+                await exchange.sell("ALT400", amount=0.01)
+
+    async def test_metadata_miss_is_read_off_the_loop(self):
+        threads = []
+
+        def find_one(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return None
+
+        versions = mock.MagicMock(find_one=lambda *args: None)
+        database = {"stepsizes": mock.MagicMock(find_one=find_one), VERSIONS: versions}
+        with mock.patch("exchanges.metadata.db_client", database):
+            async with AsyncExchange("binance", api_key="async-binance", api_secret="secret") as exchange:
+                await exchange.provider._load_symbol("LISTEDBTC")
+                await exchange.provider._load_symbol("LISTEDBTC")
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    async def test_cache_starts_off_the_loop(self):
+        threads = []
+        collection = mock.MagicMock()
+        collection.find.side_effect = lambda *args: threads.append(threading.current_thread()) or []
+        collection.find_one.return_value = None
+        cache = SymbolMetadataCache("stepsizes")
+        with mock.patch("exchanges.metadata.db_client", {"stepsizes": collection, VERSIONS: mock.MagicMock()}), \
+                mock.patch("exchanges.binance.async_service.get_symbol_cache", return_value=cache):
+            service = AsyncBinanceService(api_key="async-binance-cache", api_secret="secret")
+            self.assertEqual(threads, [])
+            await service._load_symbol("ETHBTC")
+        cache.stop()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+
+class TestAsyncBittrex(StandInTestCase):
+
+    async def test_order_type_selects_endpoint(self):
+        async with AsyncExchange("bittrex", api_key="async-bittrex", api_secret="secret") as exchange:
+            service = exchange.provider
+            with mock.patch.object(service, "_request", wraps=service._request) as request:
+                self.assertIn("uuid", await exchange.buy("ETH", amount=0.01))
+                self.assertEqual(request.call_args[0][0], "market/buymarket")
+                await exchange.buy("ETH", amount=0.01, order_type="limit")
+                self.assertEqual(request.call_args[0][0], "market/buylimit")
+                self.assertEqual(request.call_args[1]["rate"], 0.0712)
+                with self.assertRaises(UserAdviceException):
+                    await exchange.buy("ETH", amount=0.01, order_type="stop")
+
+    def test_sync_service_places_limit_orders(self):
+        service = BittrexService(api_key="sync-bittrex", api_secret="secret")
+        with mock.patch.object(service, "get_price", return_value=0.0712), \
+                mock.patch.object(service.balances, "has", return_value=True), \
+                mock.patch.object(service, "client") as client:
+            service.buy("ETH", amount=0.01, order_type="limit")
+            service.sell("ETH", amount=0.01, order_type="limit")
+        self.assertEqual([call[0] for call in client.method_calls], ["buy_limit", "sell_limit"])
+
+
+class TestAsyncKucoin(StandInTestCase):
+
+    async def test_balance_and_limit_order(self):
+        async with AsyncExchange("kucoin", api_key="async-kucoin", api_secret="secret") as exchange:
+            self.assertEqual(await exchange.provider.get_balance("ETH"), 1000.0)
+            self.assertEqual(await exchange.get_price("ETH"), 0.0712)
+            service = exchange.provider
+            with mock.patch.object(service, "_request", wraps=service._request) as request:
+                order = await exchange.buy("ETH", amount=0.0712345678, order_type="limit")
+            self.assertIn("orderId", order)
+            params = request.call_args[1]["params"]
+            # baseIncrement 0.001 and priceIncrement 0.000001 of the symbol list
+            self.assertEqual(params["size"], "1.000")
+            self.assertEqual(params["price"], "0.071234")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+from exchanges.balances import BalanceLedger
+
+
+class Snapshots():
+    def __init__(self, *balances):
+        self.balances = list(balances)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.balances[min(self.calls, len(self.balances)) - 1], self.calls * 1000
+
+
+class TestBalanceLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshots = Snapshots({"BTC": ("1.5", "0"), "ETH": ("10", "2")})
+        self.ledger = BalanceLedger("binance", self.snapshots, max_age=60)
+        return super().setUp()
+
+    def test_reads_from_one_snapshot(self):
+        self.assertEqual(self.ledger.free("ETH"), 10.0)
+        self.assertTrue(self.ledger.has("BTC"))
+        self.assertFalse(self.ledger.has("BTC", 2))
+        self.assertFalse(self.ledger.has("NEO"))
+        self.assertIsNone(self.ledger.get("NEO"))
+        self.assertEqual(self.snapshots.calls, 1)
+
+    def test_reloads_stale_snapshot_without_stream(self):
+        self.ledger.max_age = 0
+        self.ledger.free("ETH")
+        self.ledger.loaded_at -= 1
+        self.ledger.free("ETH")
+        self.assertEqual(self.snapshots.calls, 2)
+        self.ledger.streaming = True
+        self.ledger.loaded_at -= 1
+        self.ledger.free("ETH")
+        self.assertEqual(self.snapshots.calls, 2)
+
+    def test_snapshot_versioned_by_exchange_time(self):
+        self.ledger.refresh()
+        self.assertEqual(self.ledger.get("ETH").version, 1000)
+        # Exchange clock behind the local one: the event is newer than the snapshot
+        self.ledger.update_from_binance({"e": "outboundAccountPosition", "u": 1500,
+                                         "B": [{"a": "ETH", "f": "7", "l": "3"}]})
+        self.assertEqual(self.ledger.free("ETH"), 7.0)
+
+    def test_own_order_reloads_without_stream(self):
+        self.ledger.free("ETH")
+        self.ledger.invalidate()
+        self.assertFalse(self.ledger.synced)
+        self.ledger.free("ETH")
+        self.assertEqual(self.snapshots.calls, 2)
+        self.ledger.streaming = True
+        self.ledger.invalidate()
+        self.ledger.free("ETH")
+        self.assertEqual(self.snapshots.calls, 2)
+
+    def test_order_during_snapshot_keeps_ledger_unsynced(self):
+        def snapshot():
+            self.ledger.invalidate()
+            return {"ETH": ("10", "0")}, 1000
+
+        self.ledger.snapshot = snapshot
+        self.ledger.refresh()
+        self.assertFalse(self.ledger.synced)
+
+    def test_binance_events(self):
+        self.ledger.load({"ETH": ("10", "0")}, version=1000)
+        self.ledger.update_from_binance({"e": "outboundAccountPosition", "E": 2001, "u": 2000,
+                                         "B": [{"a": "ETH", "f": "7", "l": "3"}]})
+        self.assertEqual(self.ledger.balances()["ETH"], (7.0, 3.0))
+        # Already included in the position of time 2000
+        self.ledger.update_from_binance({"e": "balanceUpdate", "E": 2001, "a": "ETH", "d": "1", "T": 1999})
+        self.assertEqual(self.ledger.free("ETH"), 7.0)
+        self.ledger.update_from_binance({"e": "balanceUpdate", "E": 3001, "a": "ETH", "d": "-2", "T": 3000})
+        self.assertEqual(self.ledger.free("ETH"), 5.0)
+        self.ledger.update_from_binance({"e": "outboundAccountPosition", "u": 2500,
+                                         "B": [{"a": "ETH", "f": "9", "l": "0"}]})
+        self.assertEqual(self.ledger.free("ETH"), 5.0)
+
+    def test_kucoin_events_of_trade_account(self):
+        ledger = BalanceLedger("kucoin", max_age=60)
+        ledger.load({"USDT": ("100", "0")}, version=1000)
+        ledger.update_from_kucoin({"topic": "/account/balance", "data": {
+            "currency": "USDT", "available": "80", "hold": "20", "relationEvent": "trade.hold", "time": "2000"}})
+        ledger.update_from_kucoin({"topic": "/account/balance", "data": {
+            "currency": "USDT", "available": "500", "hold": "0", "relationEvent": "main.deposit", "time": "3000"}})
+        self.assertEqual(ledger.balances()["USDT"], (80.0, 20.0))
+
+    def test_snapshot_keeps_newer_stream_updates(self):
+        self.ledger.load({"ETH": ("10", "0")}, version=1000)
+        self.ledger.set("ETH", 4, 0, version=3000)
+        self.ledger.load({"ETH": ("10", "0"), "BTC": ("1", "0")}, version=2000)
+        self.assertEqual(self.ledger.free("ETH"), 4.0)
+        self.assertEqual(self.ledger.free("BTC"), 1.0)
+
+    def test_reconcile_reports_drift(self):
+        self.snapshots.balances.append({"BTC": ("1.5", "0"), "ETH": ("8", "2")})
+        self.ledger.refresh()
+        drift = self.ledger.reconcile()
+        self.assertEqual(drift, {"ETH": (10.0, 8.0)})
+        self.assertEqual(self.ledger.free("ETH"), 8.0)
+        self.assertEqual(self.ledger.drifts, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
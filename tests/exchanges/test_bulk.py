@@ -0,0 +1,106 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_NAME", "tests")
+
+from benchmarks.standins import StandInServer, make_universe  # noqa: E402
+from exchanges.binance.service import BinanceService  # noqa: E402
+from exchanges.helpers import run_concurrently  # noqa: E402
+from exchanges.metadata import get_symbol_cache  # noqa: E402
+from exchanges.kucoin.service import KucoinService  # noqa: E402
+from exchanges.pricebook import PriceBook  # noqa: E402
+from exchanges.simulated.service import SimulatedService  # noqa: E402
+
+
+class TestRunConcurrently(unittest.TestCase):
+
+    def test_keeps_order_and_errors(self):
+        def fail():
+            raise Exception("rejected")
+
+        results = run_concurrently([lambda: 1, fail, lambda: 3], workers=2)
+        self.assertEqual([result["order"] for result in results], [1, None, 3])
+        self.assertEqual(results[1]["error"], "rejected")
+
+
+class TestPlaceMany(unittest.TestCase):
+
+    def test_default_places_through_buy(self):
+        prices = PriceBook(max_age=float("inf"))
+        prices.update("ETHBTC", bid=0.05, ask=0.05)
+        service = SimulatedService(prices=prices, balances={"BTC": 1.0}, fee=0)
+        results = service.buy_many([{"coin_name": "ETH", "amount": 0.1},
+                                    {"coin_name": "NEO", "amount": 0.1}])
+        self.assertEqual(results[0]["order"]["side"], "BUY")
+        self.assertIsNone(results[0]["error"])
+        self.assertIsNone(results[1]["order"])
+        self.assertIsNotNone(results[1]["error"])
+
+
+class TestKucoinPlaceMany(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(universe=make_universe(10)).start()
+        self.server.configure_env()
+        self.service = KucoinService(api_key="test", api_secret="test", passphrase="test")
+        self.service.load_symbols()
+        return super().setUp()
+
+    def tearDown(self):
+        self.server.stop()
+        return super().tearDown()
+
+    def test_limit_orders_share_bulk_requests(self):
+        orders = [{"coin_name": "ETH", "amount": 0.07, "order_type": "limit"} for _ in range(7)]
+        orders.append({"coin_name": "MISSING", "amount": 0.01})
+        requests = self.server.requests
+        results = self.service.buy_many(orders)
+        self.assertTrue(all(result["order"]["status"] == "success" for result in results[:7]))
+        self.assertIsNotNone(results[7]["error"])
+        # tickers and two bulk requests for seven orders, increments come from the symbols cache
+        self.assertEqual(self.server.requests - requests, 3)
+
+    def test_sells_checked_against_balances(self):
+        trade = self.service.get_client("trade")
+        with mock.patch.object(self.service.balances, "has", side_effect=lambda coin, *args: coin != "NEO"), \
+                mock.patch.object(trade, "create_market_order", return_value={"orderId": "1"}) as create:
+            results = self.service.sell_many([{"coin_name": "ETH", "amount": 0.01},
+                                              {"coin_name": "NEO", "amount": 0.01}])
+        self.assertIsNone(results[0]["error"])
+        self.assertIn("Balance not enough", results[1]["error"])
+        self.assertEqual([call[0][0] for call in create.call_args_list], ["ETH-BTC"])
+
+    def test_small_prices_sent_as_plain_decimals(self):
+        self.addCleanup(self.service.symbols.replace, self.service.symbols.documents())
+        self.service.symbols.replace([{"symbol": "ETH-BTC", "baseIncrement": "1", "priceIncrement": "0.00000001"}])
+        trade = self.service.get_client("trade")
+        with mock.patch.object(trade, "create_limit_order", return_value={"orderId": "1"}) as create:
+            self.service.buy_many([{"coin_name": "ETH", "amount": 0.00000045, "order_type": "limit"}])
+        self.assertEqual(create.call_args[0][3], "0.00000045")
+
+
+class TestBinancePlaceMany(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(universe=make_universe(10)).start()
+        self.server.configure_env()
+        get_symbol_cache("stepsizes").replace(self.server.symbol_documents())
+        self.service = BinanceService(api_key="bulk", api_secret="test")
+        return super().setUp()
+
+    def tearDown(self):
+        self.server.stop()
+        return super().tearDown()
+
+    def test_prices_from_one_book_ticker_call(self):
+        client = self.service.client
+        with mock.patch.object(client, "get_orderbook_ticker", wraps=client.get_orderbook_ticker) as tickers:
+            results = self.service.buy_many([{"coin_name": "ALT1", "amount": 0.01},
+                                             {"coin_name": "ALT2", "amount": 0.01}])
+        tickers.assert_called_once_with()
+        self.assertEqual([result["order"]["symbol"] for result in results], ["ALT1BTC", "ALT2BTC"])
+
+
+if __name__ == '__main__':
+    unittest.main()
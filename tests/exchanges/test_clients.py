@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from exchanges.clients import ClientRegistry, ScheduledSession
+from exchanges.kucoin.client import PooledMarket, PooledTrade
+
+
+class FakeClient():
+    def __init__(self, api_key, kind, session):
+        self.api_key = api_key
+        self.kind = kind
+        self.session = session
+        self.pings = 0
+
+
+def fake_factory(api_key, api_secret, kind=None, session=None, **options):
+    return FakeClient(api_key, kind, session)
+
+
+def ping(client):
+    client.pings += 1
+
+
+class TestClientRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ClientRegistry()
+        self.registry.register("fake", fake_factory, ping, kinds=("market", "trade"))
+        return super().setUp()
+
+    def tearDown(self):
+        self.registry.clear()
+        return super().tearDown()
+
+    def test_clients_are_shared_per_key_and_kind(self):
+        market = self.registry.get("fake", "key", "secret", "market")
+        self.assertIs(self.registry.get("fake", "key", "secret", "market"), market)
+        trade = self.registry.get("fake", "key", "secret", "trade")
+        self.assertIsNot(trade, market)
+        self.assertIs(trade.session, market.session)
+        other = self.registry.get("fake", "other", "secret", "market")
+        self.assertIsNot(other.session, market.session)
+
+    def test_warm_up_pings_every_kind(self):
+        self.registry.warm_up("fake", "key", "secret")
+        self.assertEqual(self.registry.get("fake", "key", "secret", "market").pings, 1)
+        self.assertEqual(self.registry.get("fake", "key", "secret", "trade").pings, 1)
+
+    def test_unknown_exchange(self):
+        with self.assertRaises(Exception):
+            self.registry.get("unknown", "key", "secret")
+
+
+class TestSessionRequestMixin(unittest.TestCase):
+
+    def response(self, data):
+        response = mock.MagicMock(status_code=200)
+        response.json.return_value = {"code": "200000", "data": data}
+        return response
+
+    def test_signed_request_goes_through_session(self):
+        client = PooledTrade(key="key", secret="secret", passphrase="pass", url="https://kucoin.test")
+        client.session = mock.MagicMock()
+        client.session.request.return_value = self.response({"orderId": "1"})
+        self.assertEqual(client._request("POST", "/api/v1/orders", params={"symbol": "ETH-BTC"}),
+                         {"orderId": "1"})
+        method, url = client.session.request.call_args[0]
+        kwargs = client.session.request.call_args[1]
+        self.assertEqual((method, url), ("POST", "https://kucoin.test/api/v1/orders"))
+        self.assertEqual(kwargs["data"], '{"symbol": "ETH-BTC"}')
+        self.assertEqual(kwargs["headers"]["KC-API-KEY"], "key")
+        self.assertIn("KC-API-SIGN", kwargs["headers"])
+
+    def test_get_params_in_query(self):
+        client = PooledMarket(url="https://kucoin.test")
+        client.session = mock.MagicMock()
+        client.session.request.return_value = self.response({"price": "0.05"})
+        client._request("GET", "/api/v1/market/orderbook/level1", auth=False, params={"symbol": "ETH-BTC"})
+        method, url = client.session.request.call_args[0]
+        self.assertEqual(url, "https://kucoin.test/api/v1/market/orderbook/level1?symbol=ETH-BTC")
+        self.assertEqual(client.session.request.call_args[1]["headers"], {})
+
+    def test_limiter_waited_for_before_signing(self):
+        events = []
+        limiter = mock.MagicMock()
+        limiter.acquire.side_effect = lambda *args: events.append("acquire")
+        clock = mock.MagicMock()
+        clock.time.side_effect = lambda: events.append("sign") or 1000.0
+        client = PooledTrade(key="key", secret="secret", passphrase="pass", url="https://kucoin.test")
+        client.session = ScheduledSession(limiter, "key")
+        with mock.patch("exchanges.kucoin.client.time", clock), \
+                mock.patch.object(requests.Session, "request", return_value=self.response({})):
+            client._request("POST", "/api/v1/orders", params={"symbol": "ETH-BTC"})
+        self.assertEqual(events, ["acquire", "sign"])
+        limiter.acquire.assert_called_once_with("POST", "/api/v1/orders", "key")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_NAME", "tests")
+
+from exchanges.history import CHECKPOINTS, COLLECTION, OrderHistorySync  # noqa: E402
+from exchanges.kucoin.service import KucoinService  # noqa: E402
+from exchanges.orders import from_binance, from_kucoin  # noqa: E402
+
+
+def order(order_id, status="FILLED"):
+    return from_binance({"orderId": order_id, "symbol": "ETHBTC", "status": status, "updateTime": order_id})
+
+
+class TestOrderHistorySync(unittest.TestCase):
+
+    def setUp(self):
+        self.history = mock.MagicMock()
+        self.history.bulk_write.side_effect = lambda operations, ordered: mock.MagicMock(
+            upserted_count=len([operation for operation in operations if operation._filter["orderId"] != 3]))
+        self.checkpoints = mock.MagicMock()
+        self.checkpoints.find.return_value = [{"symbol": "ETHBTC", "cursor": 3}]
+        self.database = mock.patch("exchanges.history.db_client",
+                                   {COLLECTION: self.history, CHECKPOINTS: self.checkpoints})
+        self.database.start()
+        self.requested = []
+        return super().setUp()
+
+    def tearDown(self):
+        self.database.stop()
+        return super().tearDown()
+
+    def pages(self, symbol, cursor):
+        self.requested.append((symbol, cursor))
+        if symbol == "NEOBTC":
+            raise Exception("Invalid symbol")
+        yield [order(3), order(4, "NEW"), order(5)], 6
+        yield [order(6), order(7, "PARTIALLY_FILLED")], 8
+
+    def sync(self):
+        return OrderHistorySync("binance", "account", self.pages, lambda order: int(order.order_id), workers=2)
+
+    def test_resumes_from_checkpoints(self):
+        counts = self.sync().run()
+        self.assertEqual(self.requested, [("ETHBTC", 3)])
+        self.assertEqual(counts, {"symbols": 1, "orders": 5, "errors": {}})
+        self.assertEqual(self.history.bulk_write.call_count, 2)
+        self.assertEqual(len(self.history.bulk_write.call_args_list[0][0][0]), 3)
+
+    def test_checkpoint_stops_at_first_open_order(self):
+        self.sync().run(["ETHBTC"])
+        cursors = [call[0][1]["$set"]["cursor"] for call in self.checkpoints.update_one.call_args_list]
+        self.assertEqual(cursors, [4, 4])
+
+    def test_orders_counted_once_per_symbol(self):
+        self.sync().run(["ETHBTC"])
+        operation = self.history.bulk_write.call_args_list[0][0][0][0]
+        self.assertEqual(operation._filter["symbol"], "ETHBTC")
+        self.assertEqual(operation._filter["orderId"], 3)
+        # Order 3 was written by the previous sync
+        counts = [call[0][1]["$inc"]["orders"] for call in self.checkpoints.update_one.call_args_list]
+        self.assertEqual(counts, [2, 2])
+
+    def test_failed_symbol_does_not_stop_others(self):
+        counts = self.sync().run(["NEOBTC", "ETHBTC"])
+        self.assertEqual(counts["orders"], 5)
+        self.assertEqual(list(counts["errors"]), ["NEOBTC"])
+        self.assertIn(("ETHBTC", 3), self.requested)
+
+
+class TestKucoinHistoryPages(unittest.TestCase):
+
+    def test_open_orders_come_first(self):
+        service = mock.MagicMock()
+        service._list_orders.return_value = [from_kucoin(
+            {"id": "k1", "symbol": "ETH-BTC", "isActive": True, "createdAt": 500})]
+        service.get_client.return_value.get_order_list.return_value = {"items": [], "totalPage": 1}
+        pages = list(KucoinService._order_history_pages(service, "ETH-BTC", 1000))
+        service._list_orders.assert_called_once_with(status="active", symbol="ETH-BTC")
+        self.assertEqual([order.order_id for order in pages[0][0]], ["k1"])
+        self.assertEqual(pages[0][1], 1000)
+        windows = service.get_client.return_value.get_order_list.call_args_list
+        self.assertTrue(all(call[1]["status"] == "done" for call in windows))
+
+        checkpoints = mock.MagicMock()
+        database = {COLLECTION: mock.MagicMock(), CHECKPOINTS: checkpoints}
+        with mock.patch("exchanges.history.db_client", database):
+            OrderHistorySync("kucoin", "account", lambda symbol, cursor: iter(pages),
+                             lambda order: order.updated).sync_symbol("ETH-BTC", 1000)
+        cursors = {call[0][1]["$set"]["cursor"] for call in checkpoints.update_one.call_args_list}
+        self.assertEqual(cursors, {500})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def loaded_after(statement):
+    """Modules loaded by a fresh interpreter after running `statement`"""
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    env = {key: value for key, value in os.environ.items() if not key.startswith("DATABASE_")}
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_adapter_loads_no_provider(self):
+        modules = loaded_after("import exchanges.adapter")
+        for module in ("binance", "kucoin", "bittrex", "pymongo", "numpy"):
+            self.assertNotIn(module, modules)
+
+    def test_provider_loads_only_its_sdk(self):
+        modules = loaded_after(
+            "from exchanges.adapter import Exchange; Exchange(name='kucoin', api_key='key', api_secret='secret')")
+        self.assertIn("exchanges.kucoin.service", modules)
+        for module in ("binance", "bittrex", "pymongo"):
+            self.assertNotIn(module, modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
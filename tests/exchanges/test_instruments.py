@@ -0,0 +1,37 @@
+import unittest
+
+from exchanges.instruments import InstrumentRegistry
+from exchanges.prices import canonical_pair
+
+
+class TestInstrumentRegistry(unittest.TestCase):
+
+    def test_native_symbols(self):
+        self.assertEqual(InstrumentRegistry("binance").symbol("ETH", "BTC"), "ETHBTC")
+        self.assertEqual(InstrumentRegistry("kucoin").symbol("ETH", "USDT"), "ETH-USDT")
+        self.assertEqual(InstrumentRegistry("bittrex").symbol("eth", "btc"), "BTC-ETH")
+
+    def test_reverse_lookup(self):
+        registry = InstrumentRegistry("binance")
+        instrument = registry.lookup("NEOUSDT")
+        self.assertEqual((instrument.base, instrument.quote, instrument.pair), ("NEO", "USDT", "NEO/USDT"))
+        self.assertIs(registry.get("NEO", "USDT"), instrument)
+        self.assertIsNone(registry.lookup("BTC"))
+
+    def test_load_listed_instruments(self):
+        registry = InstrumentRegistry("binance")
+        registry.load([{"symbol": "1INCHBTC", "baseAsset": "1INCH", "quoteAsset": "BTC", "status": "TRADING"},
+                       {"symbol": "WBTCETH", "baseAsset": "WBTC", "quoteAsset": "ETH"}])
+        self.assertTrue(registry.loaded)
+        self.assertEqual(registry.lookup("1INCHBTC").info["status"], "TRADING")
+        self.assertEqual(registry.symbol("WBTC", "ETH"), "WBTCETH")
+        self.assertEqual(len(registry), 2)
+
+    def test_canonical_pair(self):
+        self.assertEqual(canonical_pair("kucoin", "ETH-BTC"), "ETH/BTC")
+        self.assertEqual(canonical_pair("bittrex", "BTC-ETH"), "ETH/BTC")
+        self.assertEqual(canonical_pair("binance", "ETHBTC"), "ETH/BTC")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_NAME", "tests")
+
+from exchanges.metadata import VERSIONS, SymbolMetadataCache, diff_symbols, sync_symbols  # noqa: E402
+
+
+class TestSymbolMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = mock.MagicMock()
+        self.collection.find_one.return_value = None
+        self.collection.find.return_value = [
+            {"symbol": "ETHBTC", "baseAssetPrecision": 8}, {"symbol": "NEOBTC", "baseAssetPrecision": 6}]
+        self.versions = mock.MagicMock()
+        self.versions.find_one.return_value = {"_id": "stepsizes", "version": 1}
+        self.database = mock.patch("exchanges.metadata.db_client",
+                                   {"stepsizes": self.collection, VERSIONS: self.versions})
+        self.database.start()
+        self.cache = SymbolMetadataCache("stepsizes", ttl=60)
+        return super().setUp()
+
+    def tearDown(self):
+        self.database.stop()
+        return super().tearDown()
+
+    def test_serves_from_memory_after_bulk_load(self):
+        self.cache.load()
+        self.assertEqual(self.cache.get("NEOBTC")["baseAssetPrecision"], 6)
+        self.cache.get("ETHBTC")
+        self.assertEqual(self.collection.find.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 0))
+        self.assertEqual(self.cache.version, 1)
+
+    def test_miss_is_looked_up_once(self):
+        self.cache.load()
+        self.assertIsNone(self.cache.get("NEWBTC"))
+        self.assertIsNone(self.cache.get("NEWBTC"))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_refresh_reloads_only_on_new_version(self):
+        self.cache.refresh()
+        self.cache.refresh()
+        self.assertEqual(self.collection.find.call_count, 1)
+        self.versions.find_one.return_value = {"_id": "stepsizes", "version": 2}
+        self.cache.refresh()
+        self.assertEqual(self.collection.find.call_count, 2)
+
+
+class TestSyncSymbols(unittest.TestCase):
+
+    def setUp(self):
+        self.stored = [
+            {"symbol": "ETHBTC", "lot_size": {"stepSize": "0.001"}, "updated_at": 1},
+            {"symbol": "NEOBTC", "lot_size": {"stepSize": "0.01"}, "updated_at": 1},
+            {"symbol": "OLDBTC", "lot_size": {"stepSize": "1"}, "updated_at": 1},
+        ]
+        self.fresh = [
+            {"symbol": "ETHBTC", "lot_size": {"stepSize": "0.001"}},
+            {"symbol": "NEOBTC", "lot_size": {"stepSize": "0.001"}},
+            {"symbol": "NEWBTC", "lot_size": {"stepSize": "1"}},
+        ]
+        return super().setUp()
+
+    def test_diff(self):
+        changed, delisted = diff_symbols(self.stored, self.fresh)
+        self.assertEqual([doc["symbol"] for doc in changed], ["NEOBTC", "NEWBTC"])
+        self.assertEqual(delisted, ["OLDBTC"])
+
+    def test_writes_only_changes(self):
+        collection = mock.MagicMock()
+        collection.find.return_value = self.stored
+        versions = mock.MagicMock()
+        with mock.patch("exchanges.metadata.db_client", {"stepsizes": collection, VERSIONS: versions}):
+            counts = sync_symbols("stepsizes", self.fresh)
+        self.assertEqual(counts, {"listed": 3, "upserted": 2, "removed": 1})
+        collection.create_index.assert_called_once()
+        operations = collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(operations), 3)
+        query, update = versions.find_one_and_update.call_args[0]
+        self.assertEqual((query, update["$inc"]), ({"_id": "stepsizes"}, {"version": 1}))
+
+    def test_unchanged_skips_write(self):
+        collection = mock.MagicMock()
+        collection.find.return_value = [dict(doc, updated_at=1) for doc in self.fresh]
+        versions = mock.MagicMock()
+        with mock.patch("exchanges.metadata.db_client", {"stepsizes": collection, VERSIONS: versions}):
+            counts = sync_symbols("stepsizes", self.fresh)
+        self.assertEqual(counts["upserted"], 0)
+        collection.bulk_write.assert_not_called()
+        versions.find_one_and_update.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
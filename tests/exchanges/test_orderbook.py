@@ -0,0 +1,66 @@
+import unittest
+
+from exchanges.orderbook import OrderBook, OrderBooks, SequenceGap
+
+SNAPSHOT = {
+    "lastUpdateId": 100,
+    "bids": [["0.0499", "2"], ["0.0498", "5"], ["0.0497", "10"]],
+    "asks": [["0.0501", "1"], ["0.0502", "2"], ["0.0505", "10"]],
+}
+
+
+def diff(first, last, bids=(), asks=()):
+    return {"e": "depthUpdate", "s": "ETHBTC", "U": first, "u": last, "b": list(bids), "a": list(asks)}
+
+
+class TestOrderBook(unittest.TestCase):
+
+    def setUp(self):
+        self.book = OrderBook("ETHBTC")
+        return super().setUp()
+
+    def test_buffers_until_snapshot(self):
+        self.book.apply_diff(diff(95, 100, asks=[["0.0501", "9"]]))
+        self.book.apply_diff(diff(101, 102, bids=[["0.0499", "0"]], asks=[["0.0500", "3"]]))
+        self.assertFalse(self.book.synced)
+        self.book.apply_snapshot(SNAPSHOT)
+        self.assertEqual(self.book.last_update_id, 102)
+        self.assertEqual(self.book.bids.best(), 0.0498)
+        self.assertEqual(self.book.asks.levels(2), [(0.05, 3.0), (0.0501, 1.0)])
+
+    def test_gap_marks_out_of_sync(self):
+        self.book.apply_snapshot(SNAPSHOT)
+        with self.assertRaises(SequenceGap):
+            self.book.apply_diff(diff(105, 106))
+        self.assertFalse(self.book.synced)
+        self.assertEqual(self.book.gaps, 1)
+
+    def test_fill_walks_levels(self):
+        self.book.apply_snapshot(SNAPSHOT)
+        fill = self.book.fill("BUY", quantity=2)
+        self.assertTrue(fill.complete)
+        self.assertAlmostEqual(fill.vwap, (0.0501 + 0.0502) / 2)
+        self.assertEqual(fill.worst, 0.0502)
+
+        fill = self.book.fill("SELL", amount=0.0499 * 2 + 0.0498)
+        self.assertAlmostEqual(fill.quantity, 3)
+        self.assertGreater(fill.slippage, 0)
+        self.assertIsNone(self.book.vwap("BUY", quantity=100))
+
+
+class TestOrderBooks(unittest.TestCase):
+
+    def test_resyncs_after_gap(self):
+        snapshots = [dict(SNAPSHOT), dict(SNAPSHOT, lastUpdateId=110)]
+        books = OrderBooks("binance", snapshot=lambda symbol: snapshots.pop(0))
+        books.book("ETHBTC")
+        books.resync = lambda symbol, background=True: OrderBooks.resync(books, symbol, background=False)
+        books.apply(diff(101, 101))
+        self.assertTrue(books.get("ETHBTC").synced)
+        books.apply(diff(108, 111, asks=[["0.0500", "1"]]))
+        self.assertEqual(books.get("ETHBTC").last_update_id, 111)
+        self.assertEqual(books.stats()["resyncs"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
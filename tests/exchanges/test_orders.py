@@ -0,0 +1,118 @@
+import unittest
+
+from exchanges.orders import OrderStore, from_binance, from_bittrex, from_kucoin
+
+
+def report(order_id, status, filled, at, symbol="ETHBTC", client_id="abc"):
+    return {"e": "executionReport", "E": at + 1, "T": at, "s": symbol, "i": order_id, "c": client_id,
+            "C": "", "S": "BUY", "o": "LIMIT", "X": status, "p": "0.05", "q": "2", "z": str(filled), "Z": "0"}
+
+
+class TestOrderStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = OrderStore("binance")
+        self.changed = []
+        self.store.subscribe(self.changed.append)
+        return super().setUp()
+
+    def test_execution_reports_update_indexes(self):
+        self.store.update_from_binance(report(1, "NEW", 0, 1000))
+        self.store.update_from_binance(report(2, "NEW", 0, 1001, symbol="NEOBTC", client_id="def"))
+        self.store.update_from_binance(report(1, "PARTIALLY_FILLED", 1, 1002))
+        self.assertEqual([order.order_id for order in self.store.open_orders("ETHBTC")], [1])
+        self.store.update_from_binance(report(1, "FILLED", 2, 1003))
+        self.assertEqual(self.store.open_orders("ETHBTC"), [])
+        self.assertEqual([order.order_id for order in self.store.open_orders()], [2])
+        self.assertEqual(self.store.by_client_id("abc").status, "FILLED")
+        self.assertEqual(self.store.get("ETHBTC", 1).filled, 2.0)
+        self.assertEqual(len(self.changed), 4)
+
+    def test_ignores_stale_updates(self):
+        self.store.update_from_binance(report(1, "FILLED", 2, 2000))
+        self.store.load([from_binance({"orderId": 1, "symbol": "ETHBTC", "status": "NEW", "updateTime": 1000})])
+        self.assertEqual(self.store.get("ETHBTC", "1").status, "FILLED")
+        self.assertEqual(self.store.orders(status="NEW"), [])
+
+    def test_cancel_report_keeps_client_id(self):
+        self.store.update_from_binance(report(1, "NEW", 0, 1000))
+        canceled = dict(report(1, "CANCELED", 0, 1001), c="cancel-request", C="abc")
+        self.store.update_from_binance(canceled)
+        self.assertEqual(self.store.by_client_id("abc").status, "CANCELED")
+        self.assertIsNone(self.store.by_client_id("cancel-request"))
+
+    def test_resync_settles_orders_closed_meanwhile(self):
+        self.store.update_from_binance(report(1, "NEW", 0, 1000))
+        self.store.update_from_binance(report(2, "NEW", 0, 1000, client_id="def"))
+        self.store.backfill = lambda: [from_binance({"orderId": 2, "symbol": "ETHBTC", "status": "NEW",
+                                                     "updateTime": 1000})]
+        self.store.fetch = lambda symbol, order_id: from_binance(
+            {"orderId": order_id, "symbol": symbol, "status": "FILLED", "executedQty": "2", "updateTime": 1500})
+        self.store.resync()
+        self.assertEqual(self.store.get("ETHBTC", 1).status, "FILLED")
+        self.assertEqual([order.order_id for order in self.store.open_orders()], [2])
+
+    def test_same_id_on_two_symbols(self):
+        self.store.update_from_binance(report(1, "NEW", 0, 1000))
+        self.store.update_from_binance(report(1, "FILLED", 2, 1000, symbol="NEOBTC", client_id="def"))
+        self.assertEqual(self.store.get("ETHBTC", 1).status, "NEW")
+        self.assertEqual(self.store.get("NEOBTC", 1).status, "FILLED")
+        self.assertEqual(len(self.store.open_orders()), 1)
+
+    def test_as_dict_keeps_rest_fields(self):
+        order = from_binance({"orderId": 7, "symbol": "ETHBTC", "status": "NEW", "price": "0.05000000",
+                              "origQty": "2.00000000", "time": 1000, "isWorking": True})
+        self.assertEqual(order.as_dict()["orderId"], 7)
+        self.assertEqual(order.as_dict()["price"], "0.05000000")
+        self.assertTrue(order.as_dict()["isWorking"])
+        self.store.update_from_binance(report(8, "NEW", 0, 1000))
+        self.assertEqual(self.store.get("ETHBTC", 8).as_dict()["orderId"], 8)
+
+    def test_evicts_oldest_closed_orders(self):
+        store = OrderStore("binance", max_orders=10)
+        store.update_from_binance(report(0, "NEW", 0, 0))
+        for number in range(1, 12):
+            store.update_from_binance(report(number, "FILLED", 2, number, client_id=str(number)))
+        self.assertLessEqual(len(store.orders()), 10)
+        self.assertIsNotNone(store.get("ETHBTC", 0))
+        self.assertIsNone(store.get("ETHBTC", 1))
+
+
+class TestKucoinOrders(unittest.TestCase):
+
+    def test_rest_and_stream_states(self):
+        store = OrderStore("kucoin")
+        store.load([from_kucoin({"id": "k1", "symbol": "ETH-BTC", "side": "buy", "type": "limit", "price": "0.05",
+                                 "size": "2", "dealSize": "0", "isActive": True, "createdAt": 1000})])
+        self.assertEqual(store.get("ETH-BTC", "k1").status, "NEW")
+        store.update_from_kucoin({"topic": "/spotMarket/tradeOrders", "data": {
+            "orderId": "k1", "symbol": "ETH-BTC", "side": "buy", "orderType": "limit", "type": "match",
+            "status": "match", "size": "2", "filledSize": "1", "price": "0.05", "ts": 2000 * 1000000}})
+        self.assertEqual(store.open_orders("ETH-BTC")[0].status, "PARTIALLY_FILLED")
+        store.update_from_kucoin({"topic": "/spotMarket/tradeOrders", "data": {
+            "orderId": "k1", "symbol": "ETH-BTC", "type": "filled", "status": "done",
+            "size": "2", "filledSize": "2", "ts": 3000 * 1000000}})
+        self.assertEqual(store.get("ETH-BTC", "k1").status, "FILLED")
+        self.assertEqual(store.get("ETH-BTC", "k1").side, "BUY")
+
+
+class TestBittrexOrders(unittest.TestCase):
+
+    def test_open_and_history_orders(self):
+        opened = from_bittrex({"OrderUuid": "b1", "Exchange": "BTC-ETH", "OrderType": "LIMIT_BUY", "Quantity": 2.0,
+                               "QuantityRemaining": 1.5, "Limit": 0.05, "Price": 0.025,
+                               "Opened": "2014-07-09T03:55:48.77", "Closed": None})
+        self.assertEqual((opened.side, opened.type, opened.status), ("BUY", "LIMIT", "PARTIALLY_FILLED"))
+        self.assertEqual(opened.updated, 1404878148770)
+        self.assertEqual(opened.as_dict()["OrderUuid"], "b1")
+        canceled = from_bittrex({"OrderUuid": "b2", "Exchange": "BTC-ETH", "OrderType": "LIMIT_SELL",
+                                 "Quantity": 2.0, "QuantityRemaining": 2.0, "TimeStamp": "2014-07-09T03:55:48",
+                                 "Closed": "2014-07-09T04:00:00"})
+        self.assertEqual(canceled.status, "CANCELED")
+        filled = from_bittrex({"OrderUuid": "b3", "Exchange": "BTC-ETH", "OrderType": "LIMIT_SELL",
+                               "Quantity": 2.0, "QuantityRemaining": 0.0, "Closed": "2014-07-09T04:00:00"})
+        self.assertEqual(filled.status, "FILLED")
+
+
+if __name__ == '__main__':
+    unittest.main()
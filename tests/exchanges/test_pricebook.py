@@ -0,0 +1,30 @@
+import time
+import unittest
+
+from exchanges.pricebook import PriceBook
+
+
+class TestPriceBook(unittest.TestCase):
+
+    def setUp(self):
+        self.book = PriceBook(max_age=1)
+        return super().setUp()
+
+    def test_update_from_ticker(self):
+        self.book.update_from_ticker(
+            {"e": "24hrTicker", "s": "ETHBTC", "b": "0.0399", "a": "0.0401", "c": "0.0400"})
+        quote = self.book.get("ETHBTC")
+        self.assertEqual(quote.price("BUY"), "0.0401")
+        self.assertEqual(quote.price("SELL"), "0.0399")
+        self.assertEqual(quote.price(), "0.0400")
+
+    def test_stale_quote(self):
+        self.book.update("ETHBTC", bid="1", ask="2", timestamp=time.time() - 5)
+        self.assertIsNone(self.book.get("ETHBTC"))
+        self.assertIsNotNone(self.book.get("ETHBTC", max_age=10))
+        self.assertIsNone(self.book.get("NEOBTC"))
+        self.assertEqual(self.book.stats()["misses"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import asyncio
+import time
+import unittest
+
+from exchanges.prices import canonical_pair, get_prices
+
+
+class FakeExchange():
+    def __init__(self, name, delay, tickers):
+        self.name = name
+        self.delay = delay
+        self.tickers = tickers
+
+    def get_prices(self):
+        time.sleep(self.delay)
+        return self.tickers
+
+
+class FakeAsyncExchange(FakeExchange):
+    async def get_prices(self):
+        await asyncio.sleep(self.delay)
+        return self.tickers
+
+
+class TestPrices(unittest.TestCase):
+
+    def test_canonical_pair(self):
+        self.assertEqual(canonical_pair("binance", "ETHBTC"), "ETH/BTC")
+        self.assertEqual(canonical_pair("binance", "BTCUSDT"), "BTC/USDT")
+        self.assertEqual(canonical_pair("kucoin", "ETH-BTC"), "ETH/BTC")
+        self.assertEqual(canonical_pair("bittrex", "BTC-ETH"), "ETH/BTC")
+        self.assertIsNone(canonical_pair("binance", "BTC"))
+
+    def test_get_prices_is_concurrent(self):
+        exchanges = [
+            FakeExchange("binance", 0.2, [{"symbol": "ETHBTC", "price": "0.05"}]),
+            FakeAsyncExchange("kucoin", 0.2, [{"symbol": "ETH-BTC", "price": "0.051"}]),
+            FakeExchange("bittrex", 0.2, [{"symbol": "BTC-ETH", "price": 0.052}]),
+        ]
+        started = time.perf_counter()
+        snapshot = get_prices(exchanges)
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(snapshot.get("ETH/BTC"),
+                         {"binance": 0.05, "kucoin": 0.051, "bittrex": 0.052})
+        self.assertEqual(set(snapshot.timestamps), {"binance", "kucoin", "bittrex"})
+
+    def test_get_prices_timeout(self):
+        exchanges = [
+            FakeExchange("binance", 0, [{"symbol": "ETHBTC", "price": "0.05"}]),
+            FakeExchange("bittrex", 2, []),
+        ]
+        snapshot = get_prices(exchanges, timeouts={"bittrex": 0.1})
+        self.assertIn("bittrex", snapshot.errors)
+        self.assertEqual(snapshot.get("ETH/BTC"), {"binance": 0.05})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from decimal import Decimal
+
+import numpy as np
+
+from exchanges.quantize import Quantizer, BatchQuantizer, to_str
+
+
+class TestQuantizer(unittest.TestCase):
+
+    def test_step_size_formats(self):
+        self.assertEqual(Quantizer("0.00100000").floor_qty(1.23456), Decimal("1.234"))
+        self.assertEqual(Quantizer("1.00000000").floor_qty(12.9), Decimal("12"))
+        self.assertEqual(Quantizer(1e-05).floor_qty("0.123456789"), Decimal("0.12345"))
+        self.assertEqual(Quantizer(1.0).floor_qty(3.99), Decimal("3"))
+        self.assertEqual(Quantizer("10").floor_qty(129), Decimal("120"))
+        self.assertEqual(Quantizer("0.05").floor_qty("0.19"), Decimal("0.15"))
+
+    def test_floors_instead_of_rounding(self):
+        quantizer = Quantizer(step_size="0.01", tick_size="0.000001")
+        self.assertEqual(quantizer.qty_for_amount("0.1", "0.03"), Decimal("3.33"))
+        self.assertEqual(quantizer.qty_for_amount("0.3", "0.1"), Decimal("3.00"))
+        self.assertEqual(quantizer.floor_price("0.03994199"), Decimal("0.039941"))
+
+    def test_sub_micro_prices_are_plain_strings(self):
+        quantizer = Quantizer(step_size="1", tick_size="0.00000001")
+        self.assertEqual(str(quantizer.floor_price("0.00000045")), "4.5E-7")
+        self.assertEqual(to_str(quantizer.floor_price("0.00000045")), "0.00000045")
+        self.assertEqual(to_str(1e-07), "0.0000001")
+
+    def test_from_binance_document(self):
+        quantizer = Quantizer.from_binance({
+            "symbol": "ETHBTC",
+            "lot_size": {"stepSize": "0.00100000", "minQty": "0.00100000"},
+            "min_notional": {"minNotional": "0.00010000"},
+        })
+        self.assertEqual(quantizer.qty_for_amount("0.01", "0.0399"), Decimal("0.250"))
+        self.assertTrue(quantizer.is_valid("0.25", "0.0399"))
+        self.assertFalse(quantizer.is_valid("0.001", "0.0399"))
+
+    def test_batch_matches_decimal(self):
+        quantizers = {"ETHBTC": Quantizer("0.001", min_notional="0.0001"),
+                      "NEOBTC": Quantizer("0.01"), "XRPBTC": Quantizer("1")}
+        batch = BatchQuantizer(quantizers)
+        symbols = ["ETHBTC", "NEOBTC", "XRPBTC", "ETHBTC"]
+        amounts = [0.01, 0.3, 0.05, 0.000001]
+        prices = [0.0399, 0.1, 0.00001, 0.04]
+        quantities, valid = batch.size(symbols, amounts, prices)
+        for symbol, amount, price, quantity in zip(symbols, amounts, prices, quantities):
+            self.assertEqual(Decimal(str(quantity)), quantizers[symbol].qty_for_amount(amount, price))
+        np.testing.assert_array_equal(valid, [True, True, True, False])
+
+    def test_batch_never_rounds_up(self):
+        quantizers = {"ETHBTC": Quantizer("0.00000001"), "NEOBTC": Quantizer("0.01")}
+        batch = BatchQuantizer(quantizers)
+        # A relative tolerance of 1e-9 on 1e10 steps would add 10 steps to the first
+        quantities, _ = batch.size(["ETHBTC", "NEOBTC"], [1.0000000099, 0.3], [0.01, 0.1])
+        self.assertEqual(Decimal(str(quantities[0])), Decimal("100.00000099"))
+        self.assertEqual(Decimal(str(quantities[1])), Decimal("3"))
+
+
+if __name__ == '__main__':
+    unittest.main()
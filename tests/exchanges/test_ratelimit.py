@@ -0,0 +1,61 @@
+import threading
+import time
+import unittest
+
+from exchanges.ratelimit import LOW, NORMAL, ORDER, RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = RateLimiter("binance", limits={"weight": (20, 1), "orders": (2, 1)})
+        return super().setUp()
+
+    def test_endpoint_cost(self):
+        self.assertEqual(self.limiter.cost("POST", "/api/v3/order"), (1, ORDER))
+        self.assertEqual(self.limiter.cost("GET", "/api/v3/allOrders"), (10, LOW))
+        self.assertEqual(self.limiter.cost("GET", "/api/v1/ping"), (1, NORMAL))
+
+    def test_waits_for_weight(self):
+        self.limiter.acquire("GET", "/api/v3/allOrders")
+        self.limiter.acquire("GET", "/api/v3/allOrders")
+        waited = self.limiter.acquire("GET", "/api/v3/allOrders")
+        self.assertGreater(waited, 0.3)
+
+    def test_orders_go_first(self):
+        self.limiter.weight.tokens = 0
+        served = []
+
+        def call(method, path, name):
+            self.limiter.acquire(method, path, "key")
+            served.append(name)
+
+        history = threading.Thread(target=call, args=("GET", "/api/v3/allOrders", "history"))
+        history.start()
+        time.sleep(0.05)
+        order = threading.Thread(target=call, args=("POST", "/api/v3/order", "order"))
+        order.start()
+        history.join()
+        order.join()
+        self.assertEqual(served, ["order", "history"])
+
+    def test_blocked_key_does_not_hold_back_others(self):
+        self.limiter.order_bucket("a").tokens = 0
+        held = threading.Thread(target=self.limiter.acquire, args=("POST", "/api/v3/order", "a"))
+        held.start()
+        time.sleep(0.05)
+        self.assertEqual(self.limiter.stats()["waiting"], 1)
+        self.assertLess(self.limiter.acquire("GET", "/api/v3/ticker/price"), 0.05)
+        self.assertLess(self.limiter.acquire("POST", "/api/v3/order", "b"), 0.05)
+        self.assertGreater(self.limiter.acquire("POST", "/api/v3/order", "a"), 0.3)
+        held.join()
+
+    def test_used_weight_header_and_ban(self):
+        self.limiter.update(200, {"X-MBX-USED-WEIGHT-1M": "15"})
+        self.assertLessEqual(self.limiter.weight.tokens, 5)
+        self.limiter.update(429, {"Retry-After": "0.2"})
+        self.assertGreater(self.limiter.acquire("GET", "/api/v1/ping"), 0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from core.metrics import registry
+from exchanges.adapter import Exchange
+from exchanges.interface import ServiceInterface
+from exchanges.registry import get_provider, providers, register_provider
+
+
+@register_provider("echo")
+class EchoService(ServiceInterface):
+    name = 'echo'
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def buy(self, coin_name, quantity=None, pair_base="BTC", amount=None, order_type="market"):
+        return {"coin_name": coin_name, "quantity": quantity, "amount": amount, "pair_base": pair_base}
+
+    def get_prices(self):
+        return [{"symbol": "ETHBTC", "price": "0.05"}]
+
+
+class TestProviderRegistry(unittest.TestCase):
+
+    def test_registered_provider(self):
+        self.assertIn("echo", providers())
+        self.assertIs(get_provider("echo"), EchoService)
+        exchange = Exchange(name="echo", api_key="key")
+        self.assertEqual(exchange.provider.kwargs, {"api_key": "key"})
+        self.assertEqual(exchange.get_prices(), [{"symbol": "ETHBTC", "price": "0.05"}])
+
+    def test_methods_bound_once(self):
+        exchange = Exchange(name="echo")
+        self.assertIs(exchange.get_prices.__self__, exchange.provider)
+        self.assertFalse(hasattr(exchange, "get_open_orders"))
+
+    def test_buy_takes_amount_second(self):
+        order = Exchange(name="echo").buy("ETH", 0.01)
+        self.assertEqual((order["amount"], order["quantity"]), (0.01, None))
+
+    def test_lazy_builtin_providers(self):
+        self.assertEqual(get_provider("simulated").name, "simulated")
+        with self.assertRaises(Exception):
+            Exchange(name="unknown")
+
+
+class TestServiceMetrics(unittest.TestCase):
+
+    def test_labels_registry_name_and_mode(self):
+        get_provider("kucoin")
+        get_provider("kucoin", asynchronous=True)
+        labels = {dict(key[1]).get("mode") for key in registry.metrics
+                  if key[0] == "exchange_method_seconds" and dict(key[1]).get("exchange") == "kucoin"
+                  and dict(key[1]).get("method") == "get_price"}
+        self.assertEqual(labels, {"sync", "async"})
+        self.assertIn(("exchange_method_seconds", (("exchange", "echo"), ("method", "buy"), ("mode", "sync"))),
+                      registry.metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import time
+import unittest
+
+from exchanges.prices import PriceSnapshot
+from trading.arbitrage import SpreadScanner
+
+
+class TestSpreadScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = SpreadScanner(["binance", "kucoin", "bittrex"], threshold=0.001,
+                                     fees={"binance": 0.001, "kucoin": 0.001, "bittrex": 0.001})
+        return super().setUp()
+
+    def test_net_spread_above_threshold(self):
+        self.scanner.update("binance", [{"symbol": "ETHBTC", "bid": "0.0500", "ask": "0.0500"},
+                                        {"symbol": "NEOBTC", "bid": "0.0010", "ask": "0.0010"}])
+        self.scanner.update("kucoin", [{"symbol": "ETH-BTC", "bid": "0.0502", "ask": "0.0502"},
+                                       {"symbol": "NEO-BTC", "bid": "0.0010", "ask": "0.0010"}])
+        found = self.scanner.update("bittrex", [{"symbol": "BTC-ETH", "bid": 0.0510, "ask": 0.0510}])
+
+        self.assertEqual([(item.buy_exchange, item.sell_exchange) for item in found],
+                         [("binance", "bittrex"), ("kucoin", "bittrex"), ("binance", "kucoin")])
+        best = found[0]
+        self.assertEqual(best.pair, "ETH/BTC")
+        self.assertAlmostEqual(best.spread, 0.0510 * 0.999 / (0.0500 * 1.001) - 1)
+
+    def test_bid_ask_and_stale_prices(self):
+        self.scanner.update("binance", [{"symbol": "ETHBTC", "price": "0.05", "bid": "0.0499", "ask": "0.0501"}])
+        self.scanner.update("kucoin", [{"symbol": "ETH-BTC", "price": "0.0502", "bid": "0.0501", "ask": "0.0503"}])
+        self.assertEqual(self.scanner.scan(), [])
+        self.scanner.update("kucoin", [{"symbol": "ETH-BTC", "bid": "0.06", "ask": "0.0601"}],
+                            timestamp=time.time() - 60)
+        self.assertEqual(self.scanner.scan(), [])
+
+    def test_last_price_alone_is_not_ranked(self):
+        self.scanner.update("binance", [{"symbol": "ETHBTC", "bid": "0.0499", "ask": "0.0501"}])
+        self.assertEqual(self.scanner.update("kucoin", [{"symbol": "ETH-BTC", "price": "0.06"}]), [])
+
+    def test_price_snapshot(self):
+        snapshot = PriceSnapshot()
+        snapshot.add("binance", [{"symbol": "ETHBTC", "price": "0.05", "bid": "0.05", "ask": "0.05"}], time.time(), 0.1)
+        snapshot.add("kucoin", [{"symbol": "ETH-BTC", "price": "0.051", "bid": "0.051", "ask": "0.0511"}],
+                     time.time(), 0.1)
+        snapshot.add("bittrex", [{"symbol": "BTC-ETH", "price": 0.06}], time.time(), 0.1)
+        found = self.scanner.update_snapshot(snapshot)
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].sell_exchange, "kucoin")
+
+    def test_grows_with_pairs(self):
+        tickers = [{"symbol": f"ALT{number}BTC", "bid": 0.001, "ask": 0.001} for number in range(500)]
+        self.scanner.update("binance", tickers)
+        self.assertEqual(len(self.scanner.pairs), 500)
+        self.assertGreaterEqual(self.scanner.bids.shape[1], 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import unittest
+
+os.environ.setdefault("DATABASE_NAME", "test")
+
+from trading.backtest import ReplayEngine, parameter_grid, run_grid  # noqa: E402
+
+
+def ticker(price, sequence, symbol="ETHBTC"):
+    return {"e": "24hrTicker", "E": 1610000000000 + sequence * 1000, "s": symbol,
+            "b": f"{price:.8f}", "a": f"{price:.8f}", "c": f"{price:.8f}"}
+
+
+TICKS = [ticker(price, sequence) for sequence, price in enumerate(
+    [0.05, 0.045, 0.04, 0.042, 0.048, 0.05, 0.051, 0.049])]
+
+
+class TestReplayEngine(unittest.TestCase):
+
+    def test_buys_then_sells_in_band(self):
+        result = ReplayEngine(TICKS, balances={"BTC": 1.0}, fee=0).run(
+            "ETH", "BTC", buy_price=0.04, sell_price=0.05, allowable_percent=0.01)
+        self.assertEqual([order["side"] for order in result.orders], ["BUY", "SELL"])
+        self.assertEqual(result.orders[0]["price"], 0.04)
+        self.assertEqual(result.orders[1]["price"], 0.05)
+        self.assertEqual(result.orders[1]["transactTime"], 1610000000000 + 5000)
+        self.assertGreater(result.pnl, 0)
+        self.assertEqual(result.ticks, 6)
+
+    def test_no_trade_outside_band(self):
+        result = ReplayEngine(TICKS).run(
+            "ETH", "BTC", buy_price=0.03, sell_price=0.06, allowable_percent=0.01)
+        self.assertEqual(result.orders, [])
+        self.assertEqual(result.pnl, 0)
+
+    def test_run_grid(self):
+        grid = parameter_grid([0.03, 0.04], [0.05], [0.01])
+        results = run_grid(TICKS, "ETH", "BTC", grid, processes=2)
+        self.assertEqual([result["orders"] for result in results], [0, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
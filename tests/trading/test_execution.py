@@ -0,0 +1,50 @@
+import threading
+import unittest
+
+from trading.execution import OrderExecutor
+
+
+class TestOrderExecutor(unittest.TestCase):
+
+    def test_one_intent_per_rule(self):
+        executor = OrderExecutor(workers=2)
+        executor.start()
+        release = threading.Event()
+        done = threading.Event()
+        calls = []
+
+        def place(**kwargs):
+            calls.append(kwargs)
+            release.wait(1)
+            return {"orderId": 1}
+
+        self.assertTrue(executor.submit("buy", place, on_done=lambda result, error: done.set(), qty=1))
+        self.assertFalse(executor.submit("buy", place, qty=2))
+        self.assertTrue(executor.submit("sell", place, qty=3))
+        release.set()
+        self.assertTrue(done.wait(1))
+        executor.stop()
+        self.assertNotIn({"qty": 2}, calls)
+
+    def test_inline_execution_reports_errors(self):
+        executor = OrderExecutor(workers=0)
+        results = []
+
+        def fail(**kwargs):
+            raise Exception("rejected")
+
+        executor.submit("buy", fail, on_done=lambda result, error: results.append(error))
+        self.assertEqual(str(results[0]), "rejected")
+        self.assertEqual(executor.stats()["failed"], 1)
+        self.assertEqual(executor.stats()["in_flight"], 0)
+
+    def test_full_queue_rejects(self):
+        executor = OrderExecutor(workers=1, max_queue=1)
+        executor.submit("a", lambda: None)
+        self.assertFalse(executor.submit("b", lambda: None))
+        self.assertEqual(executor.stats()["rejected"], 1)
+        self.assertEqual(executor.stats()["queue_depth"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from trading.recorder import TICK_DTYPE, TickReader, TickRecorder
+
+DAY_MS = 86400000
+START = 1610064000000  # 2021-01-08 00:00:00 UTC
+
+
+def ticker(timestamp, price):
+    return {"e": "24hrTicker", "E": timestamp, "s": "ETHBTC", "p": "0.0001", "P": "0.25",
+            "w": "0.0401", "x": "0.0399", "c": f"{price:.8f}", "Q": "1.2", "b": f"{price - 0.00001:.8f}",
+            "B": "3.1", "a": f"{price + 0.00001:.8f}", "A": "2.4", "o": "0.0398", "h": "0.0410",
+            "l": "0.0390", "v": "123456.7", "q": "4938.2", "O": timestamp - DAY_MS, "C": timestamp,
+            "F": 1, "L": 2, "n": 3}
+
+
+class TestTickRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.recorder = TickRecorder(self.root, flush_every=100)
+        self.ticks = [ticker(START + DAY_MS - 500 * 1000 + second * 1000, 0.04 + second * 1e-6)
+                      for second in range(1000)]
+        for msg in self.ticks:
+            self.recorder.record(msg)
+        self.recorder.close()
+        self.reader = TickReader(self.root)
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        return super().tearDown()
+
+    def test_segments_per_day(self):
+        self.assertEqual(self.reader.symbols(), ["ETHBTC"])
+        self.assertEqual(self.reader.days("ETHBTC"), ["20210108", "20210109"])
+        view = self.reader.load("ETHBTC", "20210108")
+        self.assertIsInstance(view, np.memmap)
+        self.assertEqual(view.dtype, TICK_DTYPE)
+        self.assertEqual(len(view), 500)
+
+    def test_range_scan(self):
+        start, end = START + DAY_MS - 10 * 1000, START + DAY_MS + 10 * 1000
+        ticks = self.reader.range("ETHBTC", start, end)
+        self.assertEqual(len(ticks), 20)
+        self.assertEqual(ticks["time"][0], start)
+        self.assertAlmostEqual(ticks["last"][0], float(self.ticks[490]["c"]))
+        self.assertAlmostEqual(ticks["volume"][0], 123456.7)
+
+    def test_messages_round_trip(self):
+        messages = list(self.reader.messages("ETHBTC"))
+        self.assertEqual(len(messages), 1000)
+        self.assertEqual(float(messages[0]["a"]), float(self.ticks[0]["a"]))
+
+    def test_smaller_than_json(self):
+        size = sum(os.path.getsize(os.path.join(self.root, "ETHBTC", f"{day}.ticks"))
+                   for day in self.reader.days("ETHBTC"))
+        self.assertLess(size * 5, sum(len(json.dumps(msg)) for msg in self.ticks))
+
+
+if __name__ == '__main__':
+    unittest.main()
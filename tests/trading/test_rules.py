@@ -0,0 +1,57 @@
+import random
+import unittest
+
+from trading.rules import RuleEngine, BUY, SELL
+
+
+class TestRuleEngine(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(7)
+        self.engine = RuleEngine()
+        self.symbols = ["ETHBTC", "NEOBTC", "LTCBTC"]
+        for _ in range(2000):
+            self.engine.add_band(random.choice(self.symbols), random.choice([BUY, SELL]),
+                                 random.uniform(0.01, 0.05), random.uniform(0.001, 0.2))
+        return super().setUp()
+
+    def brute_force(self, symbol, bid, ask):
+        return {rule.rule_id for rule in self.engine.rules.values() if rule.symbol == symbol and (
+            (rule.side == BUY and rule.low <= ask <= rule.high) or
+            (rule.side == SELL and rule.low <= bid <= rule.high))}
+
+    def test_match_equals_brute_force(self):
+        for _ in range(200):
+            symbol = random.choice(self.symbols)
+            bid = random.uniform(0.005, 0.06)
+            ask = bid * 1.001
+            triggered = {rule.rule_id for rule in self.engine.match(symbol, bid=bid, ask=ask)}
+            self.assertEqual(triggered, self.brute_force(symbol, bid, ask))
+
+    def test_remove_and_inactive(self):
+        rule = self.engine.add_band("XRPBTC", BUY, 0.00001, 0.1)
+        self.assertEqual(self.engine.match("XRPBTC", ask=0.00001), [rule])
+        rule.active = False
+        self.assertEqual(self.engine.match("XRPBTC", ask=0.00001), [])
+        rule.active = True
+        self.engine.remove(rule.rule_id)
+        self.assertEqual(self.engine.match("XRPBTC", ask=0.00001), [])
+
+    def test_evaluate_snapshot(self):
+        asks = {symbol: random.uniform(0.01, 0.05) for symbol in self.symbols}
+        bids = {symbol: price * 0.999 for symbol, price in asks.items()}
+        expected = set()
+        for symbol in self.symbols:
+            expected |= self.brute_force(symbol, bids[symbol], asks[symbol])
+        triggered = {rule.rule_id for rule in self.engine.evaluate(asks, bids)}
+        self.assertEqual(triggered, expected)
+
+    def test_on_ticker_calls_handler(self):
+        calls = []
+        self.engine.add_band("BNBBTC", SELL, 0.002, 0.01, handler=lambda rule, msg: calls.append(msg))
+        self.engine.on_ticker({"s": "BNBBTC", "b": "0.002", "a": "0.0021"})
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
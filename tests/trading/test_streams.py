@@ -0,0 +1,68 @@
+import asyncio
+import json
+import unittest
+
+import websockets
+
+from trading.streams import BinanceStreamMultiplexer, BinanceUserStream
+
+
+class TestBinanceStreamMultiplexer(unittest.TestCase):
+
+    def setUp(self):
+        self.multiplexer = BinanceStreamMultiplexer()
+        self.received = []
+        return super().setUp()
+
+    def test_dispatch_routes_by_symbol(self):
+        self.multiplexer.subscribe("ethbtc", self.received.append)
+        self.multiplexer.dispatch({"stream": "ethbtc@ticker", "data": {"s": "ETHBTC"}})
+        self.multiplexer.dispatch({"stream": "neobtc@ticker", "data": {"s": "NEOBTC"}})
+        self.assertEqual(self.received, [{"s": "ETHBTC"}])
+
+    def test_unsubscribe_from_handler(self):
+        def handler(data):
+            self.received.append(data)
+            self.multiplexer.unsubscribe("ETHBTC", handler)
+
+        self.multiplexer.subscribe("ETHBTC", handler)
+        self.multiplexer.dispatch({"data": {"s": "ETHBTC"}})
+        self.multiplexer.dispatch({"data": {"s": "ETHBTC"}})
+        self.assertEqual(len(self.received), 1)
+        self.assertNotIn("ETHBTC", self.multiplexer.handlers)
+
+
+class ListenKeyClient():
+    def stream_get_listen_key(self):
+        return "listen-key"
+
+
+class TestBinanceUserStream(unittest.TestCase):
+
+    def test_routes_events_and_reports_connection(self):
+        stream = BinanceUserStream(ListenKeyClient())
+        received, paths, states = [], [], []
+        stream.subscribe("outboundAccountPosition", received.append)
+        stream.on_connect.append(lambda: states.append("connected"))
+        stream.on_disconnect.append(lambda: (states.append("disconnected"), stream.close()))
+
+        async def serve(ws, path=None):
+            paths.append(path or ws.request.path)
+            await ws.send(json.dumps({"e": "executionReport", "s": "ETHBTC"}))
+            await ws.send(json.dumps({"e": "outboundAccountPosition", "u": 1, "B": []}))
+
+        async def run():
+            server = await websockets.serve(serve, "127.0.0.1", 0)
+            stream.STREAM_URL = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/ws"
+            await asyncio.wait_for(stream.run(), 5)
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(run())
+        self.assertEqual(paths, ["/ws/listen-key"])
+        self.assertEqual(received, [{"e": "outboundAccountPosition", "u": 1, "B": []}])
+        self.assertEqual(states, ["connected", "disconnected"])
+
+
+if __name__ == '__main__':
+    unittest.main()
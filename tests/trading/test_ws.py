@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_NAME", "test")
+
+from trading.streams import BinanceStreamMultiplexer  # noqa: E402
+from trading.ws import BinaceWebsocket, MultiplexedRules  # noqa: E402
+
+
+def ticker(price, symbol="ETHBTC"):
+    return {"e": "24hrTicker", "E": 1610000000000, "s": symbol, "b": f"{price:.8f}", "a": f"{price:.8f}"}
+
+
+class TestMultiplexedRules(unittest.TestCase):
+
+    def setUp(self):
+        self.multiplexer = BinanceStreamMultiplexer()
+        self.rules = MultiplexedRules(self.multiplexer)
+        self.listeners = []
+        for buy_price in (0.04, 0.05):
+            listener = BinaceWebsocket(None, None, executor=mock.MagicMock())
+            listener.attach(self.rules, "binance", "ETH", "BTC", buy_price, 0.06, 0.01,
+                            exchange_obj=mock.MagicMock())
+            self.listeners.append(listener)
+        return super().setUp()
+
+    def test_one_engine_per_multiplexer(self):
+        self.assertEqual(self.multiplexer.handlers["ETHBTC"], [self.rules.process_results])
+        self.assertEqual(len(self.rules.engine), 4)
+        self.multiplexer.dispatch({"data": ticker(0.0401)})
+        first, second = self.listeners
+        self.assertEqual(first.executor.submit.call_count, 1)
+        self.assertEqual(first.executor.submit.call_args[0][0], first.buy_rule.rule_id)
+        self.assertEqual(second.executor.submit.call_count, 0)
+
+    def test_close_unsubscribes_after_last_listener(self):
+        self.listeners[0].close()
+        self.assertEqual(len(self.rules.engine), 2)
+        self.assertIn("ETHBTC", self.multiplexer.handlers)
+        self.listeners[1].close()
+        self.assertNotIn("ETHBTC", self.multiplexer.handlers)
+
+
+class TestCloseFromThread(unittest.IsolatedAsyncioTestCase):
+
+    async def test_close_runs_on_the_loop(self):
+        multiplexer = BinanceStreamMultiplexer()
+        rules = MultiplexedRules(multiplexer)
+        listener = BinaceWebsocket(None, None, executor=mock.MagicMock())
+        listener.attach(rules, "binance", "ETH", "BTC", 0.04, 0.06, 0.01, exchange_obj=mock.MagicMock())
+        threads = []
+        engine_remove = rules.engine.remove
+
+        def remove(rule_id):
+            threads.append(threading.current_thread())
+            return engine_remove(rule_id)
+
+        with mock.patch.object(rules.engine, "remove", side_effect=remove):
+            worker = threading.Thread(target=listener.close_from_thread)
+            worker.start()
+            worker.join()
+            self.assertEqual(threads, [])
+            await asyncio.sleep(0)
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+        self.assertNotIn("ETHBTC", multiplexer.handlers)
+
+
+if __name__ == '__main__':
+    unittest.main()
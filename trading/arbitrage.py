@@ -0,0 +1,180 @@
+from os import environ
+import logging
+import time
+
+import numpy as np
+
+from exchanges.prices import canonical_pair
+
+logger = logging.getLogger(__name__)
+
+# Taker fee rate per exchange, applied on both legs
+FEES = {"binance": 0.001, "kucoin": 0.001, "bittrex": 0.0025}
+THRESHOLD = float(environ.get("ARBITRAGE_THRESHOLD", 0.002))
+MAX_AGE = float(environ.get("ARBITRAGE_MAX_AGE", 10))
+
+
+class Opportunity():
+    """Buy a pair on one exchange and sell it on another, `spread` net of fees"""
+    __slots__ = ("pair", "buy_exchange", "sell_exchange", "buy_price", "sell_price", "spread")
+
+    def __init__(self, pair, buy_exchange, sell_exchange, buy_price, sell_price, spread):
+        self.pair = pair
+        self.buy_exchange = buy_exchange
+        self.sell_exchange = sell_exchange
+        self.buy_price = buy_price
+        self.sell_price = sell_price
+        self.spread = spread
+
+    def __repr__(self):
+        return (f"Opportunity({self.pair}, buy {self.buy_exchange}@{self.buy_price}, "
+                f"sell {self.sell_exchange}@{self.sell_price}, {self.spread:.4%})")
+
+    def as_dict(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+
+class SpreadScanner():
+    """Cross-exchange spread scanner over aligned NumPy price arrays
+
+    Bids, asks and update times are (exchange, pair) arrays whose columns are
+    canonical pairs (ETH/BTC), so an update writes one row and a scan
+    computes every exchange-to-exchange spread net of fees in one pass:
+    bid_sell * (1 - fee_sell) / (ask_buy * (1 + fee_buy)) - 1. Only real
+    bid/ask quotes are ranked, a ticker with a last price alone is skipped.
+    """
+
+    def __init__(self, exchanges, fees=None, threshold=None, max_age=None, handler=None):
+        """
+        Args:
+            exchanges (list): Names of the exchanges compared
+            fees (dict): Fee rate per exchange, defaults to `FEES`
+            threshold (float): Minimum net spread reported e.g 0.002 for 0.2%
+            max_age (float): Seconds after which a price is ignored
+            handler (callable): Called with every opportunity found by `update`
+        """
+        self.exchanges = list(exchanges)
+        self.rows = {exchange: row for row, exchange in enumerate(self.exchanges)}
+        fees = dict(FEES, **(fees or {}))
+        self.fees = np.array([fees.get(exchange, 0.001) for exchange in self.exchanges])
+        self.threshold = THRESHOLD if threshold is None else float(threshold)
+        self.max_age = MAX_AGE if max_age is None else float(max_age)
+        self.handler = handler
+        self.pairs = []
+        self._columns = {}
+        self._symbols = {exchange: {} for exchange in self.exchanges}
+        self.bids = np.full((len(self.exchanges), 0), np.nan)
+        self.asks = np.full((len(self.exchanges), 0), np.nan)
+        self.updated = np.zeros((len(self.exchanges), 0))
+
+    def _column(self, exchange, symbol):
+        pair = canonical_pair(exchange, symbol)
+        if pair is None:
+            column = -1
+        else:
+            column = self._columns.get(pair)
+            if column is None:
+                column = self._columns[pair] = len(self.pairs)
+                self.pairs.append(pair)
+        self._symbols[exchange][symbol] = column
+        return column
+
+    def _grow(self):
+        size = len(self.pairs)
+        if size <= self.bids.shape[1]:
+            return
+        capacity = max(size, self.bids.shape[1] * 2, 64)
+        extra = capacity - self.bids.shape[1]
+        rows = len(self.exchanges)
+        self.bids = np.hstack([self.bids, np.full((rows, extra), np.nan)])
+        self.asks = np.hstack([self.asks, np.full((rows, extra), np.nan)])
+        self.updated = np.hstack([self.updated, np.zeros((rows, extra))])
+
+    def update(self, exchange, tickers, timestamp=None):
+        """Store an exchange's price snapshot and scan for opportunities
+
+        Args:
+            exchange (string): Name of exchange
+            tickers (list): `get_prices` items, {"symbol", "bid", "ask"}
+            timestamp (float): Time of the snapshot, now by default
+
+        Returns:
+            list: Opportunities above the threshold, best first.
+        """
+        row = self.rows[exchange]
+        symbols = self._symbols[exchange]
+        columns, bids, asks = [], [], []
+        for ticker in tickers:
+            symbol = ticker.get("symbol")
+            bid, ask = ticker.get("bid"), ticker.get("ask")
+            column = symbols.get(symbol)
+            if column is None:
+                column = self._column(exchange, symbol or "")
+            if column < 0 or not bid or not ask:
+                continue
+            columns.append(column)
+            bids.append(bid)
+            asks.append(ask)
+        self._grow()
+        if columns:
+            columns = np.array(columns, dtype=np.int64)
+            self.bids[row, columns] = np.array(bids, dtype=np.float64)
+            self.asks[row, columns] = np.array(asks, dtype=np.float64)
+            self.updated[row, columns] = timestamp or time.time()
+        opportunities = self.scan()
+        if self.handler:
+            for opportunity in opportunities:
+                self.handler(opportunity)
+        return opportunities
+
+    def update_snapshot(self, snapshot):
+        """Store the bid/ask quotes of a `PriceSnapshot` and scan once
+
+        Returns:
+            list: Opportunities above the threshold, best first.
+        """
+        for exchange, timestamp in snapshot.timestamps.items():
+            if exchange not in self.rows:
+                continue
+            row = self.rows[exchange]
+            for pair, quotes in snapshot.quotes.items():
+                if exchange in quotes:
+                    column = self._columns.get(pair)
+                    if column is None:
+                        column = self._columns[pair] = len(self.pairs)
+                        self.pairs.append(pair)
+                        self._grow()
+                    self.bids[row, column], self.asks[row, column] = quotes[exchange]
+                    self.updated[row, column] = timestamp
+        return self.scan()
+
+    def spreads(self, now=None):
+        """Net spread of buying on exchange i and selling on exchange j, per pair
+
+        Returns:
+            array: (exchanges, exchanges, pairs) array, NaN where a price is missing or stale.
+        """
+        size = len(self.pairs)
+        now = now or time.time()
+        fresh = (now - self.updated[:, :size]) <= self.max_age
+        cost = np.where(fresh, self.asks[:, :size], np.nan) * (1 + self.fees)[:, None]
+        proceeds = np.where(fresh, self.bids[:, :size], np.nan) * (1 - self.fees)[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            spreads = proceeds[None, :, :] / cost[:, None, :] - 1
+        diagonal = np.arange(len(self.exchanges))
+        spreads[diagonal, diagonal, :] = np.nan
+        return spreads
+
+    def scan(self, now=None):
+        """Opportunities with a net spread above the threshold, best first"""
+        spreads = self.spreads(now)
+        with np.errstate(invalid="ignore"):
+            buys, sells, columns = np.nonzero(spreads > self.threshold)
+        if not len(columns):
+            return []
+        found = spreads[buys, sells, columns]
+        order = np.argsort(-found)
+        return [Opportunity(self.pairs[columns[index]], self.exchanges[buys[index]],
+                            self.exchanges[sells[index]], float(self.asks[buys[index], columns[index]]),
+                            float(self.bids[sells[index], columns[index]]), float(found[index]))
+                for index in order]
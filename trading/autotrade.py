@@ -5,7 +5,13 @@ from hashes.simhash import simhash
 import asyncio
 import time
 
-from .ws import BinaceWebsocket
+from exchanges.adapter import Exchange
+from exchanges.clients import clients
+from exchanges.instruments import get_instruments
+from exchanges.orderbook import get_order_books
+from .ws import BinaceWebsocket, MultiplexedRules
+from .recorder import get_recorder
+from .streams import BinanceStreamMultiplexer, BinanceUserStream
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +24,49 @@ class AutoTrade:
         if exchange == "binance":
             api_key = os.environ.get("BINANCE_API_KEY")
             api_secret = os.environ.get("BINANCE_API_SECRET_KEY")
-            bws = BinaceWebsocket(api_key, api_secret)
+            bws = BinaceWebsocket(api_key, api_secret, recorder=get_recorder())
             loop = asyncio.get_event_loop()
             await loop.create_task(bws.listener(exchange, coin_name, base_coin, buy_price, sell_price, allowable_percent))
             logger.info(
                 f"Started tracking: {coin_name} on {exchange}, to buy at: {buy_price} and sell at {sell_price}, allowable trade range: {allowable_percent}")
+
+    @classmethod
+    async def listen_many(cls, exchange, watches):
+        """Track many symbols over one multiplexed connection
+
+        Args:
+            exchange (string): Name of exchange
+            watches (list): (coin_name, base_coin, buy_price, sell_price, allowable_percent) tuples
+        """
+        if exchange == "binance":
+            api_key = os.environ.get("BINANCE_API_KEY")
+            api_secret = os.environ.get("BINANCE_API_SECRET_KEY")
+            multiplexer = BinanceStreamMultiplexer()
+            rules = MultiplexedRules(multiplexer, recorder=get_recorder())
+            streams = [multiplexer.run()]
+            if os.environ.get("ORDER_BOOKS", "off").lower() == "on":
+                # Local books let market orders be sized from the depth instead of the last price
+                client = clients.get("binance", api_key, api_secret)
+                books = get_order_books(exchange)
+                books.snapshot = lambda symbol: client.get_order_book(symbol=symbol, limit=1000)
+                depth = BinanceStreamMultiplexer(stream="depth@100ms")
+                books.attach(depth, [get_instruments(exchange).symbol(coin_name, base_coin) for coin_name, base_coin, *_ in watches])
+                streams.append(depth.run())
+            balances = os.environ.get("BALANCE_STREAM", "off").lower() == "on"
+            orders = os.environ.get("ORDER_STREAM", "off").lower() == "on"
+            if balances or orders:
+                # One user data stream keeps the balance ledger and the order store current
+                provider = Exchange(exchange, api_key=api_key, api_secret=api_secret).provider
+                user = BinanceUserStream(clients.get("binance", api_key, api_secret))
+                if balances:
+                    provider.balances.attach(user)
+                if orders:
+                    provider.orders.attach(user)
+                streams.append(user.run())
+            for coin_name, base_coin, buy_price, sell_price, allowable_percent in watches:
+                bws = BinaceWebsocket(api_key, api_secret)
+                bws.attach(rules, exchange, coin_name, base_coin,
+                           buy_price, sell_price, allowable_percent)
+                logger.info(
+                    f"Started tracking: {coin_name} on {exchange}, to buy at: {buy_price} and sell at {sell_price}, allowable trade range: {allowable_percent}")
+            await asyncio.gather(*streams)
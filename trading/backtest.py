@@ -0,0 +1,188 @@
+import gzip
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from exchanges.adapter import Exchange
+from exchanges.instruments import get_instruments
+from exchanges.pricebook import PriceBook
+from .execution import OrderExecutor
+from .recorder import TickReader
+from .ws import BinaceWebsocket
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualClock():
+    """Clock set from the replayed ticks instead of the wall clock"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def load_ticks(path, symbol=None):
+    """Read recorded ticker messages, one JSON object per line (.gz supported)
+
+    Args:
+        path (string): File of recorded messages
+        symbol (string): Keep only this symbol's messages e.g ETHBTC
+
+    Returns:
+        list: Ticker messages in file order.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as lines:
+        ticks = [json.loads(line) for line in lines if line.strip()]
+    if symbol:
+        ticks = [tick for tick in ticks if tick.get("s") == symbol]
+    return ticks
+
+
+class ReplayResult():
+    def __init__(self, params, orders, balances, last_price, ticks, elapsed, start_balances):
+        self.params = params
+        self.orders = orders
+        self.balances = balances
+        self.last_price = last_price
+        self.ticks = ticks
+        self.elapsed = elapsed
+        self.start_balances = start_balances
+
+    @property
+    def ticks_per_second(self):
+        return self.ticks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def pnl(self):
+        """Change of the quote balance, open coin holdings valued at the last price"""
+        coin, base = self.params["coin_name"], self.params["base_coin"]
+        held = self.balances.get(coin, 0) - self.start_balances.get(coin, 0)
+        return self.balances.get(base, 0) - self.start_balances.get(base, 0) + held * (self.last_price or 0)
+
+    def as_dict(self):
+        return {
+            "params": self.params,
+            "orders": len(self.orders),
+            "pnl": self.pnl,
+            "balances": self.balances,
+            "ticks": self.ticks,
+            "ticks_per_second": self.ticks_per_second,
+        }
+
+
+class ReplayEngine():
+    """Runs the websocket strategy over recorded ticks in virtual time
+
+    Each tick goes through `BinaceWebsocket.process_results` unchanged, with
+    orders placed inline on a `simulated` exchange that fills at the replayed
+    quotes. Nothing sleeps or touches the network, so a replay runs as fast
+    as the strategy code itself.
+    """
+
+    def __init__(self, ticks, balances=None, fee=0.001):
+        """
+        Args:
+            ticks (iterable): Binance 24hr ticker or book ticker messages in time order
+            balances (dict): Starting balances of every run, defaults to 1 BTC
+            fee (float): Fee rate of the simulated exchange
+        """
+        self.ticks = ticks
+        self.balances = dict(balances or {"BTC": 1.0})
+        self.fee = fee
+
+    def run(self, coin_name, base_coin, buy_price, sell_price, allowable_percent):
+        """Replay the ticks of one symbol through the strategy
+
+        Takes the same parameters as `AutoTrade.listener`. The run stops once
+        the strategy has bought and sold, as the live listener closes then.
+
+        Returns:
+            ReplayResult: Orders, final balances and replay speed.
+        """
+        params = {"coin_name": coin_name, "base_coin": base_coin, "buy_price": buy_price,
+                  "sell_price": sell_price, "allowable_percent": allowable_percent}
+        clock = VirtualClock()
+        prices = PriceBook(max_age=float("inf"))
+        exchange = Exchange(name="simulated", prices=prices, balances=self.balances,
+                            fee=self.fee, clock=clock)
+        listener = BinaceWebsocket(None, None, executor=OrderExecutor(workers=0, clock=clock), clock=clock)
+        listener.prices = prices
+        listener.configure("simulated", coin_name, base_coin, buy_price, sell_price,
+                           allowable_percent, exchange_obj=exchange)
+
+        symbol = listener.symbol
+        process = listener.process_results
+        count = 0
+        started = time.perf_counter()
+        for msg in self.ticks:
+            if msg.get("s") != symbol:
+                continue
+            clock.now = msg["E"] / 1000 if msg.get("E") else clock.now
+            process(msg)
+            count += 1
+            if listener.sold:
+                break
+        elapsed = time.perf_counter() - started
+
+        quote = prices.get(symbol, max_age=float("inf"))
+        provider = exchange.provider
+        return ReplayResult(params, provider.orders, dict(provider.balances),
+                            float(quote.price()) if quote else None, count, elapsed, self.balances)
+
+
+def parameter_grid(buy_prices, sell_prices, allowable_percents):
+    """Every combination of the given strategy parameters"""
+    return [{"buy_price": buy_price, "sell_price": sell_price, "allowable_percent": percent}
+            for buy_price, sell_price, percent in itertools.product(buy_prices, sell_prices, allowable_percents)]
+
+
+_engine = None
+
+
+def _init_worker(ticks, symbol, balances, fee):
+    global _engine
+    # Per tick INFO logs would dominate the run time
+    logging.disable(logging.INFO)
+    if isinstance(ticks, str) and os.path.isdir(ticks):
+        ticks = list(TickReader(ticks).messages(symbol))
+    elif isinstance(ticks, str):
+        ticks = load_ticks(ticks, symbol)
+    _engine = ReplayEngine(ticks, balances, fee)
+
+
+def _run_one(job):
+    coin_name, base_coin, params = job
+    return _engine.run(coin_name, base_coin, **params).as_dict()
+
+
+def run_grid(ticks, coin_name, base_coin, grid, processes=None, balances=None, fee=0.001):
+    """Replay a parameter grid on every core
+
+    Every worker process loads the ticks once and runs its share of the grid.
+
+    Args:
+        ticks (object): Recorder directory, JSON lines file or list of messages
+        coin_name (string): Coin traded e.g ETH
+        base_coin (string): Quote asset e.g BTC
+        grid (list): Parameter dicts, see `parameter_grid`
+        processes (int): Worker processes, defaults to the number of cores
+        balances (dict): Starting balances of every run
+        fee (float): Fee rate of the simulated exchange
+
+    Returns:
+        list: `ReplayResult.as_dict()` of every run, in grid order.
+    """
+    symbol = get_instruments("binance").symbol(coin_name, base_coin)
+    if not isinstance(ticks, str):
+        ticks = [tick for tick in ticks if tick.get("s") == symbol]
+    jobs = [(coin_name, base_coin, params) for params in grid]
+    processes = processes or multiprocessing.cpu_count()
+    chunksize = max(1, len(jobs) // (processes * 4))
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(ticks, symbol, balances, fee)) as pool:
+        return pool.map(_run_one, jobs, chunksize)
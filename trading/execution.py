@@ -0,0 +1,164 @@
+from os import environ
+import logging
+import queue
+import threading
+import time
+
+from core.metrics import registry, stage
+
+logger = logging.getLogger(__name__)
+
+QUEUE_STAGE = stage("queue")
+ACK_STAGE = stage("ack")
+
+
+class OrderIntent():
+    __slots__ = ("rule_id", "call", "kwargs", "on_done", "tick_time", "queued_at")
+
+    def __init__(self, rule_id, call, kwargs, on_done=None, tick_time=None, queued_at=None):
+        self.rule_id = rule_id
+        self.call = call
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.queued_at = queued_at or time.time()
+        self.tick_time = tick_time or self.queued_at
+
+
+class OrderExecutor():
+    """Places orders off the websocket callback thread
+
+    Strategies enqueue order intents and return immediately; a bounded pool
+    of worker threads places them. Each rule has at most one intent queued
+    or in flight, later triggers of the same rule are dropped until it is done.
+    """
+
+    def __init__(self, workers=None, max_queue=None, clock=None):
+        """
+        Args:
+            workers (int): Worker threads, 0 places orders inline in `submit`
+            max_queue (int): Intents waiting before new ones are rejected
+            clock (callable): Epoch seconds used for lags, a virtual clock in replays
+        """
+        self.clock = clock or time.time
+        self.workers = int(workers if workers is not None else environ.get("ORDER_WORKERS", 4))
+        self.queue = queue.Queue(int(max_queue or environ.get("ORDER_QUEUE_SIZE", 1000)))
+        self.in_flight = set()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"order-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self.queue.put(None)
+
+    def submit(self, rule_id, call, on_done=None, tick_time=None, **kwargs):
+        """Enqueue an order unless the rule already has one pending
+
+        Args:
+            rule_id (object): Rule the order belongs to
+            call (callable): Order call e.g exchange.buy
+            on_done (callable): Called with (result, error) once placed
+            tick_time (float): Epoch seconds of the tick that triggered it
+            **kwargs (object): Arguments of the order call
+
+        Returns:
+            bool: True if the intent was accepted.
+        """
+        with self._lock:
+            if rule_id in self.in_flight:
+                return False
+            self.in_flight.add(rule_id)
+
+        intent = OrderIntent(rule_id, call, kwargs, on_done, tick_time, self.clock())
+        if not self.workers:
+            self.submitted += 1
+            self._execute(intent)
+            return True
+        try:
+            self.queue.put_nowait(intent)
+        except queue.Full:
+            with self._lock:
+                self.in_flight.discard(rule_id)
+            self.rejected += 1
+            logger.warning(f"Order queue full, dropped intent of rule {rule_id}")
+            return False
+        self.submitted += 1
+        return True
+
+    def _run(self):
+        while True:
+            intent = self.queue.get()
+            if intent is None:
+                return
+            self._execute(intent)
+
+    def _execute(self, intent):
+        now = self.clock()
+        lag = now - intent.tick_time
+        self.lag_last = lag
+        self.lag_max = max(self.lag_max, lag)
+        QUEUE_STAGE.observe(now - intent.queued_at)
+
+        result, error = None, None
+        try:
+            result = intent.call(**intent.kwargs)
+            ACK_STAGE.observe(self.clock() - intent.tick_time)
+            self.completed += 1
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            error = ex
+            self.failed += 1
+        try:
+            if intent.on_done:
+                intent.on_done(result, error)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+        finally:
+            with self._lock:
+                self.in_flight.discard(intent.rule_id)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "in_flight": len(self.in_flight),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "lag_last": self.lag_last,
+            "lag_max": self.lag_max,
+        }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process wide order executor, starting it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = OrderExecutor()
+            _executor.start()
+            registry.gauge("order_queue_depth", _executor.queue.qsize)
+            registry.gauge("order_in_flight", lambda: len(_executor.in_flight))
+            registry.gauge("order_tick_lag_seconds", lambda: _executor.lag_last)
+        return _executor
@@ -0,0 +1,177 @@
+from os import environ
+import atexit
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One fixed-width record per tick, 40 bytes against ~600 for the JSON message
+TICK_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("last", "<f8"),
+    ("volume", "<f8"),
+])
+SUFFIX = ".ticks"
+DAY_MS = 86400000
+
+
+def _float(value):
+    return float(value) if value not in (None, "") else np.nan
+
+
+def day_of(timestamp_ms):
+    return time.strftime("%Y%m%d", time.gmtime(timestamp_ms // 1000))
+
+
+class TickRecorder():
+    """Appends ticker messages to per symbol, per UTC day segment files
+
+    Segments are raw arrays of `TICK_DTYPE` records at
+    `<root>/<SYMBOL>/<YYYYMMDD>.ticks`. Ticks are buffered in memory and
+    appended in blocks of `flush_every` records.
+    """
+
+    def __init__(self, root, flush_every=1024):
+        """
+        Args:
+            root (string): Directory of the segment files
+            flush_every (int): Buffered ticks per symbol before they are written
+        """
+        self.root = root
+        self.flush_every = int(flush_every)
+        self.recorded = 0
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def record(self, msg):
+        """Buffer a Binance 24hr ticker or book ticker message"""
+        symbol = msg.get("s")
+        if not symbol:
+            return
+        with self._lock:
+            buffer = self._buffers.get(symbol)
+            if buffer is None:
+                buffer = self._buffers[symbol] = [np.zeros(self.flush_every, dtype=TICK_DTYPE), 0]
+            records, size = buffer
+            timestamp = msg.get("E") or int(time.time() * 1000)
+            if size and records["time"][0] // DAY_MS != timestamp // DAY_MS:
+                self._flush(symbol)
+                size = 0
+            records[size] = (timestamp, _float(msg.get("b")), _float(msg.get("a")),
+                             _float(msg.get("c")), _float(msg.get("v")))
+            buffer[1] = size + 1
+            self.recorded += 1
+            if buffer[1] == self.flush_every:
+                self._flush(symbol)
+
+    def path(self, symbol, day):
+        return os.path.join(self.root, symbol, f"{day}{SUFFIX}")
+
+    def _flush(self, symbol):
+        records, size = self._buffers[symbol]
+        if not size:
+            return
+        path = self.path(symbol, day_of(int(records["time"][0])))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as segment:
+            segment.write(records[:size].tobytes())
+        self._buffers[symbol][1] = 0
+
+    def flush(self):
+        with self._lock:
+            for symbol in list(self._buffers):
+                self._flush(symbol)
+
+    close = flush
+
+
+class TickReader():
+    """Memory-mapped access to recorded tick segments
+
+    Segments are opened as read-only `np.memmap` views, so reading costs no
+    copy and range scans by time are two binary searches per segment.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def days(self, symbol):
+        directory = os.path.join(self.root, symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(SUFFIX)] for name in os.listdir(directory) if name.endswith(SUFFIX))
+
+    def load(self, symbol, day):
+        """Zero-copy view of one segment"""
+        path = os.path.join(self.root, symbol, f"{day}{SUFFIX}")
+        if not os.path.getsize(path):
+            return np.zeros(0, dtype=TICK_DTYPE)
+        return np.memmap(path, dtype=TICK_DTYPE, mode="r")
+
+    def scan(self, symbol, start=None, end=None):
+        """Yield the view of every segment slice with start <= time < end
+
+        Args:
+            symbol (string): Exchange symbol e.g ETHBTC
+            start (int): Epoch milliseconds, from the first tick when None
+            end (int): Epoch milliseconds, to the last tick when None
+        """
+        first = day_of(start) if start is not None else None
+        last = day_of(end) if end is not None else None
+        for day in self.days(symbol):
+            if (first and day < first) or (last and day > last):
+                continue
+            ticks = self.load(symbol, day)
+            low = 0 if start is None else np.searchsorted(ticks["time"], start, side="left")
+            high = len(ticks) if end is None else np.searchsorted(ticks["time"], end, side="left")
+            if high > low:
+                yield ticks[low:high]
+
+    def range(self, symbol, start=None, end=None):
+        """Ticks of a time range as one array; a view when it lies within one segment"""
+        parts = list(self.scan(symbol, start, end))
+        if not parts:
+            return np.zeros(0, dtype=TICK_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def messages(self, symbol, start=None, end=None):
+        """Ticker messages rebuilt from the records, e.g to feed `ReplayEngine`"""
+        fields = ("b", "a", "c", "v")
+        for ticks in self.scan(symbol, start, end):
+            for record in ticks.tolist():
+                msg = {"e": "24hrTicker", "E": record[0], "s": symbol}
+                # NaN marks a field the recorded message did not carry
+                msg.update((field, repr(value)) for field, value in zip(fields, record[1:]) if value == value)
+                yield msg
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """Process wide recorder writing to TICK_RECORD_DIR, None when it is not set"""
+    global _recorder
+    root = environ.get("TICK_RECORD_DIR")
+    if not root:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TickRecorder(root, environ.get("TICK_RECORD_FLUSH", 1024))
+            atexit.register(_recorder.close)
+            logger.info(f"Recording ticks to {root}")
+        return _recorder
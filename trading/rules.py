@@ -0,0 +1,206 @@
+import logging
+from bisect import bisect_left, bisect_right
+from itertools import count
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUY = "buy"
+SELL = "sell"
+
+_rule_ids = count(1)
+
+
+class WatchRule():
+    """A buy or sell price band on one symbol
+
+    The band is precomputed once: price -/+ price * allowable_percent.
+    Buy rules trigger on the best ask, sell rules on the best bid.
+    """
+    __slots__ = ("rule_id", "symbol", "side", "price", "allowable_percent",
+                 "low", "high", "active", "handler")
+
+    def __init__(self, symbol, side, price, allowable_percent, rule_id=None, handler=None):
+        self.rule_id = rule_id if rule_id is not None else next(_rule_ids)
+        self.symbol = symbol.upper()
+        self.side = side
+        self.price = float(price)
+        self.allowable_percent = float(allowable_percent)
+        self.low = self.price - (self.price * self.allowable_percent)
+        self.high = self.price + (self.price * self.allowable_percent)
+        self.active = True
+        self.handler = handler
+
+    def __repr__(self):
+        return f"WatchRule({self.rule_id}, {self.symbol}, {self.side}, {self.low}-{self.high})"
+
+
+class _Node():
+    __slots__ = ("center", "left", "right", "lows", "by_low", "highs", "by_high")
+
+    def __init__(self, rules):
+        points = sorted([rule.low for rule in rules] + [rule.high for rule in rules])
+        self.center = points[len(points) // 2]
+        here = [rule for rule in rules if rule.low <= self.center <= rule.high]
+        left = [rule for rule in rules if rule.high < self.center]
+        right = [rule for rule in rules if rule.low > self.center]
+
+        self.by_low = sorted(here, key=lambda rule: rule.low)
+        self.lows = [rule.low for rule in self.by_low]
+        self.by_high = sorted(here, key=lambda rule: rule.high)
+        self.highs = [rule.high for rule in self.by_high]
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+
+class IntervalIndex():
+    """Centered interval tree over the bands of one symbol and side
+
+    A price lookup costs O(log n + k) for n rules and k matches. The tree is
+    rebuilt lazily after rules are added or removed.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self._root = None
+        self._dirty = False
+
+    def add(self, rule):
+        self.rules[rule.rule_id] = rule
+        self._dirty = True
+
+    def remove(self, rule_id):
+        if self.rules.pop(rule_id, None) is not None:
+            self._dirty = True
+
+    def __len__(self):
+        return len(self.rules)
+
+    def stab(self, price):
+        """Return the rules whose band contains price"""
+        if self._dirty:
+            self._root = _Node(list(self.rules.values())) if self.rules else None
+            self._dirty = False
+
+        matches = []
+        node = self._root
+        while node is not None:
+            if price < node.center:
+                matches.extend(node.by_low[:bisect_right(node.lows, price)])
+                node = node.left
+            elif price > node.center:
+                matches.extend(node.by_high[bisect_left(node.highs, price):])
+                node = node.right
+            else:
+                matches.extend(node.by_low)
+                break
+        return matches
+
+
+class RuleEngine():
+    """Indexed evaluation of many buy/sell band rules
+
+    `match` looks up one tick in the per symbol interval indexes.
+    `evaluate` checks a whole price snapshot against every rule in one
+    vectorized NumPy pass.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.rules = {}
+        self._arrays = None
+
+    def add(self, rule):
+        self.rules[rule.rule_id] = rule
+        self.indexes.setdefault((rule.symbol, rule.side), IntervalIndex()).add(rule)
+        self._arrays = None
+        return rule
+
+    def add_band(self, symbol, side, price, allowable_percent, rule_id=None, handler=None):
+        return self.add(WatchRule(symbol, side, price, allowable_percent, rule_id, handler))
+
+    def remove(self, rule_id):
+        rule = self.rules.pop(rule_id, None)
+        if rule is not None:
+            self.indexes[(rule.symbol, rule.side)].remove(rule_id)
+            self._arrays = None
+        return rule
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, symbol, bid=None, ask=None):
+        """Return the active rules triggered by a symbol's best bid/ask
+
+        Args:
+            symbol (string): Exchange symbol e.g ETHBTC
+            bid (float): Best bid, checked against sell rules
+            ask (float): Best ask, checked against buy rules
+
+        Returns:
+            list: Triggered WatchRule objects.
+        """
+        triggered = []
+        if ask is not None:
+            index = self.indexes.get((symbol, BUY))
+            if index:
+                triggered.extend(rule for rule in index.stab(float(ask)) if rule.active)
+        if bid is not None:
+            index = self.indexes.get((symbol, SELL))
+            if index:
+                triggered.extend(rule for rule in index.stab(float(bid)) if rule.active)
+        return triggered
+
+    def on_ticker(self, msg):
+        """Match a Binance ticker message and call the handlers of triggered rules"""
+        triggered = self.match(msg["s"], bid=msg.get("b"), ask=msg.get("a"))
+        for rule in triggered:
+            if rule.handler:
+                rule.handler(rule, msg)
+        return triggered
+
+    def _build_arrays(self):
+        rules = list(self.rules.values())
+        symbols = {}
+        symbol_index = np.array(
+            [symbols.setdefault(rule.symbol, len(symbols)) for rule in rules], dtype=np.int64)
+        rule_array = np.empty(len(rules), dtype=object)
+        rule_array[:] = rules
+        self._arrays = {
+            "rules": rule_array,
+            "symbols": symbols,
+            "symbol_index": symbol_index,
+            "is_buy": np.array([rule.side == BUY for rule in rules], dtype=bool),
+            "low": np.array([rule.low for rule in rules], dtype=np.float64),
+            "high": np.array([rule.high for rule in rules], dtype=np.float64),
+        }
+        return self._arrays
+
+    def evaluate(self, asks, bids=None):
+        """Evaluate every rule against a price snapshot at once
+
+        Args:
+            asks (dict): Best ask (or last price) per symbol
+            bids (dict): Best bid per symbol, defaults to asks
+
+        Returns:
+            list: Triggered active WatchRule objects.
+        """
+        arrays = self._arrays or self._build_arrays()
+        if not self.rules:
+            return []
+        bids = asks if bids is None else bids
+        symbols = arrays["symbols"]
+        ask_prices = np.full(len(symbols), np.nan)
+        bid_prices = np.full(len(symbols), np.nan)
+        for symbol, position in symbols.items():
+            if symbol in asks:
+                ask_prices[position] = float(asks[symbol])
+            if symbol in bids:
+                bid_prices[position] = float(bids[symbol])
+
+        index = arrays["symbol_index"]
+        prices = np.where(arrays["is_buy"], ask_prices[index], bid_prices[index])
+        mask = (arrays["low"] <= prices) & (prices <= arrays["high"])
+        return [rule for rule in arrays["rules"][mask] if rule.active]
@@ -0,0 +1,270 @@
+from os import environ
+import asyncio
+import json
+import logging
+import time
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+
+class BinanceStreamMultiplexer:
+    """One combined-stream connection serving many symbols
+
+    Messages are routed to handlers through a symbol -> handlers table.
+    Symbols can be added or removed at runtime, from any thread, with live
+    SUBSCRIBE/UNSUBSCRIBE requests on the open connection. Binance accepts up
+    to 1024 streams per connection.
+    """
+    STREAM_URL = environ.get("BINANCE_STREAM_URL", "wss://stream.binance.com:9443/stream")
+    RECONNECT_DELAY = 1
+
+    def __init__(self, stream="ticker"):
+        """
+        Args:
+            stream (string): Stream type subscribed for every symbol e.g ticker, bookTicker
+        """
+        self.stream = stream
+        self.handlers = {}
+        self._ws = None
+        self._loop = None
+        self._control = None
+        self._request_id = 0
+        self._running = False
+
+    def stream_name(self, symbol):
+        return f"{symbol.lower()}@{self.stream}"
+
+    def subscribe(self, symbol, handler):
+        """Route messages of a symbol to a handler, subscribing the symbol if new"""
+        symbol = symbol.upper()
+        handlers = self.handlers.setdefault(symbol, [])
+        if not handlers:
+            self._send("SUBSCRIBE", [self.stream_name(symbol)])
+        handlers.append(handler)
+        logger.info(f"Subscribed {symbol} > {len(self.handlers)} symbols")
+
+    def unsubscribe(self, symbol, handler=None):
+        """Remove a handler (or all handlers) of a symbol, unsubscribing it when none is left"""
+        symbol = symbol.upper()
+        handlers = self.handlers.get(symbol, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if handler is None or not handlers:
+            self.handlers.pop(symbol, None)
+            self._send("UNSUBSCRIBE", [self.stream_name(symbol)])
+            logger.info(f"Unsubscribed {symbol} > {len(self.handlers)} symbols")
+
+    def dispatch(self, message):
+        data = message.get("data") or {}
+        for handler in tuple(self.handlers.get(data.get("s"), ())):
+            try:
+                handler(data)
+            except Exception as ex:
+                logger.error(ex, exc_info=True)
+
+    def _send(self, method, params):
+        # Without a connection the table is enough: it is subscribed on connect
+        if self._ws is None or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._control.put_nowait, (method, params))
+
+    async def _writer(self, ws):
+        while True:
+            method, params = await self._control.get()
+            self._request_id += 1
+            await ws.send(json.dumps(
+                {"method": method, "params": params, "id": self._request_id}))
+
+    async def run(self):
+        """Connect and dispatch messages until `close` is called, reconnecting on errors"""
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        while self._running:
+            writer = None
+            try:
+                async with websockets.connect(self.STREAM_URL) as ws:
+                    self._control = asyncio.Queue()
+                    self._ws = ws
+                    writer = asyncio.ensure_future(self._writer(ws))
+                    streams = [self.stream_name(symbol) for symbol in list(self.handlers)]
+                    if streams:
+                        self._control.put_nowait(("SUBSCRIBE", streams))
+                    async for raw in ws:
+                        message = json.loads(raw)
+                        if "stream" in message:
+                            self.dispatch(message)
+                        elif message.get("error"):
+                            logger.error(f"Stream request failed: {message}")
+            except Exception as ex:
+                logger.error(f"Stream connection lost: {ex}")
+            finally:
+                self._ws = None
+                if writer:
+                    writer.cancel()
+            if self._running:
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+    def close(self):
+        self._running = False
+        ws = self._ws
+        if ws is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: asyncio.ensure_future(ws.close()))
+
+
+class PrivateStream:
+    """Base of the private (account) streams
+
+    Messages are routed to handlers by event type. `on_connect` callbacks run
+    on every (re)connection, so consumers can reload what they may have
+    missed, `on_disconnect` callbacks when the connection drops. Both run on
+    the event loop and must not block.
+    """
+    RECONNECT_DELAY = 1
+
+    def __init__(self, client):
+        """
+        Args:
+            client (object): REST client of the account, used for connection tokens
+        """
+        self.client = client
+        self.handlers = {}
+        self.on_connect = []
+        self.on_disconnect = []
+        self.connected = False
+        self._ws = None
+        self._loop = None
+        self._running = False
+
+    def subscribe(self, event, handler):
+        """Route messages of an event type (or KuCoin topic) to a handler"""
+        self.handlers.setdefault(event, []).append(handler)
+
+    def dispatch(self, event, message):
+        for handler in tuple(self.handlers.get(event, ())):
+            try:
+                handler(message)
+            except Exception as ex:
+                logger.error(ex, exc_info=True)
+
+    def _notify(self, callbacks):
+        for callback in tuple(callbacks):
+            try:
+                callback()
+            except Exception as ex:
+                logger.error(ex, exc_info=True)
+
+    async def _connect(self):
+        """Return the websocket URL and open the connection specific tasks"""
+        raise NotImplementedError
+
+    async def _serve(self, ws):
+        raise NotImplementedError
+
+    async def run(self):
+        """Connect and dispatch messages until `close` is called, reconnecting on errors"""
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        while self._running:
+            try:
+                url = await self._connect()
+                async with websockets.connect(url) as ws:
+                    self._ws = ws
+                    await self._serve(ws)
+            except Exception as ex:
+                logger.error(f"{type(self).__name__} connection lost: {ex}")
+            finally:
+                self._ws = None
+                if self.connected:
+                    self.connected = False
+                    self._notify(self.on_disconnect)
+            if self._running:
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+    def _opened(self):
+        self.connected = True
+        self._notify(self.on_connect)
+
+    def close(self):
+        self._running = False
+        ws = self._ws
+        if ws is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: asyncio.ensure_future(ws.close()))
+
+
+class BinanceUserStream(PrivateStream):
+    """User data stream of one Binance account
+
+    Events (outboundAccountPosition, balanceUpdate, executionReport) are
+    routed by their "e" field. The listen key is created over REST on every
+    connection and kept alive every `KEEPALIVE` seconds.
+    """
+    STREAM_URL = environ.get("BINANCE_USER_STREAM_URL", "wss://stream.binance.com:9443/ws")
+    KEEPALIVE = 30 * 60
+
+    async def _connect(self):
+        self._listen_key = await self._loop.run_in_executor(None, self.client.stream_get_listen_key)
+        return f"{self.STREAM_URL}/{self._listen_key}"
+
+    async def _keepalive(self, listen_key):
+        while True:
+            await asyncio.sleep(self.KEEPALIVE)
+            try:
+                await self._loop.run_in_executor(None, self.client.stream_keepalive, listen_key)
+            except Exception as ex:
+                logger.error(f"Listen key keepalive failed: {ex}")
+
+    async def _serve(self, ws):
+        keepalive = asyncio.ensure_future(self._keepalive(self._listen_key))
+        try:
+            self._opened()
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("e") == "listenKeyExpired":
+                    logger.warning("Listen key expired, reconnecting")
+                    return
+                self.dispatch(message.get("e"), message)
+        finally:
+            keepalive.cancel()
+
+
+class KucoinPrivateStream(PrivateStream):
+    """Private channels of one KuCoin account over one connection
+
+    Handlers are subscribed per topic e.g /account/balance. The connection
+    token comes from the bullet-private endpoint and the connection is
+    pinged at the interval the token prescribes.
+    """
+
+    async def _connect(self):
+        from uuid import uuid4
+
+        token = await self._loop.run_in_executor(
+            None, lambda: self.client._request("POST", "/api/v1/bullet-private"))
+        server = token["instanceServers"][0]
+        self._ping_interval = server.get("pingInterval", 18000) / 1000
+        return f"{server['endpoint']}?token={token['token']}&connectId={uuid4().hex}"
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(self._ping_interval)
+            await ws.send(json.dumps({"id": str(int(time.time() * 1000)), "type": "ping"}))
+
+    async def _serve(self, ws):
+        pinger = asyncio.ensure_future(self._ping(ws))
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                kind = message.get("type")
+                if kind == "message":
+                    self.dispatch(message.get("topic"), message)
+                elif kind == "welcome":
+                    for topic in list(self.handlers):
+                        await ws.send(json.dumps({"id": str(int(time.time() * 1000)), "type": "subscribe",
+                                                  "topic": topic, "privateChannel": True, "response": True}))
+                    self._opened()
+                elif kind == "error":
+                    logger.error(f"Stream request failed: {message}")
+        finally:
+            pinger.cancel()
@@ -1,25 +1,122 @@
 from binance.websockets import BinanceSocketManager
-from binance.client import Client
 import asyncio
 from twisted.internet import reactor
 import time
 
+from core.metrics import stage
 from exchanges.adapter import Exchange
+from exchanges.clients import clients
+from exchanges.instruments import get_instruments
+from exchanges.pricebook import get_price_book
+from .rules import RuleEngine, BUY, SELL
+from .execution import get_executor
 import logging
 
 logger = logging.getLogger(__name__)
 
+RECEIPT_STAGE = stage("receipt")
+DECISION_STAGE = stage("decision")
+
+
+def receive_tick(msg, clock, prices, recorder=None):
+    """Per tick bookkeeping before the rules run: receipt latency, price book, recorder
+
+    Returns:
+        float: Exchange time of the tick in seconds, None when it has none.
+    """
+    received = clock()
+    tick_time = msg["E"] / 1000 if msg.get("E") else None
+    if tick_time:
+        RECEIPT_STAGE.observe(received - tick_time)
+    prices.update_from_ticker(msg)
+    if recorder:
+        recorder.record(msg)
+    return tick_time
+
+
+class MultiplexedRules:
+    """One `RuleEngine` for every listener attached to a multiplexer
+
+    Each symbol is subscribed once; a tick is matched once against the
+    bands of all listeners and every triggered rule goes to the handler of
+    the listener that added it (see `BinaceWebsocket.attach`). The engine
+    and subscriptions belong to the loop running the multiplexer, other
+    threads go through `call_soon`.
+    """
+
+    def __init__(self, multiplexer, clock=None, recorder=None, loop=None):
+        """
+        Args:
+            loop (object): Event loop of the multiplexer, the running one by default
+        """
+        self.multiplexer = multiplexer
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+        self.loop = loop
+        self.engine = RuleEngine()
+        self.clock = clock or time.time
+        self.recorder = recorder
+        self.prices = get_price_book("binance")
+        self.listeners = {}
+
+    def add(self, symbol):
+        """Count a listener of a symbol, subscribing the symbol for the first one"""
+        self.listeners[symbol] = self.listeners.get(symbol, 0) + 1
+        if self.listeners[symbol] == 1:
+            self.multiplexer.subscribe(symbol, self.process_results)
+
+    def call_soon(self, callback):
+        """Run `callback` on the multiplexer's loop, e.g from an executor worker"""
+        if self.loop is None or self.loop.is_closed():
+            return callback()
+        self.loop.call_soon_threadsafe(callback)
+
+    def remove(self, symbol, rule_ids):
+        """Drop a listener's rules, unsubscribing the symbol after its last listener"""
+        for rule_id in rule_ids:
+            self.engine.remove(rule_id)
+        self.listeners[symbol] = self.listeners.get(symbol, 1) - 1
+        if self.listeners[symbol] <= 0:
+            self.listeners.pop(symbol)
+            self.multiplexer.unsubscribe(symbol, self.process_results)
+
+    def process_results(self, msg):
+        started = time.perf_counter()
+        receive_tick(msg, self.clock, self.prices, self.recorder)
+        triggered = self.engine.match(msg["s"], bid=msg["b"], ask=msg["a"])
+        DECISION_STAGE.observe(time.perf_counter() - started)
+        for rule in triggered:
+            if rule.handler:
+                rule.handler(rule, msg)
+
 
 class BinaceWebsocket:
-    def __init__(self, api_key, api_secret):
-        client = Client(api_key, api_secret)
+    def __init__(self, api_key, api_secret, executor=None, clock=None, recorder=None):
         self.api_key = api_key
         self.api_secret = api_secret
-        self.bm = BinanceSocketManager(client)
+        self.clock = clock or time.time
+        self.recorder = recorder
+        self._bm = None
         self.conn_key = None
+        self.exchange_obj = None
+        self.multiplexer = None
+        self.prices = get_price_book("binance")
+        self.rules = RuleEngine()
+        self.executor = executor or get_executor()
         self.purchased = False
         self.sold = False
 
+    @property
+    def bm(self):
+        """Socket manager of an own ticker socket, built on first use"""
+        if self._bm is None:
+            client = clients.get("binance", self.api_key, self.api_secret)
+            self._bm = BinanceSocketManager(client)
+        return self._bm
+
     def get_trading_range(self):
         buy_range_min = self.buy_price - \
             (self.buy_price*self.allowable_percent)
@@ -33,54 +130,126 @@ class BinaceWebsocket:
         return (float(buy_range_min), float(buy_range_max), float(sell_range_min), float(sell_range_max))
 
     def process_results(self, msg):
+        """Match a ticker message and enqueue the triggered orders
+
+        Orders are placed by the executor's workers, so the socket callback
+        returns without waiting on REST calls.
+        """
         try:
             logger.info("message type: {}".format(msg['e']))
-            logger.info(msg)
-
-            ask_price = msg["a"]
-            bid_price = msg["b"]
-            buy_range_min, buy_range_max, sell_range_min, sell_range_max = self.get_trading_range()
-            if not self.purchased and (buy_range_min <= float(ask_price) <= buy_range_max):
-                exchange_obj = Exchange(name=self.exchange,
-                                        api_key=self.api_key, api_secret=self.api_secret)
-                order = exchange_obj.buy(
-                    coin_name=self.coin_name, amount=buy_range_min, pair_base=self.base_coin, order_type="market")
-
-                if order:
-                    self.purchased = True
-            if not self.sold and self.purchased and (sell_range_min <= float(bid_price) <= sell_range_max):
+            logger.debug(msg)
+            started = time.perf_counter()
+            receive_tick(msg, self.clock, self.prices, self.recorder)
+            triggered = self.rules.match(self.symbol, bid=msg["b"], ask=msg["a"])
+            DECISION_STAGE.observe(time.perf_counter() - started)
+            for rule in triggered:
+                self.on_rule(rule, msg)
+        except Exception as ex:
+            logger.error(ex, exc_info=True)
+            logger.warn(
+                f"Forced to close requests. Shutting down websocket")
+            self.close()
 
-                exchange_obj = Exchange(name=self.exchange,
-                                        api_key=self.api_key, api_secret=self.api_secret)
-                order = exchange_obj.sell(
+    def on_rule(self, rule, msg):
+        """Enqueue the order of a triggered buy or sell band"""
+        try:
+            tick_time = msg["E"] / 1000 if msg.get("E") else None
+            buy_range_min = self.buy_rule.low
+            if rule is self.buy_rule and not self.purchased:
+                self.executor.submit(
+                    self.buy_rule.rule_id, self.exchange_obj.buy, on_done=self.on_bought, tick_time=tick_time,
+                    coin_name=self.coin_name, amount=buy_range_min, pair_base=self.base_coin, order_type="market")
+            elif rule is self.sell_rule and not self.sold and self.purchased:
+                self.executor.submit(
+                    self.sell_rule.rule_id, self.exchange_obj.sell, on_done=self.on_sold, tick_time=tick_time,
                     coin_name=self.coin_name, amount=buy_range_min, pair_base=self.base_coin, order_type="market")
-                if order:
-                    self.sold = True
-
-            if self.purchased and self.sold:
-                self.close()
         except Exception as ex:
             logger.error(ex, exc_info=True)
             logger.warn(
                 f"Forced to close requests. Shutting down websocket")
             self.close()
 
+    def on_bought(self, order, error):
+        if error:
+            return self.force_close(error)
+        if order:
+            self.purchased = True
+
+    def on_sold(self, order, error):
+        if error:
+            return self.force_close(error)
+        if order:
+            self.sold = True
+        if self.purchased and self.sold:
+            self.close_from_thread()
+
+    def force_close(self, error):
+        logger.warn(
+            f"Forced to close requests after order error: {error}. Shutting down websocket")
+        self.close_from_thread()
+
+    def close_from_thread(self):
+        """Close from an executor worker: on the multiplexer's loop, or the reactor for an own socket"""
+        if self.multiplexer:
+            self.multiplexer.call_soon(self.close)
+        elif self.conn_key is None:
+            self.close()
+        else:
+            reactor.callFromThread(self.close)
+
     def close(self):
+        if self.multiplexer:
+            logger.info(f"Unsubscribing {self.symbol} from multiplexed stream")
+            self.multiplexer.remove(self.symbol, (self.buy_rule.rule_id, self.sell_rule.rule_id))
+            self.multiplexer = None
+            return
+        if self.conn_key is None:
+            logger.info(f"No socket open for {self.symbol}")
+            return
         logger.info(f"Closing connection key: {self.conn_key}")
         self.bm.stop_socket(self.conn_key)
         self.bm.close()
         logger.info("Close listener")
 
-    async def listener(self, exchange, coin_name, base_coin, buy_price, sell_price, allowable_percent):
-        logger.info(
-            f"Running listener for coin_name: {coin_name}/{base_coin}")
+    def configure(self, exchange, coin_name, base_coin, buy_price, sell_price, allowable_percent,
+                  exchange_obj=None):
         self.exchange = exchange
         self.buy_price = buy_price
         self.sell_price = sell_price
         self.coin_name = coin_name
         self.base_coin = base_coin
         self.allowable_percent = allowable_percent
-        self.symbol = f"{coin_name}{base_coin}"
+        # Stream symbols are Binance symbols whichever exchange trades
+        self.symbol = get_instruments("binance").symbol(coin_name, base_coin)
+        self.buy_rule = self.rules.add_band(
+            self.symbol, BUY, buy_price, allowable_percent, handler=self.on_rule)
+        self.sell_rule = self.rules.add_band(
+            self.symbol, SELL, sell_price, allowable_percent, handler=self.on_rule)
+
+        if exchange_obj is None:
+            clients.warm_up(exchange, self.api_key, self.api_secret)
+            exchange_obj = Exchange(name=exchange,
+                                    api_key=self.api_key, api_secret=self.api_secret)
+        self.exchange_obj = exchange_obj
+
+    def attach(self, multiplexer, exchange, coin_name, base_coin, buy_price, sell_price, allowable_percent,
+               exchange_obj=None):
+        """Watch a symbol over a shared multiplexed connection instead of an own socket
+
+        Args:
+            multiplexer (MultiplexedRules): Rule engine shared by the listeners of one connection
+        """
+        self.rules = multiplexer.engine
+        self.configure(exchange, coin_name, base_coin,
+                       buy_price, sell_price, allowable_percent, exchange_obj)
+        self.multiplexer = multiplexer
+        multiplexer.add(self.symbol)
+
+    async def listener(self, exchange, coin_name, base_coin, buy_price, sell_price, allowable_percent):
+        logger.info(
+            f"Running listener for coin_name: {coin_name}/{base_coin}")
+        self.configure(exchange, coin_name, base_coin,
+                       buy_price, sell_price, allowable_percent)
         self.conn_key = self.bm.start_symbol_ticker_socket(
             self.symbol, self.process_results)
 